@@ -43,10 +43,26 @@ def create_app(config_name='default'):
     # Import models AFTER initialization
     import app.models
 
+    # Commit-time change notifications used by the chatbot caches
+    from app.model_events import init_model_events
+    init_model_events()
+
     # Create tables
     with flask_app.app_context():
         db.create_all()
 
+    # In-memory placement counters shared by the admin dashboard and the chatbot
+    from app.placement_counters import init_placement_counters
+    init_placement_counters(flask_app)
+
+    # Relevance index over opportunities for the chatbot context
+    from app.chatbot_retrieval import init_opportunity_index
+    init_opportunity_index(flask_app)
+
+    # Load the local Ollama models in the background so no question pays the load time
+    from app.chatbot_ollama import start_warm_up
+    start_warm_up()
+
     # Register blueprints
     from app.auth import bp as auth_bp
     flask_app.register_blueprint(auth_bp)
@@ -62,6 +78,14 @@ def create_app(config_name='default'):
 
     from app.chatbot import bp as chatbot_bp
     flask_app.register_blueprint(chatbot_bp)
+
+    # `flask chatbot batch FILE` runs a file of questions through the chatbot
+    from app.chatbot_batch import chatbot_cli
+    flask_app.cli.add_command(chatbot_cli)
+
+    # `flask schema upgrade` migrates the database on deploy, including ones made by create_all()
+    from app.schema import schema_cli
+    flask_app.cli.add_command(schema_cli)
     
     # Initialize chatbot provider status
     with flask_app.app_context():
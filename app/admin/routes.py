@@ -8,6 +8,7 @@ from io import StringIO
 from app import db
 from app.models import Job, StudentProfile, User, Application, Opportunity
 from app.admin import bp
+from app.placement_counters import placement_counters
 
 
 def admin_required(f):
@@ -23,20 +24,15 @@ def admin_required(f):
 @bp.route('/dashboard')
 @admin_required
 def dashboard():
-    total_students = User.query.filter_by(role='Student').count()
-    total_jobs = Job.query.count()
-    total_opportunities = Opportunity.query.count()
-    total_applications = Application.query.count()
-    total_placed = Application.query.filter_by(status='Selected').count()
-    pending_applications = Application.query.filter_by(status='Applied').count()
+    counts = placement_counters.totals()
 
     stats = {
-        'total_students': total_students,
-        'total_jobs': total_jobs,
-        'total_opportunities': total_opportunities,
-        'total_applications': total_applications,
-        'total_placed': total_placed,
-        'pending_applications': pending_applications,
+        'total_students': counts['students'],
+        'total_jobs': counts['jobs'],
+        'total_opportunities': counts['opportunities'],
+        'total_applications': counts['applications'],
+        'total_placed': counts['by_status'].get('Selected', 0),
+        'pending_applications': counts['by_status'].get('Applied', 0),
     }
 
     return render_template('admin/dashboard.html', stats=stats)
@@ -163,7 +159,8 @@ def opportunities():
     opps = query.paginate(page=page, per_page=15, error_out=False)
 
     # Render the admin applications template which now expects `opportunities`
-    return render_template('admin/applications.html', opportunities=opps.items)
+    return render_template('admin/applications.html', opportunities=opps.items,
+                           applicant_counts=placement_counters.applicants_by_opportunity())
 
 
 @bp.route('/opportunity/<int:opp_id>')
@@ -3,10 +3,16 @@ Chatbot blueprint providing endpoints for the chatbot API.
 Integrated with Gemini API for database-aware responses.
 """
 
+import json
 import logging
 import os
-from flask import Blueprint, request, jsonify, render_template, session, current_app
+import uuid
+from flask import (
+    Blueprint, Response, request, jsonify, render_template, session, current_app,
+    stream_with_context, url_for,
+)
 from app.chatbot_engine import ChatbotEngine
+from app.chatbot_memory import conversation_store
 from app.models import User
 from app import db
 
@@ -81,8 +87,14 @@ def api_chat():
         # Initialize chatbot engine
         engine = ChatbotEngine(session=db.session)
 
-        # Process the query with Gemini-based response generation
-        response = engine.process_query(message, user_id=user_id)
+        # Process the query with Gemini-based response generation, with the
+        # earlier turns of this browser's conversation for follow-ups
+        conversation_id = _conversation_id()
+        response = engine.process_query(
+            message, user_id=user_id, conversation_history=conversation_store.history(conversation_id)
+        )
+        if response.get('success'):
+            conversation_store.record(conversation_id, message, response.get('answer'))
 
         # Ensure required fields are present
         if 'intent' not in response:
@@ -103,6 +115,269 @@ def api_chat():
         }), 500
 
 
+def _sse(event, payload):
+    """Format one Server-Sent Event frame."""
+    return 'event: {}\ndata: {}\n\n'.format(event, json.dumps(payload))
+
+
+@bp.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """
+    Streaming variant of /api/chat using Server-Sent Events.
+
+    Accepts the same JSON body as /api/chat and responds with a
+    text/event-stream made of:
+        event: delta  data: {"text": "<next chunk of the answer>"}
+        event: done   data: {same payload /api/chat returns}
+        event: error  data: {"answer": ..., "error": ...}   (only on failure)
+
+    If the client disconnects, the WSGI server closes the generator and the
+    upstream provider connection is closed with it, stopping generation early.
+    """
+    data = request.get_json(silent=True)
+    message = (data or {}).get('message', '')
+    message = message.strip() if isinstance(message, str) else ''
+    if not message:
+        return jsonify({
+            'success': False,
+            'answer': 'Please ask a valid question.',
+            'context': 'error',
+            'intent': None,
+            'error': 'Missing message field' if not data or 'message' not in data else 'Empty message'
+        }), 400
+
+    # Limit message length
+    if len(message) > 500:
+        message = message[:500]
+
+    user_id = session.get('user_id', None)
+    engine = ChatbotEngine(session=db.session)
+    conversation_id = _conversation_id()
+    history = conversation_store.history(conversation_id)
+
+    def generate():
+        try:
+            for event, payload in engine.stream_query(message, user_id=user_id, conversation_history=history):
+                if event == 'delta':
+                    yield _sse('delta', {'text': payload})
+                    continue
+                payload.setdefault('intent', None)
+                payload.setdefault('confidence', 'unknown')
+                if payload.get('success'):
+                    conversation_store.record(conversation_id, message, payload.get('answer'))
+                yield _sse('done', payload)
+        except Exception as e:
+            logger.error(f"Chatbot stream error: {str(e)}", exc_info=True)
+            yield _sse('error', {
+                'success': False,
+                'answer': 'An error occurred while processing your request. Our team has been notified.',
+                'context': 'error',
+                'error': str(e) if current_app.config.get('DEBUG') else 'Internal error'
+            })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # disable proxy buffering (nginx/Render)
+        },
+    )
+
+
+@bp.route('/api/chat/batch', methods=['POST'])
+def api_chat_batch():
+    """
+    Admin-only batch evaluation: answers a list of messages, each asked as
+    an impersonated role or user, on a bounded thread pool.
+
+    Expected JSON:
+    {
+        "items": [
+            {"message": "...", "role": "student" | "admin" | "anonymous"},
+            {"message": "...", "user_id": 42},
+            ...
+        ],
+        "workers": 8            (optional, default CHATBOT_BATCH_WORKERS)
+    }
+
+    Responds with application/x-ndjson, one line per item in completion order:
+        {"index", "message", "role", "user_id", "success", "answer", "tier",
+         "provider", "intent", "latency_ms", "error"}
+    followed by {"summary": true, "items", "succeeded", "failed", "wall_ms",
+    "sum_latency_ms", "max_latency_ms", "by_provider", "by_tier", ...}.
+    """
+    from app.chatbot_batch import BatchError, batch_runner, ndjson
+
+    if 'user_id' not in session or session.get('role') != 'Admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+    data = request.get_json(silent=True) or {}
+    workers = data.get('workers')
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        return jsonify({'success': False, 'error': 'workers must be a positive integer'}), 400
+    try:
+        items = batch_runner.resolve(data.get('items'))
+    except BatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Not above the configured pool size: that is what the providers are sized for
+    workers = min(workers or batch_runner.workers, batch_runner.workers)
+    app = current_app._get_current_object()
+    logger.info("Chat batch | admin=%s items=%s workers=%s", session.get('user_id'), len(items), workers)
+
+    def generate():
+        for record in batch_runner.run(app, items, workers=workers):
+            yield ndjson(record)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+def _conversation_id():
+    """Id of this browser's chat conversation, created on first use."""
+    if 'chat_conversation_id' not in session:
+        session['chat_conversation_id'] = uuid.uuid4().hex
+    return session['chat_conversation_id']
+
+
+@bp.route('/api/chat/history', methods=['DELETE'])
+def api_chat_history_clear():
+    """Forget the current conversation; the next message starts a new one."""
+    conversation_id = session.pop('chat_conversation_id', None)
+    if conversation_id:
+        conversation_store.forget(conversation_id)
+    return jsonify({'success': True}), 200
+
+
+def _job_owner():
+    """Key for per-user job limits: the user id, or a random id for anonymous browsers."""
+    user_id = session.get('user_id')
+    if user_id:
+        return 'user:{}'.format(user_id)
+    if 'chat_client_id' not in session:
+        session['chat_client_id'] = uuid.uuid4().hex
+    return 'anon:{}'.format(session['chat_client_id'])
+
+
+@bp.route('/api/chat/jobs', methods=['POST'])
+def api_chat_job_create():
+    """
+    Queue a chat message for background processing.
+
+    Accepts the same JSON body as /api/chat and returns 202 immediately:
+    {
+        "success": true,
+        "job_id": "...",
+        "status": "queued",
+        "poll_url": "/chatbot/api/chat/jobs/<job_id>"
+    }
+    Responds 429 with a Retry-After header when the job queue or the
+    caller's concurrent-job limit is full.
+    """
+    from app.chatbot_jobs import chat_jobs, JobRejected
+
+    data = request.get_json(silent=True)
+    message = (data or {}).get('message', '')
+    message = message.strip() if isinstance(message, str) else ''
+    if not message:
+        return jsonify({
+            'success': False,
+            'answer': 'Please ask a valid question.',
+            'context': 'error',
+            'intent': None,
+            'error': 'Missing message field' if not data or 'message' not in data else 'Empty message'
+        }), 400
+
+    # Limit message length
+    if len(message) > 500:
+        message = message[:500]
+
+    try:
+        job = chat_jobs.submit(
+            current_app._get_current_object(),
+            _job_owner(),
+            message,
+            user_id=session.get('user_id', None),
+            conversation_id=_conversation_id(),
+        )
+    except JobRejected as e:
+        busy = ('The assistant is busy right now. Please try again in a few seconds.'
+                if e.reason == 'queue_full'
+                else 'Please wait for your previous question to be answered.')
+        response = jsonify({
+            'success': False,
+            'answer': busy,
+            'context': 'error',
+            'intent': None,
+            'error': e.reason
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'poll_url': url_for('chatbot.api_chat_job_status', job_id=job.id)
+    }), 202
+
+
+@bp.route('/api/chat/jobs/<job_id>', methods=['GET'])
+def api_chat_job_status(job_id):
+    """
+    Poll a chat job.
+
+    Query params:
+        since: number of answer characters already received (default 0)
+
+    Returns the job status, the answer text generated after ``since`` and the
+    new ``offset``. Once ``done`` is true, ``response`` holds the same payload
+    /api/chat returns. Unknown, expired or foreign jobs return 404.
+    """
+    from app.chatbot_jobs import chat_jobs
+
+    job = chat_jobs.get(job_id, _job_owner())
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    return jsonify(job.as_dict(since=request.args.get('since', 0, type=int))), 200
+
+
+@bp.route('/api/chat/jobs/<job_id>', methods=['DELETE'])
+def api_chat_job_cancel(job_id):
+    """Cancel a queued or running chat job (e.g. the user left the page)."""
+    from app.chatbot_jobs import chat_jobs
+
+    job = chat_jobs.cancel(job_id, _job_owner())
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 200
+
+
+@bp.route('/api/prefetch', methods=['POST'])
+def api_prefetch():
+    """
+    Called when the chat page opens: builds the logged-in user's personal
+    context (student card, eligible opportunities, applications) in the
+    background and warms the provider connections, so the first question
+    skips that work. Returns 202 straight away:
+    {
+        "success": true,
+        "status": "queued" | "pending" | "fresh" | "disabled"
+    }
+    """
+    from app.chatbot_prefetch import context_prefetcher
+
+    status = context_prefetcher.prefetch(current_app._get_current_object(), session.get('user_id'))
+    return jsonify({'success': True, 'status': status}), 202
+
+
 @bp.route('/api/suggestions', methods=['GET'])
 def api_suggestions():
     """
@@ -165,17 +440,24 @@ def api_suggestions():
 def api_health():
     """
     Health check endpoint for monitoring.
-    Checks chatbot provider configuration status.
+    Checks chatbot provider configuration status and reports each provider's
+    circuit breaker state (closed/open/half_open) with recent transitions.
     """
     try:
-        # Quick check that engine initializes
+        from app.chatbot_health import breakers, health_prober, CLOSED
+
+        # Quick check that engine initializes (also starts the background prober)
         engine = ChatbotEngine(session=db.session)
+        circuits = breakers.snapshot()
         
         return jsonify({
-            'status': 'healthy',
+            'status': 'healthy' if all(c['state'] == CLOSED for c in circuits.values()) else 'degraded',
             'chatbot': 'active',
             'gemini': 'configured' if engine.gemini_api_key else 'missing_api_key',
-            'mistral': 'configured' if os.getenv('MISTRAL_API_KEY') else 'not_configured'
+            'mistral': 'configured' if os.getenv('MISTRAL_API_KEY') else 'not_configured',
+            'ollama': 'configured' if engine.ollama_model else 'not_configured',
+            'circuits': circuits,
+            'prober': health_prober.snapshot(),
         }), 200
     except Exception as e:
         logger.error(f"Health check error: {str(e)}")
@@ -186,6 +468,76 @@ def api_health():
         }), 500
 
 
+@bp.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """
+    Admin-only chatbot performance metrics for this worker process.
+
+    Responds with one object per subsystem:
+        * pipeline        hit rate and latency per answer tier (greeting, fast_path, cache, llm, ...)
+        * providers       HTTP requests, retries, errors and connection reuse per provider
+        * orchestrator    provider latency/error EWMAs and hedged requests
+        * answer_cache    exact answer-cache size and hit/miss counts
+        * semantic_cache  paraphrase-cache size, hits, misses and evictions
+        * jobs            background chat-job queue depth and outcomes
+        * snapshot        portal-snapshot freshness and rebuilds
+        * prompt          prompt/completion token counts
+        * singleflight    identical concurrent questions coalesced
+        * memory          conversations and tokens held in conversation memory
+        * retrieval       opportunity-index size and search latency
+        * tools           tool calls in function-calling mode
+        * router          light/full model routing counts and per-tier latency
+        * prefetch        context-prefetch hits and build times
+        * ollama          model load time, tokens/sec and parse failures
+        * batch           batch-evaluation runs and item latencies
+        * counters        placement-counter deltas, reconciliations and drift corrections
+
+    Unlike /api/health, which monitors may poll anonymously, this exposes
+    conversation, batch and counter internals, so it requires an admin session
+    like /api/chat/batch.
+    """
+    if 'user_id' not in session or session.get('role') != 'Admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+    from app.chatbot_batch import batch_runner
+    from app.chatbot_cache import answer_cache
+    from app.chatbot_fastpath import tier_stats
+    from app.chatbot_http import provider_client_stats
+    from app.chatbot_jobs import chat_jobs
+    from app.chatbot_ollama import ollama_stats
+    from app.chatbot_orchestrator import provider_orchestrator
+    from app.chatbot_prefetch import context_prefetcher
+    from app.chatbot_prompt import prompt_assembler
+    from app.chatbot_retrieval import opportunity_index
+    from app.chatbot_router import model_router
+    from app.chatbot_semantic_cache import semantic_cache
+    from app.chatbot_singleflight import single_flight
+    from app.chatbot_snapshot import portal_snapshot
+    from app.chatbot_tools import tool_stats
+    from app.placement_counters import placement_counters
+
+    return jsonify({
+        'success': True,
+        'pipeline': tier_stats(),
+        'providers': provider_client_stats(),
+        'orchestrator': provider_orchestrator.stats(),
+        'answer_cache': answer_cache.stats(),
+        'semantic_cache': semantic_cache.stats(),
+        'jobs': chat_jobs.stats(),
+        'snapshot': portal_snapshot.stats(),
+        'prompt': prompt_assembler.stats(),
+        'singleflight': single_flight.stats(),
+        'memory': conversation_store.stats(),
+        'retrieval': opportunity_index.stats(),
+        'tools': tool_stats(),
+        'router': model_router.stats(),
+        'prefetch': context_prefetcher.stats(),
+        'ollama': ollama_stats(),
+        'batch': batch_runner.stats(),
+        'counters': placement_counters.stats(),
+    }), 200
+
+
 @bp.route('/api/intents', methods=['GET'])
 def api_intent_list():
     """
@@ -0,0 +1,294 @@
+"""
+Batch chat evaluation.
+
+Admins and QA run regression sets and placement-season FAQ checks through
+the assistant in one go instead of hundreds of sequential POSTs. A batch is
+a list of items:
+
+    {"message": "When is the Google deadline?", "role": "student"}
+    {"message": "How many students are placed?", "role": "admin"}
+    {"message": "Show me internships", "role": "anonymous"}
+    {"message": "What is my application status?", "user_id": 42}
+
+``role`` impersonates the first user with that role (``anonymous`` asks
+with no user); ``user_id`` impersonates that user. Each item goes through
+``ChatbotEngine.process_query`` exactly as a chat message would, on a
+bounded pool of threads, so the wall time of a batch approaches its slowest
+item rather than the sum. Item starts are spaced to at most
+CHATBOT_BATCH_RATE per second, so a large batch does not trip the
+providers' rate limits. Results come back as NDJSON in completion order,
+one line per item with its latency, tier and provider, and a final summary
+line.
+
+Used by the admin-only ``POST /chatbot/api/chat/batch`` endpoint and the
+``flask chatbot batch FILE`` command.
+
+Configuration:
+    CHATBOT_BATCH_WORKERS     threads answering items of one batch (default 4)
+    CHATBOT_BATCH_MAX_ITEMS   max items per batch (default 500)
+    CHATBOT_BATCH_RATE        max items started per second, 0 for no limit (default 4)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import click
+from flask.cli import AppGroup
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROLES = {'student': 'Student', 'admin': 'Admin', 'anonymous': None}
+# Same cap as a single /chatbot/api/chat message
+MAX_MESSAGE_CHARS = 500
+
+
+class BatchError(ValueError):
+    """The batch is malformed; the message says which item and why."""
+
+
+class StartLimiter:
+    """Spaces item starts to at most ``rate`` per second across the batch's threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        """Wait for the next start slot; False if ``cancel_event`` was set meanwhile."""
+        if not self.interval:
+            return not (cancel_event and cancel_event.is_set())
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            metrics.observe('batch.throttle', delay * 1000)
+            if cancel_event is not None:
+                return not cancel_event.wait(delay)
+            time.sleep(delay)
+        return not (cancel_event and cancel_event.is_set())
+
+
+class BatchRunner:
+    """Validates batches and answers their items on a bounded thread pool."""
+
+    def __init__(self, workers=4, max_items=500, rate=4.0):
+        self.workers = max(1, workers)
+        self.max_items = max_items
+        self.rate = rate
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv('CHATBOT_BATCH_WORKERS', '4')),
+            max_items=int(os.getenv('CHATBOT_BATCH_MAX_ITEMS', '500')),
+            rate=float(os.getenv('CHATBOT_BATCH_RATE', '4')),
+        )
+
+    def resolve(self, items):
+        """
+        Validate ``items`` and resolve each one's impersonated user. Returns
+        a list of {index, message, role, user_id}. Must be called inside an
+        application context. Raises BatchError on a malformed batch.
+        """
+        from app.models import User
+
+        if not isinstance(items, list) or not items:
+            raise BatchError('Provide a non-empty list of items.')
+        if len(items) > self.max_items:
+            raise BatchError('Too many items: {} (max {}).'.format(len(items), self.max_items))
+
+        first_user = {}
+        resolved = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {'message': item}
+            if not isinstance(item, dict):
+                raise BatchError('Item {}: expected an object or a string.'.format(index))
+            message = item.get('message')
+            if not isinstance(message, str) or not message.strip():
+                raise BatchError('Item {}: missing message.'.format(index))
+
+            user_id = item.get('user_id')
+            role = str(item.get('role') or ('anonymous' if user_id is None else '')).strip().lower()
+            if role and role not in ROLES:
+                raise BatchError('Item {}: unknown role {!r} (use {}).'.format(
+                    index, item.get('role'), ', '.join(sorted(ROLES))))
+            if user_id is not None:
+                user = User.query.get(user_id) if isinstance(user_id, int) else None
+                if user is None:
+                    raise BatchError('Item {}: user {!r} not found.'.format(index, user_id))
+                if role and ROLES[role] != user.role:
+                    raise BatchError('Item {}: user {} is not a {}.'.format(index, user_id, role))
+                role = user.role.lower()
+            elif ROLES[role] is not None:
+                if role not in first_user:
+                    user = User.query.filter_by(role=ROLES[role]).order_by(User.id).first()
+                    first_user[role] = user.id if user else None
+                user_id = first_user[role]
+                if user_id is None:
+                    raise BatchError('Item {}: no {} user to impersonate.'.format(index, role))
+
+            resolved.append({
+                'index': index,
+                'message': message.strip()[:MAX_MESSAGE_CHARS],
+                'role': role,
+                'user_id': user_id,
+            })
+        return resolved
+
+    def run(self, app, items, workers=None):
+        """
+        Answer resolved ``items`` and yield one result dict per item in
+        completion order, then a summary dict. Closing the generator early
+        (e.g. the client disconnected) cancels the items not yet started.
+        """
+        workers = max(1, min(workers or self.workers, len(items)))
+        limiter = StartLimiter(self.rate)
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-batch')
+        started = time.monotonic()
+        results = []
+        metrics.incr('batch.runs')
+        try:
+            pending = {executor.submit(self._answer, app, item, limiter, cancel) for item in items}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results.append(result)
+                    yield result
+        finally:
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield self._summary(results, time.monotonic() - started, workers)
+
+    def _answer(self, app, item, limiter, cancel):
+        from app.chatbot_engine import ChatbotEngine
+
+        result = dict(item, success=False, answer=None, tier=None, provider=None,
+                      intent=None, latency_ms=None, error=None)
+        if not limiter.acquire(cancel):
+            result['error'] = 'cancelled'
+            return result
+        began = time.monotonic()
+        try:
+            # Worker threads have no app context of their own
+            with app.app_context():
+                response = ChatbotEngine().process_query(item['message'], user_id=item['user_id'])
+            result.update(
+                success=bool(response.get('success')),
+                answer=response.get('answer'),
+                tier=response.get('tier'),
+                provider=response.get('extraction_method'),
+                intent=response.get('intent'),
+                error=response.get('error'),
+            )
+        except Exception as exc:
+            logger.warning("Batch item %s failed: %s", item['index'], exc, exc_info=True)
+            result['error'] = str(exc) or type(exc).__name__
+        elapsed_ms = (time.monotonic() - began) * 1000
+        result['latency_ms'] = round(elapsed_ms, 1)
+        metrics.incr('batch.items')
+        metrics.incr('batch.succeeded' if result['success'] else 'batch.failed')
+        metrics.observe('batch.item', elapsed_ms)
+        return result
+
+    @staticmethod
+    def _summary(results, elapsed_seconds, workers):
+        latencies = [r['latency_ms'] for r in results if r['latency_ms'] is not None]
+        by_provider = {}
+        by_tier = {}
+        for r in results:
+            if r['provider']:
+                by_provider[r['provider']] = by_provider.get(r['provider'], 0) + 1
+            if r['tier']:
+                by_tier[r['tier']] = by_tier.get(r['tier'], 0) + 1
+        wall_ms = elapsed_seconds * 1000
+        metrics.observe('batch.wall', wall_ms)
+        return {
+            'summary': True,
+            'items': len(results),
+            'succeeded': sum(1 for r in results if r['success']),
+            'failed': sum(1 for r in results if not r['success']),
+            'workers': workers,
+            'wall_ms': round(wall_ms, 1),
+            'sum_latency_ms': round(sum(latencies), 1),
+            'max_latency_ms': max(latencies) if latencies else None,
+            'by_provider': by_provider,
+            'by_tier': by_tier,
+        }
+
+    def stats(self):
+        snap = metrics.snapshot('batch.')
+        return {
+            'workers': self.workers,
+            'max_items': self.max_items,
+            'rate_per_second': self.rate,
+            'runs': snap['counters'].get('batch.runs', 0),
+            'items': snap['counters'].get('batch.items', 0),
+            'succeeded': snap['counters'].get('batch.succeeded', 0),
+            'failed': snap['counters'].get('batch.failed', 0),
+            'item_latency': snap['latency'].get('batch.item'),
+            'wall': snap['latency'].get('batch.wall'),
+            'throttle': snap['latency'].get('batch.throttle'),
+        }
+
+
+def ndjson(record):
+    return json.dumps(record, default=str) + '\n'
+
+
+def load_items(text):
+    """Items from a JSON list (or {"items": [...]}) or from NDJSON lines."""
+    text = text.strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get('items')
+    if isinstance(data, list):
+        return data
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            raise BatchError('Line {}: not valid JSON.'.format(number))
+    return items
+
+
+# Shared batch runner
+batch_runner = BatchRunner.from_env()
+
+
+chatbot_cli = AppGroup('chatbot', help='Chatbot maintenance commands.')
+
+
+@chatbot_cli.command('batch')
+@click.argument('source', type=click.File('r'))
+@click.option('--workers', type=int, default=None, help='Threads answering items (default CHATBOT_BATCH_WORKERS).')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='NDJSON output file (default stdout).')
+def batch_command(source, workers, output):
+    """Run the questions in SOURCE (JSON list or NDJSON, '-' for stdin) through the chatbot."""
+    from flask import current_app
+
+    try:
+        items = batch_runner.resolve(load_items(source.read()))
+    except BatchError as exc:
+        raise click.ClickException(str(exc))
+    for record in batch_runner.run(current_app._get_current_object(), items, workers=workers):
+        output.write(ndjson(record))
+        output.flush()
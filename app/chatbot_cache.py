@@ -0,0 +1,127 @@
+"""
+LLM answer cache for the chatbot.
+
+Answers are keyed on the normalized question, the asker's role and a hash of
+the database context that was sent to the provider, so a cached answer is
+only reused when the model would have seen byte-identical input. Entries
+expire after a TTL, the least recently used entry is evicted when the cache
+is full, and the whole cache is dropped when opportunities, applications or
+student profiles change.
+
+Configuration:
+    CHATBOT_CACHE_SIZE   max entries per worker (default 256, 0 disables)
+    CHATBOT_CACHE_TTL    seconds an answer stays valid (default 300)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.chatbot_metrics import metrics
+from app.model_events import on_models_changed
+
+logger = logging.getLogger(__name__)
+
+# Changes to these models can alter the database context behind an answer
+INVALIDATING_MODELS = {'Opportunity', 'Application', 'StudentProfile'}
+
+
+def normalize_message(message):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^a-z0-9.+\s]", " ", (message or "").lower())
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def context_fingerprint(db_context):
+    return hashlib.sha1((db_context or "").encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Thread-safe LRU + TTL mapping from cache keys to response dicts."""
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.getenv("CHATBOT_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("CHATBOT_CACHE_TTL", "300")),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(message, role, db_context):
+        return (normalize_message(message), (role or "anonymous").lower(), context_fingerprint(db_context))
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.incr("answer_cache.misses")
+                return None
+            expires_at, response = entry
+            if expires_at <= now:
+                del self._entries[key]
+                metrics.incr("answer_cache.expired")
+                metrics.incr("answer_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("answer_cache.hits")
+        return dict(response)
+
+    def set(self, key, response):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr("answer_cache.evictions")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def on_models_changed(self, changed):
+        if changed & INVALIDATING_MODELS:
+            self.clear()
+            metrics.incr("answer_cache.invalidations")
+            logger.debug("Answer cache cleared after changes to %s", ", ".join(sorted(changed)))
+
+    def stats(self):
+        hits = metrics.counter("answer_cache.hits")
+        misses = metrics.counter("answer_cache.misses")
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "evictions": metrics.counter("answer_cache.evictions"),
+            "invalidations": metrics.counter("answer_cache.invalidations"),
+        }
+
+
+# Shared per-worker cache
+answer_cache = AnswerCache.from_env()
+on_models_changed(answer_cache.on_models_changed)
@@ -0,0 +1,430 @@
+"""
+Local intent classifier for the chatbot.
+
+Messages are turned into hashed character n-gram and word features with
+TF-IDF weights, and scored against one centroid per intent with a single
+NumPy product. The model is trained at first use from the labelled examples
+in ``chatbot_intent_examples.jsonl`` (a few tens of milliseconds), so there is
+no model file to ship. To add a phrasing, add an example line.
+
+Scores become probabilities through a softmax whose temperature is fitted by
+cross-validation on the examples, so the confidence can be compared with a
+fixed threshold: about 80% of predictions made with confidence 0.8 are right.
+
+Besides the structured intents in ``chatbot_security.ALLOWED_INTENTS`` the
+examples cover greeting, general (advice and open-ended questions),
+student_search (admin student lookups) and browse_opportunities (listing
+openings without naming a company).
+
+The classifier also pulls out the parameters the handlers need: company,
+branch, a CGPA threshold and a package range / "highest paying" ordering.
+
+Configuration:
+    CHATBOT_INTENT_EXAMPLES   labelled examples file (default app/chatbot_intent_examples.jsonl)
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from app.ctc import parse_ctc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXAMPLES = os.path.join(os.path.dirname(__file__), 'chatbot_intent_examples.jsonl')
+
+# Hashed feature space; collisions are rare at this size for a few thousand n-grams
+FEATURE_BITS = 14
+CHAR_NGRAMS = (3, 4, 5)
+CV_FOLDS = 5
+TEMPERATURES = np.geomspace(0.01, 1.0, 40)
+
+# Canonical branch -> ways people write it. Short aliases that are also English
+# words ("it", "me") only count when written in capitals or next to "branch".
+BRANCH_ALIASES = {
+    'CSE': ['cse', 'cs', 'computer science', 'computer engineering', 'comp sci'],
+    'IT': ['information technology'],
+    'ECE': ['ece', 'electronics and communication', 'electronics & communication', 'electronics'],
+    'EEE': ['eee', 'electrical and electronics', 'electrical'],
+    'MECH': ['mech', 'mechanical'],
+    'CIVIL': ['civil'],
+    'AIML': ['aiml', 'ai ml', 'ai & ml', 'artificial intelligence'],
+}
+AMBIGUOUS_BRANCHES = {'IT': 'it', 'MECH': 'me', 'CIVIL': 'ce'}
+
+_NUMBER = r"(\d{1,2}(?:\.\d{1,2})?)"
+CGPA_ABOVE = re.compile(
+    r"(?:above|over|more than|greater than|at least|minimum(?: of)?|min|>=|>)\s*(?:a\s+)?(?:cgpa|gpa)?\s*(?:of\s+)?"
+    + _NUMBER + r"|" + _NUMBER + r"\s*(?:\+|or (?:more|above|higher))"
+)
+CGPA_BELOW = re.compile(
+    r"(?:below|under|less than|lower than|at most|maximum(?: of)?|max|<=|<)\s*(?:a\s+)?(?:cgpa|gpa)?\s*(?:of\s+)?"
+    + _NUMBER + r"|" + _NUMBER + r"\s*or (?:less|below|lower)"
+)
+CGPA_ANY = re.compile(r"(?:cgpa|gpa|pointer)\D{0,12}" + _NUMBER + r"|" + _NUMBER + r"\s*(?:cgpa|gpa|pointer)")
+# Packages need a unit ("10 lpa", "8 lakh", "20k/month") so they are not taken for CGPAs
+_PACKAGE = r"(\d+(?:\.\d+)?\s*(?:lpa|lakhs?|lacs?|l|k)(?![a-z])(?:\s*(?:/|per|a)\s*(?:month|week|day))?)"
+PACKAGE_ABOVE = re.compile(
+    r"(?:above|over|more than|greater than|at least|minimum(?: of)?|min|>=|>)\s*(?:a\s+)?"
+    r"(?:package|ctc|salary|stipend|pay)?\s*(?:of\s+)?" + _PACKAGE
+    + r"|" + _PACKAGE + r"\s*(?:\+|or (?:more|above|higher))"
+    + r"|(\d+(?:\.\d+)?)\s*\+\s*(?:lpa|lakhs?|lacs?)\b"
+)
+PACKAGE_BELOW = re.compile(
+    r"(?:below|under|less than|lower than|at most|maximum(?: of)?|max|upto|up to|<=|<)\s*(?:a\s+)?"
+    r"(?:package|ctc|salary|stipend|pay)?\s*(?:of\s+)?" + _PACKAGE
+    + r"|" + _PACKAGE + r"\s*or (?:less|below|lower)"
+)
+PACKAGE_BETWEEN = re.compile(r"between\s+(\d+(?:\.\d+)?)\s*(?:lpa|lakhs?|k)?\s*(?:and|-|to)\s*" + _PACKAGE)
+PACKAGE_ANY = re.compile(r"\d\s*\+?\s*(?:lpa|lakhs?|lacs?|l|k)(?![a-z])")
+HIGHEST_PAYING = re.compile(
+    r"\b(?:highest|best|top|most|max(?:imum)?)[\s-]+pa(?:ying|id)\b"
+    r"|\b(?:highest|best|top|max(?:imum)?|biggest|largest|good|high)\s+(?:package|ctc|salar(?:y|ies)|stipend|pay)s?\b"
+    r"|\b(?:sort(?:ed)?|order(?:ed)?|rank(?:ed)?)\s+by\s+(?:package|ctc|salary|stipend|pay)\b"
+)
+COMPANY_TOKEN = 'companyname'
+# "jobs at Zoho", "openings from Goldman Sachs": capitalised words after a preposition
+COMPANY_AFTER = re.compile(r"\b(?:from|at|by|with)\s+([A-Z][\w&.-]*(?:\s+[A-Z][\w&.-]*){0,2})")
+
+
+def _words(text):
+    text = re.sub(r"\d+(?:\.\d+)?", " 0 ", text.lower())
+    return re.findall(r"[a-z0-9+#&]+", text)
+
+
+def _features(text):
+    """Hashed feature index -> raw count for one message."""
+    words = _words(text)
+    grams = ['w:' + w for w in words]
+    grams.extend('b:{} {}'.format(a, b) for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = ' {} '.format(w)
+        for n in CHAR_NGRAMS:
+            grams.extend('c:' + padded[i:i + n] for i in range(len(padded) - n + 1))
+    mask = (1 << FEATURE_BITS) - 1
+    counts = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode('utf-8')) & mask
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+class IntentPrediction:
+    """Top intent, its calibrated probability, the full ranking and parameters."""
+
+    __slots__ = ('intent', 'confidence', 'ranking', 'params')
+
+    def __init__(self, intent, confidence, ranking, params):
+        self.intent = intent
+        self.confidence = confidence
+        self.ranking = ranking
+        self.params = params
+
+    def probability(self, intent):
+        return dict(self.ranking).get(intent, 0.0)
+
+    def likely(self, min_probability):
+        """Intents at least ``min_probability`` likely, always including the top one."""
+        return [intent for intent, p in self.ranking if p >= min_probability or intent == self.intent]
+
+    def as_dict(self):
+        return {
+            'intent': self.intent,
+            'confidence': round(self.confidence, 3),
+            'ranking': [(intent, round(p, 3)) for intent, p in self.ranking[:3]],
+            'parameters': dict(self.params),
+        }
+
+
+class IntentClassifier:
+    """TF-IDF nearest-centroid classifier with a calibrated softmax."""
+
+    def __init__(self, examples_path=DEFAULT_EXAMPLES):
+        self.examples_path = examples_path
+        self.labels = []
+        self.temperature = 0.1
+        self._idf = None
+        self._centroids = None
+        self._weights = None
+        self._lock = threading.Lock()
+        self._probabilities = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(examples_path=os.getenv('CHATBOT_INTENT_EXAMPLES', DEFAULT_EXAMPLES))
+
+    @property
+    def trained(self):
+        return self._probabilities is not None
+
+    # ==================== Training ====================
+
+    @staticmethod
+    def load_examples(path):
+        """Read (text, intent, params) triples from a JSONL file."""
+        examples = []
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    examples.append((row['text'], row['intent'], row.get('params') or {}))
+        return examples
+
+    @staticmethod
+    def _example_features(examples):
+        return [_features(mask_company(text, params.get('company'))) for text, _, params in examples]
+
+    def _vectorize(self, rows, idf):
+        matrix = np.zeros((len(rows), 1 << FEATURE_BITS), dtype=np.float32)
+        for i, counts in enumerate(rows):
+            for index, count in counts.items():
+                matrix[i, index] = (1.0 + math.log(count)) * idf[index]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+    def _fit_centroids(self, rows, labels, label_names):
+        df = np.zeros(1 << FEATURE_BITS, dtype=np.float32)
+        for counts in rows:
+            df[list(counts)] += 1
+        idf = (np.log((1.0 + len(rows)) / (1.0 + df)) + 1.0).astype(np.float32)
+        vectors = self._vectorize(rows, idf)
+        targets = np.array([label_names.index(label) for label in labels])
+        centroids = np.stack([vectors[targets == k].mean(axis=0) for k in range(len(label_names))])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+        return idf, centroids
+
+    @staticmethod
+    def _softmax(scores, temperature):
+        z = scores / temperature
+        z -= z.max(axis=-1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=-1, keepdims=True)
+
+    def cross_validate(self, examples, folds=CV_FOLDS):
+        """
+        Out-of-fold cosine scores for ``examples``.
+
+        Returns (label_names, scores, targets) where scores[i] are the scores of
+        example i from a model that did not see it.
+        """
+        label_names = sorted({label for _, label, _ in examples})
+        rows = self._example_features(examples)
+        labels = [label for _, label, _ in examples]
+        targets = np.array([label_names.index(label) for label in labels])
+        scores = np.zeros((len(examples), len(label_names)), dtype=np.float32)
+        # Deterministic interleaved folds keep every label in every fold
+        order = sorted(range(len(examples)), key=lambda i: (labels[i], i))
+        fold_of = {index: position % folds for position, index in enumerate(order)}
+        for fold in range(folds):
+            train = [i for i in range(len(examples)) if fold_of[i] != fold]
+            test = [i for i in range(len(examples)) if fold_of[i] == fold]
+            idf, centroids = self._fit_centroids(
+                [rows[i] for i in train], [labels[i] for i in train], label_names
+            )
+            scores[test] = self._vectorize([rows[i] for i in test], idf) @ centroids.T
+        return label_names, scores, targets
+
+    def fit(self, examples):
+        """Train on (text, intent, params) triples and calibrate the softmax temperature."""
+        from app.chatbot_security import ALLOWED_INTENTS
+
+        missing = set(ALLOWED_INTENTS) - {label for _, label, _ in examples}
+        if missing:
+            raise ValueError("Intent examples missing for: {}".format(", ".join(sorted(missing))))
+
+        label_names, cv_scores, targets = self.cross_validate(examples)
+        # Temperature minimising the out-of-fold negative log likelihood
+        losses = [
+            -np.log(self._softmax(cv_scores, t)[np.arange(len(targets)), targets] + 1e-12).mean()
+            for t in TEMPERATURES
+        ]
+        temperature = float(TEMPERATURES[int(np.argmin(losses))])
+
+        idf, centroids = self._fit_centroids(
+            self._example_features(examples), [label for _, label, _ in examples], label_names
+        )
+        self.labels, self.temperature = label_names, temperature
+        self._idf, self._centroids = idf, centroids
+        # Transposed so scoring a message gathers only the rows of its features
+        self._weights = np.ascontiguousarray(centroids.T)
+        self._probabilities = lru_cache(maxsize=2048)(self._score)
+        logger.info("Intent classifier trained on %d examples, %d intents, temperature %.3f",
+                    len(examples), len(label_names), temperature)
+        return self
+
+    def _ensure_trained(self):
+        if self.trained:
+            return
+        with self._lock:
+            if not self.trained:
+                self.fit(self.load_examples(self.examples_path))
+
+    # ==================== Prediction ====================
+
+    def _score(self, text):
+        counts = _features(text)
+        if not counts:
+            return None
+        index = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        values = np.fromiter(
+            ((1.0 + math.log(c)) for c in counts.values()), dtype=np.float32, count=len(counts)
+        ) * self._idf[index]
+        norm = float(np.sqrt(values @ values))
+        scores = (values / max(norm, 1e-9)) @ self._weights[index]
+        return tuple(self._softmax(scores, self.temperature).tolist())
+
+    def embed(self, text, bits=FEATURE_BITS):
+        """
+        L2-normalised TF-IDF vector of ``text`` for similarity lookups.
+
+        Feature indices are folded into ``2 ** bits`` dimensions so callers can
+        keep many vectors in memory. Returns None for text without features.
+        """
+        self._ensure_trained()
+        counts = _features(text)
+        if not counts:
+            return None
+        vector = np.zeros(1 << bits, dtype=np.float32)
+        mask = (1 << bits) - 1
+        for index, count in counts.items():
+            vector[index & mask] += (1.0 + math.log(count)) * self._idf[index]
+        norm = float(np.sqrt(vector @ vector))
+        return vector / max(norm, 1e-9)
+
+    def predict(self, message, company_names=()):
+        """
+        Classify ``message``.
+
+        ``company_names`` are known (lowercased) company names used to find
+        the company parameter; capitalised names after "at"/"from" are also
+        picked up.
+        """
+        self._ensure_trained()
+        text = re.sub(r"\s+", " ", (message or "")).strip()[:500]
+        params = extract_params(text, company_names)
+        masked = mask_company(text, params.get('company')).lower()
+        probabilities = self._probabilities(masked) if text else None
+        if probabilities is None:
+            return IntentPrediction('general', 0.0, [('general', 0.0)], params)
+        ranking = sorted(zip(self.labels, probabilities), key=lambda item: item[1], reverse=True)
+        intent, confidence = ranking[0]
+        return IntentPrediction(intent, confidence, ranking, params)
+
+
+# ==================== Parameters ====================
+
+def mask_company(text, company):
+    """Replace the company name with a placeholder so names seen in training do not matter."""
+    if not company:
+        return text
+    return re.sub(r"(?<![A-Za-z0-9]){}(?![A-Za-z0-9])".format(re.escape(company)), COMPANY_TOKEN,
+                  text, flags=re.IGNORECASE)
+
+
+def extract_company(message, company_names=()):
+    msg = message.lower()
+    for name in sorted(company_names, key=len, reverse=True):
+        if re.search(r"(?<![a-z0-9]){}(?![a-z0-9])".format(re.escape(name)), msg):
+            return name
+    match = COMPANY_AFTER.search(message)
+    if match:
+        candidate = match.group(1).strip(" .")
+        if not extract_branch(candidate):
+            return candidate
+    return None
+
+
+def extract_branch(message):
+    msg = message.lower()
+    for branch, aliases in BRANCH_ALIASES.items():
+        for alias in aliases:
+            if re.search(r"(?<![a-z]){}(?![a-z])".format(re.escape(alias)), msg):
+                return branch
+    for branch, alias in AMBIGUOUS_BRANCHES.items():
+        if re.search(r"(?<![A-Za-z]){}(?![A-Za-z])".format(alias.upper()), message) \
+                or re.search(r"\b{0} (?:branch|students|department)\b|\bbranch {0}\b".format(alias), msg):
+            return branch
+    return None
+
+
+def extract_cgpa(message):
+    """Return (threshold, comparator) for "above 8 cgpa"-style filters, else (None, None)."""
+    msg = message.lower()
+    if not re.search(r"\b(?:c?gpa|pointer)\b|\d\s*\+", msg):
+        return None, None
+    for pattern, op in ((CGPA_BELOW, '<='), (CGPA_ABOVE, '>=')):
+        match = pattern.search(msg)
+        if match:
+            value = float(next(g for g in match.groups() if g))
+            if value <= 10:
+                return value, op
+    match = CGPA_ANY.search(msg)
+    if match:
+        value = float(next(g for g in match.groups() if g))
+        if value <= 10:
+            return value, '>='
+    return None, None
+
+
+def _package_lpa(phrase):
+    return parse_ctc(phrase).max_lpa
+
+
+def extract_package(message):
+    """
+    Package filters as {'min_lpa', 'max_lpa', 'sort'} (any subset): "above
+    10 LPA", "under 20k/month", "between 6 and 10 lpa", "highest paying".
+    """
+    msg = message.lower()
+    params = {}
+    match = PACKAGE_BETWEEN.search(msg)
+    if match:
+        package = parse_ctc("{}-{}".format(*match.groups()))
+        if package.max_lpa is not None:
+            params['min_lpa'], params['max_lpa'] = package.min_lpa, package.max_lpa
+    else:
+        match = PACKAGE_ABOVE.search(msg)
+        if match:
+            phrase = next(g for g in match.groups() if g)
+            # "10+ lpa": the unit follows the plus sign
+            value = _package_lpa(phrase if match.group(3) is None else phrase + " lpa")
+            if value is not None:
+                params['min_lpa'] = value
+        match = PACKAGE_BELOW.search(msg)
+        if match:
+            value = _package_lpa(next(g for g in match.groups() if g))
+            if value is not None:
+                params['max_lpa'] = value
+    if HIGHEST_PAYING.search(msg):
+        params['sort'] = 'package'
+    return params
+
+
+def extract_params(message, company_names=()):
+    params = {}
+    company = extract_company(message, company_names)
+    if company:
+        params['company'] = company
+    branch = extract_branch(message)
+    if branch:
+        params['branch'] = branch
+    package = extract_package(message)
+    params.update(package)
+    # "10+ lpa" is a package, not a CGPA of 10 or more
+    cgpa, op = extract_cgpa(PACKAGE_ANY.sub(" ", message) if package else message)
+    if cgpa is not None:
+        params['cgpa'] = cgpa
+        params['cgpa_op'] = op
+    return params
+
+
+# Shared classifier, trained on first use
+intent_classifier = IntentClassifier.from_env()
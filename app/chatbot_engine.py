@@ -2,25 +2,51 @@
 Intelligent Chatbot Engine — Gemini-first with DB context injection.
 """
 
+import json
 import logging
 import os
 import re
-import requests
+import time
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import and_, or_
+from flask import current_app
 from requests.exceptions import RequestException, Timeout, ConnectionError as RequestsConnectionError
 
 from app import db
+from app.chatbot_cache import answer_cache
+from app.chatbot_classifier import intent_classifier
+from app.chatbot_fastpath import fast_path, record_tier
+from app.chatbot_health import breakers, health_prober
+from app.chatbot_http import RequestCancelled, get_provider_client
+from app.chatbot_ollama import keep_alive as ollama_keep_alive, record_timings as record_ollama_timings
+from app.chatbot_orchestrator import provider_orchestrator
+from app.chatbot_prefetch import context_prefetcher
+from app.chatbot_prompt import prompt_assembler
+from app.chatbot_retrieval import opportunity_index
+from app.chatbot_router import model_router
+from app.chatbot_semantic_cache import semantic_cache
+from app.chatbot_singleflight import single_flight, SingleFlightTimeout
+from app.chatbot_tools import (
+    ToolRunner, gemini_parts, gemini_tools, has_function_call, merge_tool_call_deltas, mistral_tools,
+    tool_settings,
+)
+from app.chatbot_snapshot import (
+    portal_snapshot, company_label as _company_label, opportunity_line,
+    OPPORTUNITIES, UPCOMING_DRIVES, PLACEMENT_STATS, BRANCH_ANALYTICS, PORTAL_SUMMARY,
+)
 from app.models import User, StudentProfile, Opportunity, Application
+from app import chatbot_queries as queries
+from app.placement_counters import placement_counters
 
 logger = logging.getLogger(__name__)
 
 
-def _company_label(opp):
-    if not opp:
-        return "Unknown Company"
-    return opp.company_name or getattr(opp, "organizer", None) or "Unknown Company"
+class ProviderStreamError(Exception):
+    """Raised by a streaming provider call; ``reason`` uses the same codes as the (answer, error) tuples."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
 
 
 class ChatbotEngine:
@@ -34,6 +60,28 @@ class ChatbotEngine:
         "requirement", "requirements", "criteria", "skills",
     }
 
+    # Context blocks worth sending for each classified intent (student blocks need a login)
+    _INTENT_BLOCKS = {
+        "search_company": ("opportunities", "upcoming_drives"),
+        "browse_opportunities": ("opportunities", "upcoming_drives"),
+        "check_eligibility": ("eligible_opportunities", "opportunities"),
+        "application_status": ("applications",),
+        "upcoming_drives": ("upcoming_drives", "opportunities"),
+        "placement_stats": ("placement_stats",),
+        "branch_analytics": ("branch_analytics", "placement_stats"),
+        "list_applicants": ("opportunities", "placement_stats"),
+        "student_search": ("branch_analytics",),
+        "general": ("opportunities",),
+    }
+    # Blocks built from the logged-in user's own records (prefetchable)
+    _PERSONAL_BLOCKS = frozenset({"student_profile", "eligible_opportunities", "applications"})
+    # Classifier parameters that narrow or order opportunities by package
+    _PACKAGE_PARAMS = ("min_lpa", "max_lpa", "sort")
+    # Runner-up intents at least this likely also contribute their blocks
+    _CONTEXT_MIN_PROBABILITY = 0.2
+    # Admin shortcuts act on the classification only when it is this confident
+    _SHORTCUT_MIN_CONFIDENCE = 0.5
+
     def __init__(self, session=None):
         self.session = session or db.session
         self.gemini_api_key = (
@@ -43,53 +91,67 @@ class ChatbotEngine:
         self.gemini_api_base = os.getenv(
             "GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta"
         ).rstrip("/")
+        self.mistral_api_base = os.getenv("MISTRAL_API_BASE", "https://api.mistral.ai/v1").rstrip("/")
+        self.mistral_model = os.getenv("MISTRAL_MODEL", "mistral-small-latest").strip()
+        self.ollama_api_base = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+        self.ollama_model = os.getenv("OLLAMA_CHAT_MODEL", "").strip()
+        self.tool_calling, self.tool_max_rounds = tool_settings()
+        health_prober.ensure_running()
 
     def process_query(self, user_message, user_id=None, conversation_history=None):
+        """
+        Answer a message through the tiers: greeting, admin shortcuts, the
+        deterministic fast path, the answer cache, the LLM providers and finally
+        the database-only fallback. The response is tagged with its tier.
+        """
+        started = time.monotonic()
+        response, tier = self._process_query(user_message, user_id, conversation_history)
+        if tier:
+            record_tier(response, tier, time.monotonic() - started)
+        return response
+
+    def _process_query(self, user_message, user_id=None, conversation_history=None):
         if not user_message or not isinstance(user_message, str):
-            return self._err("Please provide a valid message.")
+            return self._err("Please provide a valid message."), None
 
         user_message = user_message.strip()
         if not user_message:
-            return self._err("Please provide a valid message.")
+            return self._err("Please provide a valid message."), None
 
         greeting = self._check_greeting(user_message)
         if greeting:
-            return greeting
+            return greeting, "greeting"
 
         try:
             admin_result = self._admin_shortcuts(user_message, user_id)
             if admin_result:
-                return admin_result
-
-            db_context = self._build_db_context(user_message, user_id)
-
-            answer = None
-            method = None
-            provider_errors = {}
-
-            if self.gemini_api_key:
-                answer, gemini_error = self._call_gemini(user_message, db_context, conversation_history)
-                if answer:
-                    method = "gemini"
-                elif gemini_error:
-                    provider_errors["gemini"] = gemini_error
-            else:
-                provider_errors["gemini"] = "missing_api_key"
-
-            if not answer:
-                mistral_key = os.getenv("MISTRAL_API_KEY", "").strip()
-                if mistral_key:
-                    answer, mistral_error = self._call_mistral(
-                        user_message, db_context, mistral_key, conversation_history
-                    )
-                    if answer:
-                        method = "mistral"
-                    elif mistral_error:
-                        provider_errors["mistral"] = mistral_error
-                else:
-                    provider_errors["mistral"] = "missing_api_key"
+                return admin_result, "admin_shortcut"
+
+            fast_answer = fast_path.answer(db, user_message, user_id)
+            if fast_answer:
+                return fast_answer, "fast_path"
+
+            plan = self._build_plan(user_message, user_id, conversation_history)
+            cache_key = self._cache_key(user_message, user_id, plan, conversation_history)
+            cached = answer_cache.get(cache_key) if cache_key else None
+            if cached:
+                cached["cached"] = True
+                return cached, "cache"
+            similar = semantic_cache.get(cache_key, user_message) if cache_key else None
+            if similar:
+                similar["cached"] = True
+                return similar, "semantic_cache"
+
+            # Identical concurrent questions share one provider call
+            (response, provider_errors), coalesced = single_flight.do(
+                cache_key, lambda: self._answer_with_providers(plan, cache_key)
+            )
+            if coalesced:
+                provider_errors = dict(provider_errors)
+                if response is not None:
+                    response = dict(response, coalesced=True)
 
-            if not answer:
+            if response is None:
                 fallback = self._db_only_answer(user_message, user_id)
                 if fallback.get("context") == "ai_unavailable":
                     error_summary = self._format_provider_errors(provider_errors)
@@ -100,50 +162,314 @@ class ChatbotEngine:
                         user_message[:160],
                         error_summary,
                     )
-                return fallback
+                return fallback, "db_fallback"
+            return response, "llm"
 
-            return {
+        except Exception as exc:
+            logger.error("Query processing error: %s", exc, exc_info=True)
+            return self._err("An error occurred while processing your request. Please try again."), None
+
+    def _answer_with_providers(self, plan, cache_key):
+        """
+        Ask the configured providers for an answer to ``plan``.
+
+        Returns (response, provider_errors); response is None when no
+        provider answered. Successful answers are stored in the answer cache.
+        """
+        provider_errors = {}
+        candidates = []
+        if self.gemini_api_key:
+            candidates.append(("gemini", lambda timeout, cancel: self._call_gemini(
+                plan, timeout=timeout, cancel_event=cancel)))
+        else:
+            provider_errors["gemini"] = "missing_api_key"
+
+        mistral_key = os.getenv("MISTRAL_API_KEY", "").strip()
+        if mistral_key:
+            candidates.append(("mistral", lambda timeout, cancel: self._call_mistral(
+                plan, mistral_key, timeout=timeout, cancel_event=cancel)))
+        else:
+            provider_errors["mistral"] = "missing_api_key"
+
+        if self.ollama_model and plan.tools:
+            provider_errors["ollama"] = "no_tool_support"
+        elif self.ollama_model:
+            candidates.append(("ollama", lambda timeout, cancel: self._call_ollama(
+                plan, timeout=timeout, cancel_event=cancel)))
+
+        # Latency-ordered, hedged fallback under one overall deadline
+        started = time.monotonic()
+        method, answer, chain_errors = provider_orchestrator.run(candidates)
+        provider_errors.update(chain_errors)
+        if not answer:
+            return None, provider_errors
+        model_router.record(plan, method, self._model(plan, method), time.monotonic() - started)
+
+        response = {
+            "answer": answer,
+            "success": True,
+            "context": "ai_with_db_context",
+            "intent": "user_query",
+            "extraction_method": method,
+            "usage": prompt_assembler.record(plan, method),
+        }
+        if cache_key:
+            answer_cache.set(cache_key, response)
+            semantic_cache.set(cache_key, plan.user_message, response)
+        return response, provider_errors
+
+    def stream_query(self, user_message, user_id=None, conversation_history=None):
+        """
+        Streaming counterpart of process_query.
+
+        Yields ("delta", text) tuples as the provider generates the answer and
+        finishes with ("done", response) where response has the same shape as
+        process_query's return value. A provider that fails before producing
+        any text falls through to the next one; once text has been sent the
+        answer is finished with whatever was generated.
+        """
+        if not user_message or not isinstance(user_message, str):
+            yield from self._emit_whole(self._err("Please provide a valid message."))
+            return
+
+        user_message = user_message.strip()
+        if not user_message:
+            yield from self._emit_whole(self._err("Please provide a valid message."))
+            return
+
+        started = time.monotonic()
+        greeting = self._check_greeting(user_message)
+        if greeting:
+            yield from self._emit_whole(greeting, "greeting", started)
+            return
+
+        try:
+            admin_result = self._admin_shortcuts(user_message, user_id)
+            if admin_result:
+                yield from self._emit_whole(admin_result, "admin_shortcut", started)
+                return
+
+            fast_answer = fast_path.answer(db, user_message, user_id)
+            if fast_answer:
+                yield from self._emit_whole(fast_answer, "fast_path", started)
+                return
+
+            plan = self._build_plan(user_message, user_id, conversation_history)
+            cache_key = self._cache_key(user_message, user_id, plan, conversation_history)
+            cached = answer_cache.get(cache_key) if cache_key else None
+            if cached:
+                cached["cached"] = True
+                yield from self._emit_whole(cached, "cache", started)
+                return
+            similar = semantic_cache.get(cache_key, user_message) if cache_key else None
+            if similar:
+                similar["cached"] = True
+                yield from self._emit_whole(similar, "semantic_cache", started)
+                return
+
+            # An identical question already streaming elsewhere: wait for its
+            # answer instead of opening another provider stream.
+            flight, leader = None, True
+            if cache_key and single_flight.enabled:
+                flight, leader = single_flight.join(cache_key)
+            if not leader:
+                try:
+                    response, provider_errors = single_flight.wait(flight)
+                except SingleFlightTimeout:
+                    flight, leader = None, True
+                else:
+                    if response is not None:
+                        yield from self._emit_whole(dict(response, coalesced=True), "llm", started)
+                        return
+                    yield from self._emit_fallback(user_message, user_id, dict(provider_errors), started)
+                    return
+
+            outcome = (None, {})
+            try:
+                for event in self._stream_providers(plan, cache_key):
+                    if event[0] == "result":
+                        outcome = event[1]
+                    else:
+                        yield event
+            except GeneratorExit:
+                # The client went away mid-stream; waiting requests stream
+                # the answer themselves rather than share a half-finished one.
+                if flight is not None:
+                    single_flight.finish(cache_key, flight, error=SingleFlightTimeout())
+                    flight = None
+                raise
+            except Exception as exc:
+                if flight is not None:
+                    single_flight.finish(cache_key, flight, error=exc)
+                    flight = None
+                raise
+            finally:
+                if flight is not None:
+                    single_flight.finish(cache_key, flight, result=outcome)
+
+            response, provider_errors = outcome
+            if response is not None:
+                yield "done", record_tier(response, "llm", time.monotonic() - started)
+                return
+            yield from self._emit_fallback(user_message, user_id, provider_errors, started)
+
+        except Exception as exc:
+            logger.error("Streaming query error: %s", exc, exc_info=True)
+            yield from self._emit_whole(
+                self._err("An error occurred while processing your request. Please try again.")
+            )
+
+    def _stream_providers(self, plan, cache_key):
+        """
+        Stream the answer from the first provider that produces text.
+
+        Yields ("delta", text) tuples and finishes with ("result",
+        (response | None, provider_errors)).
+        """
+        provider_errors = {}
+        started = time.monotonic()
+        streams = []
+        if self.gemini_api_key:
+            streams.append(("gemini", lambda timeout: self._stream_gemini(plan, timeout=timeout)))
+        else:
+            provider_errors["gemini"] = "missing_api_key"
+
+        mistral_key = os.getenv("MISTRAL_API_KEY", "").strip()
+        if mistral_key:
+            streams.append(("mistral", lambda timeout: self._stream_mistral(
+                plan, mistral_key, timeout=timeout)))
+        else:
+            provider_errors["mistral"] = "missing_api_key"
+
+        if self.ollama_model and plan.tools:
+            provider_errors["ollama"] = "no_tool_support"
+        elif self.ollama_model:
+            streams.append(("ollama", lambda timeout: self._stream_ollama(plan, timeout=timeout)))
+
+        # Streams are not hedged (text is forwarded as it arrives), but they
+        # follow the orchestrator's latency ordering and the shared deadline.
+        stream_calls = dict(streams)
+        deadline = time.monotonic() + provider_orchestrator.deadline_seconds
+        for method in provider_orchestrator.order([name for name, _ in streams]):
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                provider_errors[method] = "deadline_exceeded"
+                continue
+            breaker = breakers.get(method)
+            if not breaker.allow_request():
+                provider_errors[method] = "circuit_open"
+                continue
+            open_stream = stream_calls[method]
+            chunks = []
+            try:
+                for chunk in open_stream(timeout):
+                    chunks.append(chunk)
+                    yield "delta", chunk
+            except ProviderStreamError as exc:
+                provider_errors[method] = exc.reason
+                breaker.record_failure(exc.reason)
+                if not chunks:
+                    continue
+                logger.warning("%s stream interrupted after partial answer: %s", method, exc.reason)
+            else:
+                breaker.record_success()
+
+            answer = "".join(chunks).strip()
+            if not answer:
+                provider_errors.setdefault(method, "empty_text")
+                continue
+            model_router.record(plan, method, self._model(plan, method), time.monotonic() - started)
+
+            response = {
                 "answer": answer,
                 "success": True,
                 "context": "ai_with_db_context",
                 "intent": "user_query",
                 "extraction_method": method,
+                "usage": prompt_assembler.record(plan, method),
             }
+            # Only complete answers are cached, never ones cut short mid-stream
+            if cache_key and method not in provider_errors:
+                answer_cache.set(cache_key, response)
+                semantic_cache.set(cache_key, plan.user_message, response)
+            yield "result", (response, provider_errors)
+            return
+
+        yield "result", (None, provider_errors)
+
+    def _emit_fallback(self, user_message, user_id, provider_errors, started):
+        """Answer from the database when every provider failed."""
+        fallback = self._db_only_answer(user_message, user_id)
+        if fallback.get("context") == "ai_unavailable":
+            error_summary = self._format_provider_errors(provider_errors)
+            fallback["ai_error"] = error_summary
+            logger.warning(
+                "AI service unavailable | user_id=%s | query=%r | details=%s",
+                user_id,
+                user_message[:160],
+                error_summary,
+            )
+        yield from self._emit_whole(fallback, "db_fallback", started)
+
+    def _build_plan(self, user_message, user_id, conversation_history):
+        """
+        PromptPlan for the providers. In function-calling mode only the
+        student's own profile is sent up front; the model fetches the rest
+        through the tools its role may use.
+        """
+        tools = self._tool_names(user_id)
+        blocks = self._collect_context_blocks(user_message, user_id, profile_only=bool(tools))
+        plan = prompt_assembler.build(user_message, blocks, conversation_history, tools=tools)
+        if tools:
+            plan.tool_runner = ToolRunner(
+                current_app._get_current_object(), user_id, tools, self.tool_max_rounds
+            )
+        return model_router.route(plan)
 
-        except Exception as exc:
-            logger.error("Query processing error: %s", exc, exc_info=True)
-            return self._err("An error occurred while processing your request. Please try again.")
+    def _model(self, plan, provider):
+        """Model ``provider`` answers ``plan`` with (light or full tier)."""
+        full = {"gemini": self.gemini_model, "mistral": self.mistral_model, "ollama": self.ollama_model}[provider]
+        return model_router.model_for(plan, provider, full)
 
-    @staticmethod
-    def _extract_threshold(message):
-        if not message:
+    def _tool_names(self, user_id):
+        """Tools to offer, or None outside function-calling mode (Ollama takes no tools)."""
+        if not self.tool_calling:
             return None
-        num = re.search(r"(\d+(?:\.\d+)?)", message.lower())
-        if not num:
-            return None
-        try:
-            return float(num.group(1))
-        except ValueError:
+        if not (self.gemini_api_key or os.getenv("MISTRAL_API_KEY", "").strip()):
             return None
+        return ToolRunner.available(user_id) or None
+
+    def _cache_key(self, user_message, user_id, plan, history=None):
+        """
+        Answer-cache key. Mid-conversation the key also covers the summary
+        and turns the plan sent, so an answer written with one conversation's
+        history is only reused for the same history, never for another chat.
+        """
+        context = plan.context
+        if plan.tools:
+            # Tool results (applications, eligibility) depend on who asked
+            context = "{}\n[tools user={}]".format(context, user_id)
+        if history:
+            # The system prompt carries the running summary
+            turns = "\n".join("{}: {}".format(t.get("role"), t.get("content")) for t in plan.history)
+            context = "{}\n[history]\n{}\n{}".format(context, plan.system_prompt, turns)
+        return answer_cache.make_key(user_message, self._user_role(user_id), context)
+
+    @staticmethod
+    def _user_role(user_id):
+        if not user_id:
+            return "anonymous"
+        user = User.query.get(user_id)
+        return user.role.lower() if user and user.role else "anonymous"
 
     @staticmethod
-    def _looks_like_cgpa_filter_query(message):
-        msg = (message or "").lower()
-        if ("cgpa" not in msg and "gpa" not in msg):
-            return False
-        if not re.search(r"(\d+(?:\.\d+)?)", msg):
-            return False
-
-        admin_cues = [
-            "student", "students", "list", "show", "find",
-            "more than", "above", "greater than", "at least",
-        ]
-        if any(cue in msg for cue in admin_cues):
-            return True
-
-        if re.search(r"(?:>=|>|<=|<|\+)\s*\d", msg):
-            return True
-        return bool(re.search(r"\d+(?:\.\d+)?\s*\+", msg))
+    def _emit_whole(response, tier=None, started=None):
+        """Emit a non-streamed response as a single delta followed by done."""
+        if tier:
+            record_tier(response, tier, time.monotonic() - started)
+        if response.get("answer"):
+            yield "delta", response["answer"]
+        yield "done", response
 
     @staticmethod
     def _extract_http_error(resp):
@@ -170,62 +496,150 @@ class ChatbotEngine:
             parts.append("{}: {}".format(provider, reason))
         return " | ".join(parts)
 
-    def _call_gemini(self, user_message, db_context, history=None):
-        if not self.gemini_api_key:
-            return None, "missing_api_key"
+    def _gemini_payload(self, plan):
+        contents = []
+        for turn in plan.history:
+            role = "user" if turn.get("role") == "user" else "model"
+            contents.append({"role": role, "parts": [{"text": turn["content"]}]})
+        contents.append({"role": "user", "parts": [{"text": plan.user_turn}]})
+
+        payload = {
+            "systemInstruction": {
+                "role": "system",
+                "parts": [{"text": plan.system_prompt}],
+            },
+            "contents": contents,
+            "generationConfig": {
+                "temperature": 0.5,
+                "topP": 0.95,
+                "maxOutputTokens": plan.max_output_tokens,
+            },
+        }
+        if plan.tools:
+            payload["tools"] = gemini_tools(plan.tools)
+        return payload
 
-        try:
+    @staticmethod
+    def _record_gemini_usage(plan, data):
+        usage = data.get("usageMetadata")
+        if usage:
+            plan.record_usage("gemini", usage.get("promptTokenCount"), usage.get("candidatesTokenCount"))
 
-            system_prompt = self._system_prompt()
-            user_turn = self._build_user_turn(user_message, db_context)
+    @staticmethod
+    def _record_chat_usage(plan, provider, data):
+        """Mistral reports OpenAI-style ``usage``; Ollama reports eval counts."""
+        usage = data.get("usage")
+        if usage:
+            plan.record_usage(provider, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        elif "prompt_eval_count" in data or "eval_count" in data:
+            plan.record_usage(provider, data.get("prompt_eval_count"), data.get("eval_count"))
 
-            contents = []
-            if history:
-                for turn in history[-6:]:
-                    role = "user" if turn.get("role") == "user" else "model"
-                    contents.append({"role": role, "parts": [{"text": turn["content"]}]})
-            contents.append({"role": "user", "parts": [{"text": user_turn}]})
+    @staticmethod
+    def _gemini_text(data):
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return None
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+    def _mistral_payload(self, plan, stream=False):
+        payload = {
+            "model": self._model(plan, "mistral"),
+            "messages": self._chat_messages(plan),
+            "temperature": 0.5,
+            "max_tokens": plan.max_output_tokens,
+            "top_p": 0.95,
+        }
+        if stream:
+            payload["stream"] = True
+        if plan.tools:
+            payload["tools"] = mistral_tools(plan.tools)
+            payload["tool_choice"] = "auto"
+        return payload
 
-            endpoint = "{}/models/{}:generateContent".format(
-                self.gemini_api_base, self.gemini_model
-            )
-            payload = {
-                "systemInstruction": {
-                    "role": "system",
-                    "parts": [{"text": system_prompt}],
-                },
-                "contents": contents,
-                "generationConfig": {
-                    "temperature": 0.5,
-                    "topP": 0.95,
-                    "maxOutputTokens": 900,
-                },
-            }
+    @staticmethod
+    def _chat_messages(plan):
+        """OpenAI-style message list shared by Mistral and Ollama."""
+        messages = [{"role": "system", "content": plan.system_prompt}]
+        for turn in plan.history:
+            messages.append({
+                "role": turn.get("role", "user"),
+                "content": turn["content"]
+            })
+        messages.append({"role": "user", "content": plan.user_turn})
+        return messages
+
+    @staticmethod
+    def _iter_sse_data(resp):
+        """Yield the data field of each Server-Sent Event in a streamed response."""
+        data_lines = []
+        for line in resp.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if not line:
+                if data_lines:
+                    data = "\n".join(data_lines)
+                    data_lines = []
+                    if data.strip() == "[DONE]":
+                        return
+                    yield data
+                continue
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+        if data_lines and "\n".join(data_lines).strip() != "[DONE]":
+            yield "\n".join(data_lines)
+
+    def _call_gemini(self, plan, timeout=25, cancel_event=None):
+        if not self.gemini_api_key:
+            return None, "missing_api_key"
 
-            resp = requests.post(
-                endpoint,
-                params={"key": self.gemini_api_key},
-                json=payload,
-                timeout=25,
+        try:
+            endpoint = "{}/models/{}:generateContent".format(
+                self.gemini_api_base, self._model(plan, "gemini")
             )
-            if resp.status_code != 200:
-                err_detail = self._extract_http_error(resp)
-                logger.warning(
-                    "Gemini request failed | status=%s | model=%s | error=%s",
-                    resp.status_code,
-                    self.gemini_model,
-                    err_detail,
+            payload = self._gemini_payload(plan)
+            deadline = time.monotonic() + min(25, timeout)
+
+            # Function-calling mode: run the requested tools and ask again
+            # until the model answers in text (at most tool_max_rounds rounds)
+            rounds = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Timeout()
+                resp = get_provider_client("gemini").post(
+                    endpoint,
+                    params={"key": self.gemini_api_key},
+                    json=payload,
+                    timeout=remaining,
+                    cancel_event=cancel_event,
                 )
-                return None, "http_{}: {}".format(resp.status_code, err_detail)
-
-            data = resp.json()
-            candidates = data.get("candidates") or []
-            if not candidates:
+                if resp.status_code != 200:
+                    err_detail = self._extract_http_error(resp)
+                    logger.warning(
+                        "Gemini request failed | status=%s | model=%s | error=%s",
+                        resp.status_code,
+                        self._model(plan, "gemini"),
+                        err_detail,
+                    )
+                    return None, "http_{}: {}".format(resp.status_code, err_detail)
+
+                data = resp.json()
+                self._record_gemini_usage(plan, data)
+                parts = gemini_parts(data)
+                if not plan.tool_runner or not has_function_call(parts):
+                    break
+                if plan.tool_runner.exhausted(rounds):
+                    return None, "tool_rounds_exceeded"
+                plan.tool_runner.extend_gemini(payload, parts, rounds)
+                plan.next_round("gemini")
+                rounds += 1
+
+            text = self._gemini_text(data)
+            if text is None:
                 logger.warning("Gemini response missing candidates.")
                 return None, "no_candidates"
 
-            parts = (candidates[0].get("content") or {}).get("parts") or []
-            text = "".join(p.get("text", "") for p in parts if isinstance(p, dict)).strip()
             text = text.replace("```", "").strip()
             if not text:
                 logger.warning("Gemini response text was empty after parsing.")
@@ -233,8 +647,10 @@ class ChatbotEngine:
             return text, None
 
         except Timeout:
-            logger.error("Gemini request timed out after 25 seconds.")
+            logger.error("Gemini request timed out after %.1f seconds.", min(25, timeout))
             return None, "timeout"
+        except RequestCancelled:
+            return None, "cancelled"
         except RequestsConnectionError as exc:
             logger.error("Gemini connection error: %s", exc)
             return None, "connection_error"
@@ -248,327 +664,471 @@ class ChatbotEngine:
             logger.error("Gemini unexpected error: %s", exc, exc_info=True)
             return None, "unexpected_error"
 
-    def _call_mistral(self, user_message, db_context, api_key, history=None):
+    def _stream_gemini(self, plan, timeout=25):
+        """Yield answer text chunks from Gemini's streamGenerateContent (SSE) endpoint."""
+        endpoint = "{}/models/{}:streamGenerateContent".format(
+            self.gemini_api_base, self._model(plan, "gemini")
+        )
+        payload = self._gemini_payload(plan)
+        try:
+            # Function-calling mode: tool rounds happen between streamed
+            # requests; only text parts are forwarded to the caller
+            for rounds in range(self.tool_max_rounds + 1):
+                model_parts = []
+                with get_provider_client("gemini").post(
+                    endpoint,
+                    params={"key": self.gemini_api_key, "alt": "sse"},
+                    json=payload,
+                    timeout=min(25, timeout),
+                    stream=True,
+                ) as resp:
+                    if resp.status_code != 200:
+                        err_detail = self._extract_http_error(resp)
+                        logger.warning(
+                            "Gemini stream failed | status=%s | model=%s | error=%s",
+                            resp.status_code,
+                            self._model(plan, "gemini"),
+                            err_detail,
+                        )
+                        raise ProviderStreamError("http_{}: {}".format(resp.status_code, err_detail))
+
+                    for data in self._iter_sse_data(resp):
+                        chunk = json.loads(data)
+                        if chunk.get("error"):
+                            raise ProviderStreamError("stream_error: {}".format(chunk["error"]))
+                        # Each chunk carries cumulative usage; the last one wins
+                        self._record_gemini_usage(plan, chunk)
+                        model_parts.extend(gemini_parts(chunk))
+                        text = (self._gemini_text(chunk) or "").replace("```", "")
+                        if text:
+                            yield text
+
+                if not plan.tool_runner or not has_function_call(model_parts):
+                    return
+                if plan.tool_runner.exhausted(rounds):
+                    raise ProviderStreamError("tool_rounds_exceeded")
+                plan.tool_runner.extend_gemini(payload, model_parts, rounds)
+                plan.next_round("gemini")
+
+        except Timeout:
+            logger.error("Gemini stream stalled for more than %.1f seconds.", min(25, timeout))
+            raise ProviderStreamError("timeout")
+        except RequestsConnectionError as exc:
+            logger.error("Gemini stream connection error: %s", exc)
+            raise ProviderStreamError("connection_error")
+        except RequestException as exc:
+            logger.error("Gemini stream request exception: %s", exc)
+            raise ProviderStreamError("request_exception")
+        except ValueError as exc:
+            logger.error("Gemini stream returned invalid JSON: %s", exc)
+            raise ProviderStreamError("invalid_json")
+
+    def _call_mistral(self, plan, api_key, timeout=20, cancel_event=None):
+        try:
+            payload = self._mistral_payload(plan)
+            deadline = time.monotonic() + min(20, timeout)
+
+            rounds = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Timeout()
+                resp = get_provider_client("mistral").post(
+                    "{}/chat/completions".format(self.mistral_api_base),
+                    headers={"Authorization": "Bearer {}".format(api_key)},
+                    json=payload,
+                    timeout=remaining,
+                    cancel_event=cancel_event,
+                )
+                if resp.status_code != 200:
+                    err_detail = self._extract_http_error(resp)
+                    logger.warning(
+                        "Mistral request failed | status=%s | error=%s",
+                        resp.status_code,
+                        err_detail,
+                    )
+                    return None, "http_{}: {}".format(resp.status_code, err_detail)
+
+                data = resp.json()
+                self._record_chat_usage(plan, "mistral", data)
+                tool_calls = data["choices"][0]["message"].get("tool_calls")
+                if not plan.tool_runner or not tool_calls:
+                    break
+                if plan.tool_runner.exhausted(rounds):
+                    return None, "tool_rounds_exceeded"
+                plan.tool_runner.extend_chat(payload, tool_calls, rounds)
+                plan.next_round("mistral")
+                rounds += 1
+
+            text = (data["choices"][0]["message"].get("content") or "").strip()
+            text = text.replace("```", "").strip()
+            if not text:
+                logger.warning("Mistral response text was empty after parsing.")
+                return None, "empty_text"
+            return text, None
+
+        except Timeout:
+            logger.error("Mistral request timed out after %.1f seconds.", min(20, timeout))
+            return None, "timeout"
+        except RequestCancelled:
+            return None, "cancelled"
+        except RequestsConnectionError as exc:
+            logger.error("Mistral connection error: %s", exc)
+            return None, "connection_error"
+        except RequestException as exc:
+            logger.error("Mistral request exception: %s", exc)
+            return None, "request_exception"
+        except ValueError as exc:
+            logger.error("Mistral returned invalid JSON: %s", exc)
+            return None, "invalid_json"
+        except Exception as exc:
+            logger.error("Mistral unexpected error: %s", exc, exc_info=True)
+            return None, "unexpected_error"
+
+    def _stream_mistral(self, plan, api_key, timeout=20):
+        """Yield answer text chunks from Mistral chat completions with stream=true (SSE)."""
+        payload = self._mistral_payload(plan, stream=True)
         try:
-            system_prompt = self._system_prompt()
-            user_turn = self._build_user_turn(user_message, db_context)
-
-            messages = [{"role": "system", "content": system_prompt}]
-            if history:
-                for turn in history[-6:]:
-                    messages.append({
-                        "role": turn.get("role", "user"),
-                        "content": turn["content"]
-                    })
-            messages.append({"role": "user", "content": user_turn})
-
-            resp = requests.post(
-                "https://api.mistral.ai/v1/chat/completions",
-                headers={"Authorization": "Bearer {}".format(api_key)},
-                json={
-                    "model": "mistral-small-latest",
-                    "messages": messages,
-                    "temperature": 0.5,
-                    "max_tokens": 900,
-                    "top_p": 0.95,
-                },
-                timeout=20,
+            for rounds in range(self.tool_max_rounds + 1):
+                tool_calls = {}
+                with get_provider_client("mistral").post(
+                    "{}/chat/completions".format(self.mistral_api_base),
+                    headers={"Authorization": "Bearer {}".format(api_key)},
+                    json=payload,
+                    timeout=min(20, timeout),
+                    stream=True,
+                ) as resp:
+                    if resp.status_code != 200:
+                        err_detail = self._extract_http_error(resp)
+                        logger.warning(
+                            "Mistral stream failed | status=%s | error=%s",
+                            resp.status_code,
+                            err_detail,
+                        )
+                        raise ProviderStreamError("http_{}: {}".format(resp.status_code, err_detail))
+
+                    for data in self._iter_sse_data(resp):
+                        chunk = json.loads(data)
+                        # The final chunk carries the usage totals
+                        self._record_chat_usage(plan, "mistral", chunk)
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        delta = choices[0].get("delta") or {}
+                        merge_tool_call_deltas(tool_calls, delta.get("tool_calls"))
+                        text = (delta.get("content") or "").replace("```", "")
+                        if text:
+                            yield text
+
+                if not plan.tool_runner or not tool_calls:
+                    return
+                if plan.tool_runner.exhausted(rounds):
+                    raise ProviderStreamError("tool_rounds_exceeded")
+                plan.tool_runner.extend_chat(payload, [tool_calls[i] for i in sorted(tool_calls)], rounds)
+                plan.next_round("mistral")
+
+        except Timeout:
+            logger.error("Mistral stream stalled for more than %.1f seconds.", min(20, timeout))
+            raise ProviderStreamError("timeout")
+        except RequestsConnectionError as exc:
+            logger.error("Mistral stream connection error: %s", exc)
+            raise ProviderStreamError("connection_error")
+        except RequestException as exc:
+            logger.error("Mistral stream request exception: %s", exc)
+            raise ProviderStreamError("request_exception")
+        except ValueError as exc:
+            logger.error("Mistral stream returned invalid JSON: %s", exc)
+            raise ProviderStreamError("invalid_json")
+
+    def _ollama_payload(self, plan, stream):
+        return {
+            "model": self._model(plan, "ollama"),
+            "messages": self._chat_messages(plan),
+            "stream": stream,
+            # Keep the model resident between questions instead of reloading it
+            "keep_alive": ollama_keep_alive(),
+            "options": {"temperature": 0.5, "top_p": 0.95, "num_predict": plan.max_output_tokens},
+        }
+
+    def _call_ollama(self, plan, timeout=30, cancel_event=None):
+        try:
+            resp = get_provider_client("ollama").post(
+                "{}/api/chat".format(self.ollama_api_base),
+                json=self._ollama_payload(plan, stream=False),
+                timeout=min(30, timeout),
+                cancel_event=cancel_event,
             )
             if resp.status_code != 200:
                 err_detail = self._extract_http_error(resp)
                 logger.warning(
-                    "Mistral request failed | status=%s | error=%s",
+                    "Ollama request failed | status=%s | model=%s | error=%s",
                     resp.status_code,
+                    self._model(plan, "ollama"),
                     err_detail,
                 )
                 return None, "http_{}: {}".format(resp.status_code, err_detail)
 
             data = resp.json()
-            text = data["choices"][0]["message"]["content"].strip()
-            text = text.replace("```", "").strip()
+            self._record_chat_usage(plan, "ollama", data)
+            record_ollama_timings(data, self._model(plan, "ollama"))
+            text = ((data.get("message") or {}).get("content") or "").replace("```", "").strip()
             if not text:
-                logger.warning("Mistral response text was empty after parsing.")
+                logger.warning("Ollama response text was empty after parsing.")
                 return None, "empty_text"
             return text, None
 
         except Timeout:
-            logger.error("Mistral request timed out after 20 seconds.")
+            logger.error("Ollama request timed out after %.1f seconds.", min(30, timeout))
             return None, "timeout"
+        except RequestCancelled:
+            return None, "cancelled"
         except RequestsConnectionError as exc:
-            logger.error("Mistral connection error: %s", exc)
+            logger.error("Ollama connection error: %s", exc)
             return None, "connection_error"
         except RequestException as exc:
-            logger.error("Mistral request exception: %s", exc)
+            logger.error("Ollama request exception: %s", exc)
             return None, "request_exception"
         except ValueError as exc:
-            logger.error("Mistral returned invalid JSON: %s", exc)
+            logger.error("Ollama returned invalid JSON: %s", exc)
             return None, "invalid_json"
         except Exception as exc:
-            logger.error("Mistral unexpected error: %s", exc, exc_info=True)
+            logger.error("Ollama unexpected error: %s", exc, exc_info=True)
             return None, "unexpected_error"
 
-    def _system_prompt(self):
-        return (
-            "You are TPC Ask, an intelligent assistant for a college Training & Placement Cell (TPC).\n\n"
-            "YOUR ROLE:\n"
-            "- Help students find job/internship opportunities, check eligibility, track applications,\n"
-            "  understand deadlines, and get placement advice.\n"
-            "- Help admins get analytics, student lists, and placement statistics.\n\n"
-            "HOW TO USE THE DATABASE CONTEXT:\n"
-            "- You will receive a DATABASE CONTEXT section with real, live data from the portal.\n"
-            "- Always prioritise this data over your general knowledge.\n"
-            "- If the context contains relevant information, use it directly and specifically.\n"
-            "- If the context is empty or irrelevant, say so honestly and offer general placement guidance.\n\n"
-            "RESPONSE STYLE:\n"
-            "- Be concise, friendly, and specific. Use bullet points for lists.\n"
-            "- Always mention real company names, CTCs, deadlines from the context when available.\n"
-            "- If the student asks a follow-up, use the conversation history to answer coherently.\n"
-            "- Never make up data. If something is not in the context, say you do not have that info.\n"
-            "- Keep answers under 400 words unless the user asks for a detailed breakdown.\n"
-        )
+    def _stream_ollama(self, plan, timeout=30):
+        """Yield answer text chunks from Ollama's /api/chat (newline-delimited JSON)."""
+        try:
+            with get_provider_client("ollama").post(
+                "{}/api/chat".format(self.ollama_api_base),
+                json=self._ollama_payload(plan, stream=True),
+                timeout=min(30, timeout),
+                stream=True,
+            ) as resp:
+                if resp.status_code != 200:
+                    err_detail = self._extract_http_error(resp)
+                    logger.warning(
+                        "Ollama stream failed | status=%s | model=%s | error=%s",
+                        resp.status_code,
+                        self._model(plan, "ollama"),
+                        err_detail,
+                    )
+                    raise ProviderStreamError("http_{}: {}".format(resp.status_code, err_detail))
+
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise ProviderStreamError("stream_error: {}".format(chunk["error"]))
+                    text = ((chunk.get("message") or {}).get("content") or "").replace("```", "")
+                    if text:
+                        yield text
+                    if chunk.get("done"):
+                        self._record_chat_usage(plan, "ollama", chunk)
+                        record_ollama_timings(chunk, self._model(plan, "ollama"))
+                        return
 
-    def _build_user_turn(self, user_message, db_context):
-        ctx = db_context.strip() if db_context else "No specific database records found for this query."
-        sep = "=" * 60
-        return (
-            "DATABASE CONTEXT (live data from the placement portal):\n"
-            "{sep}\n"
-            "{ctx}\n"
-            "{sep}\n\n"
-            "STUDENT/USER QUESTION: {msg}\n\n"
-            "Please answer using the database context above. "
-            "If the context does not contain enough information, say so and give general guidance."
-        ).format(sep=sep, ctx=ctx, msg=user_message)
-
-    def _build_db_context(self, user_message, user_id=None):
+        except Timeout:
+            logger.error("Ollama stream stalled for more than %.1f seconds.", min(30, timeout))
+            raise ProviderStreamError("timeout")
+        except RequestsConnectionError as exc:
+            logger.error("Ollama stream connection error: %s", exc)
+            raise ProviderStreamError("connection_error")
+        except RequestException as exc:
+            logger.error("Ollama stream request exception: %s", exc)
+            raise ProviderStreamError("request_exception")
+        except ValueError as exc:
+            logger.error("Ollama stream returned invalid JSON: %s", exc)
+            raise ProviderStreamError("invalid_json")
+
+    def _collect_context_blocks(self, user_message, user_id=None, profile_only=False):
+        """
+        Collect the database context for a message as (key, text) blocks for
+        the prompt assembler. Portal-wide blocks come from the shared portal
+        snapshot and the opportunity index; only the logged-in student's
+        profile, eligibility and applications are queried per request, unless
+        the chat page already prefetched them. With ``profile_only`` (function-calling mode) just the student
+        profile is collected.
+        """
         parts = []
-        msg = user_message.lower()
-
-        # Student profile
+        wanted = set()
+        package = {}
+        if not profile_only:
+            prediction = intent_classifier.predict(user_message)
+            for intent in prediction.likely(self._CONTEXT_MIN_PROBABILITY):
+                wanted.update(self._INTENT_BLOCKS.get(intent, ()))
+            package = {k: v for k, v in prediction.params.items() if k in self._PACKAGE_PARAMS}
+
+        # The logged-in user's own blocks: prefetched when the chat page
+        # opened, or queried now
+        personal = {}
         if user_id:
+            personal = context_prefetcher.blocks(user_id)
+            if personal is None:
+                personal = self.user_context_blocks(
+                    user_id, {"student_profile"} | (wanted & self._PERSONAL_BLOCKS)
+                )
+        if personal.get("student_profile"):
+            parts.append(("student_profile", personal["student_profile"]))
+
+        # A package range or "highest paying" in the question: the matching
+        # open postings, filtered and sorted in SQL
+        if package and "opportunities" in wanted:
             try:
-                user = User.query.get(user_id)
-                profile = StudentProfile.query.filter_by(user_id=user_id).first()
-                if user and profile:
-                    parts.append(
-                        "[LOGGED-IN STUDENT]\n"
-                        "  Name   : {}\n"
-                        "  Branch : {}\n"
-                        "  CGPA   : {}\n"
-                        "  Skills : {}\n"
-                        "  Resume : {}".format(
-                            user.username,
-                            profile.branch,
-                            profile.cgpa,
-                            profile.skills or "Not specified",
-                            "Uploaded" if profile.resume_link else "Not uploaded",
-                        )
-                    )
+                parts.append(("package_opportunities", self._package_block(package)))
             except Exception:
                 pass
 
-        # Opportunities
-        placement_words = [
-            "opportunit", "job", "opening", "intern", "drive", "recruit",
-            "compan", "apply", "eligib", "deadline", "upcoming", "position",
-            "ctc", "salary", "package", "placement", "hire", "hiring",
-        ]
-        generic_words = ["what", "show", "list", "find", "tell"]
-        off_topic = all(w not in msg for w in placement_words)
-
-        if not off_topic or any(w in msg for w in generic_words):
+        # Opportunities: the postings most relevant to the question, or the
+        # most recent ones when no posting matches its words
+        if "opportunities" in wanted:
             try:
-                opps = Opportunity.query.order_by(Opportunity.created_at.desc()).limit(20).all()
-                if opps:
-                    lines = ["[OPPORTUNITIES - {} most recent]".format(len(opps))]
-                    for o in opps[:12]:
-                        dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
-                        days_left = ""
-                        if o.deadline:
-                            days_left = "{}d left".format((o.deadline - datetime.utcnow()).days)
-                        ctc = "{} {}".format(chr(8377), o.ctc) if o.ctc else "Not disclosed"
-                        lines.append(
-                            "  * [{}] {} @ {} | CTC: {} | Deadline: {} {} | Min CGPA: {} | Branches: {}".format(
-                                o.type,
-                                o.title,
-                                _company_label(o),
-                                ctc,
-                                dl,
-                                days_left,
-                                o.min_cgpa or "None",
-                                o.allowed_branches or "All",
-                            )
-                        )
-                    if len(opps) > 12:
-                        lines.append("  ... and {} more in the portal.".format(len(opps) - 12))
-                    parts.append("\n".join(lines))
+                block = opportunity_index.context_block(user_message) or portal_snapshot.get(OPPORTUNITIES)
+                if block:
+                    parts.append(("opportunities", block))
             except Exception:
                 pass
 
-        # Eligible opportunities
-        eligib_words = ["eligib", "qualify", "can i apply", "suitable", "my profile"]
-        if user_id and any(w in msg for w in eligib_words):
+        for key in ("eligible_opportunities", "applications"):
+            if key in wanted and personal.get(key):
+                parts.append((key, personal[key]))
+
+        # Upcoming drives
+        if "upcoming_drives" in wanted:
             try:
-                profile = StudentProfile.query.filter_by(user_id=user_id).first()
-                if profile:
-                    eligible = Opportunity.query.filter(
-                        and_(
-                            or_(
-                                Opportunity.min_cgpa <= profile.cgpa,
-                                Opportunity.min_cgpa.is_(None),
-                            ),
-                            or_(
-                                Opportunity.allowed_branches.contains(profile.branch),
-                                Opportunity.allowed_branches.is_(None),
-                            ),
-                            Opportunity.deadline > datetime.utcnow(),
-                        )
-                    ).all()
-                    if eligible:
-                        lines = ["[ELIGIBLE OPPORTUNITIES for {} / CGPA {}]".format(
-                            profile.branch, profile.cgpa
-                        )]
-                        for o in eligible[:8]:
-                            dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
-                            lines.append("  * {} @ {} | Deadline: {}".format(
-                                o.title, _company_label(o), dl
-                            ))
-                        parts.append("\n".join(lines))
-                    else:
-                        parts.append("[ELIGIBLE OPPORTUNITIES] None found matching your profile right now.")
+                block = portal_snapshot.get(UPCOMING_DRIVES)
+                if block:
+                    parts.append(("upcoming_drives", block))
             except Exception:
                 pass
 
-        # Student applications
-        app_words = ["application", "applied", "status", "track", "my application"]
-        if user_id and any(w in msg for w in app_words):
+        # Placement statistics
+        if "placement_stats" in wanted:
             try:
-                apps = Application.query.filter_by(student_id=user_id).order_by(
-                    Application.applied_at.desc()
-                ).all()
-                if apps:
-                    status_counts = {}
-                    lines = ["[YOUR APPLICATIONS - {} total]".format(len(apps))]
-                    for app in apps[:10]:
-                        opp = Opportunity.query.get(app.opportunity_id)
-                        status_counts[app.status] = status_counts.get(app.status, 0) + 1
-                        company = _company_label(opp) if opp else "Unknown"
-                        title = opp.title if opp else "N/A"
-                        lines.append("  * {} @ {} -> {}".format(title, company, app.status))
-                    summary = ", ".join("{}: {}".format(s, c) for s, c in status_counts.items())
-                    lines.append("  Summary: {}".format(summary))
-                    parts.append("\n".join(lines))
-                else:
-                    parts.append("[YOUR APPLICATIONS] No applications found yet.")
+                parts.append(("placement_stats", portal_snapshot.get(PLACEMENT_STATS)))
             except Exception:
                 pass
 
-        # Upcoming drives
-        drive_words = ["upcoming", "drive", "recruit", "next week", "next month", "deadline", "soon"]
-        if any(w in msg for w in drive_words):
+        # Branch analytics
+        if "branch_analytics" in wanted:
             try:
-                upcoming = (
-                    Opportunity.query.filter(Opportunity.deadline > datetime.utcnow())
-                    .order_by(Opportunity.deadline)
-                    .limit(10)
-                    .all()
-                )
-                if upcoming:
-                    lines = ["[UPCOMING DRIVES - next {}]".format(len(upcoming))]
-                    for o in upcoming:
-                        dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
-                        days = (o.deadline - datetime.utcnow()).days if o.deadline else "?"
-                        lines.append("  * {} @ {} | {} ({} days left)".format(
-                            o.title, _company_label(o), dl, days
-                        ))
-                    parts.append("\n".join(lines))
+                block = portal_snapshot.get(BRANCH_ANALYTICS)
+                if block:
+                    parts.append(("branch_analytics", block))
             except Exception:
                 pass
 
-        # Placement statistics
-        stat_words = ["statistic", "stat", "placement rate", "placed", "how many", "percentage", "rate"]
-        if any(w in msg for w in stat_words):
+        # Portal snapshot fallback
+        if not parts and not profile_only:
             try:
-                total_students = StudentProfile.query.count()
-                placed = (
-                    db.session.query(Application)
-                    .filter_by(status="Selected")
-                    .distinct(Application.student_id)
-                    .count()
-                )
-                total_apps = Application.query.count()
-                pending = Application.query.filter_by(status="Applied").count()
-                rate = (placed / total_students * 100) if total_students else 0
-                total_opps = Opportunity.query.count()
-                parts.append(
-                    "[PLACEMENT STATISTICS]\n"
-                    "  Total students     : {}\n"
-                    "  Placed students    : {}\n"
-                    "  Placement rate     : {:.1f}%\n"
-                    "  Total opportunities: {}\n"
-                    "  Total applications : {}\n"
-                    "  Pending (Applied)  : {}".format(
-                        total_students, placed, rate, total_opps, total_apps, pending
-                    )
-                )
+                parts.append(("portal_summary", portal_snapshot.get(PORTAL_SUMMARY)))
             except Exception:
                 pass
 
-        # Branch analytics
-        if "branch" in msg and any(w in msg for w in ["analytic", "analysis", "stat", "breakdown"]):
-            try:
-                rows = (
-                    db.session.query(
-                        StudentProfile.branch,
-                        db.func.count(StudentProfile.id),
-                        db.func.avg(StudentProfile.cgpa),
+        return parts
+
+    @staticmethod
+    def _package_block(package, limit=10):
+        """Open opportunities in the asked package range, highest paying first."""
+        low, high = package.get("min_lpa"), package.get("max_lpa")
+        opps = queries.open_opportunities(min_lpa=low, max_lpa=high, sort="package", limit=limit)
+        scope = ""
+        if low is not None:
+            scope += " >= {:g} LPA".format(low)
+        if high is not None:
+            scope += " <= {:g} LPA".format(high)
+        if not opps:
+            return "[OPPORTUNITIES BY PACKAGE{}] None open in that range.".format(scope)
+        now = datetime.utcnow()
+        lines = ["[OPPORTUNITIES BY PACKAGE{} - highest paying first]".format(scope)]
+        lines.extend(opportunity_line(o, now) for o in opps)
+        return "\n".join(lines)
+
+    def user_context_blocks(self, user_id, wanted=None):
+        """
+        The logged-in user's own context blocks as {key: text}: the student
+        card, eligible opportunities and applications (``wanted`` limits
+        which; all of them by default). Used per question and by the
+        context prefetcher.
+        """
+        wanted = self._PERSONAL_BLOCKS if wanted is None else wanted
+        blocks = {}
+        profile = None
+
+        # Student profile
+        try:
+            user = User.query.get(user_id)
+            profile = StudentProfile.query.filter_by(user_id=user_id).first()
+            if "student_profile" in wanted and user and profile:
+                blocks["student_profile"] = (
+                    "[LOGGED-IN STUDENT]\n"
+                    "  Name   : {}\n"
+                    "  Branch : {}\n"
+                    "  CGPA   : {}\n"
+                    "  Skills : {}\n"
+                    "  Resume : {}".format(
+                        user.username,
+                        profile.branch,
+                        profile.cgpa,
+                        profile.skills or "Not specified",
+                        "Uploaded" if profile.resume_link else "Not uploaded",
                     )
-                    .group_by(StudentProfile.branch)
-                    .all()
                 )
-                if rows:
-                    lines = ["[BRANCH ANALYTICS]"]
-                    for branch, cnt, avg_cgpa in rows:
-                        lines.append("  * {}: {} students, avg CGPA {:.2f}".format(
-                            branch, cnt, avg_cgpa
+        except Exception:
+            pass
+
+        # Eligible opportunities
+        if profile and "eligible_opportunities" in wanted:
+            try:
+                # Highest paying first, ordered and cut to 8 in SQL
+                eligible = queries.eligible_opportunities(profile, limit=8, sort="package")
+                if eligible:
+                    lines = ["[ELIGIBLE OPPORTUNITIES for {} / CGPA {} - highest paying first]".format(
+                        profile.branch, profile.cgpa
+                    )]
+                    for o in eligible:
+                        dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
+                        lines.append("  * {} @ {} | CTC: {} | Deadline: {}".format(
+                            o.title, _company_label(o), o.package_label or o.ctc or "Not disclosed", dl
                         ))
-                    parts.append("\n".join(lines))
+                    blocks["eligible_opportunities"] = "\n".join(lines)
+                else:
+                    blocks["eligible_opportunities"] = (
+                        "[ELIGIBLE OPPORTUNITIES] None found matching your profile right now."
+                    )
             except Exception:
                 pass
 
-        # Portal snapshot fallback
-        if not parts:
+        # Student applications
+        if "applications" in wanted:
             try:
-                total_opps = Opportunity.query.count()
-                active_opps = Opportunity.query.filter(
-                    Opportunity.deadline > datetime.utcnow()
-                ).count()
-                total_students = StudentProfile.query.count()
-                parts.append(
-                    "[PORTAL SNAPSHOT]\n"
-                    "  Total opportunities: {} ({} still open)\n"
-                    "  Total students: {}\n"
-                    "  Placement cell is active.".format(
-                        total_opps, active_opps, total_students
-                    )
-                )
+                # Summary over all applications, details for the latest ten
+                status_counts = queries.status_counts(user_id)
+                if status_counts:
+                    lines = ["[YOUR APPLICATIONS - {} total]".format(sum(status_counts.values()))]
+                    for app in queries.student_applications(user_id, limit=10):
+                        opp = app.opportunity
+                        company = _company_label(opp) if opp else "Unknown"
+                        title = opp.title if opp else "N/A"
+                        lines.append("  * {} @ {} -> {}".format(title, company, app.status))
+                    summary = ", ".join("{}: {}".format(s, c) for s, c in status_counts.items())
+                    lines.append("  Summary: {}".format(summary))
+                    blocks["applications"] = "\n".join(lines)
+                else:
+                    blocks["applications"] = "[YOUR APPLICATIONS] No applications found yet."
             except Exception:
                 pass
 
-        return "\n\n".join(parts)
+        return blocks
 
     def _admin_shortcuts(self, message, user_id):
-        msg = message.lower()
-        if self._looks_like_cgpa_filter_query(msg):
-            threshold = self._extract_threshold(msg)
-            if threshold is not None:
-                if not user_id:
-                    return self._denied("Please log in as an admin to search students by CGPA.")
-                user = User.query.get(user_id)
-                is_admin = user and user.role.lower() == "admin"
-                if is_admin:
-                    return self._students_by_cgpa(threshold)
-                return self._denied("Student CGPA searches are available to admins only.")
+        prediction = intent_classifier.predict(message)
+        if prediction.confidence < self._SHORTCUT_MIN_CONFIDENCE:
+            return None
+        params = prediction.params
+
+        if prediction.intent == "student_search" and "cgpa" in params:
+            return self._cgpa_search(params, user_id)
 
         if not user_id:
             return None
@@ -576,32 +1136,34 @@ class ChatbotEngine:
         user = User.query.get(user_id)
         is_admin = user and user.role.lower() == "admin"
 
-        if "student" in msg and any(k in msg for k in ["list", "show", "all", "students"]):
+        if prediction.intent == "student_search":
             if is_admin:
-                return self._list_students()
+                return self._list_students(params.get("branch"))
             return self._denied("Student listings are available to admins only.")
 
-        if "applicants" in msg and "list" in msg:
+        if prediction.intent == "list_applicants":
             if is_admin:
-                return self._list_applicants()
+                return self._list_applicants(params.get("company"))
             return self._denied("Listing all applicants is an admin-only action.")
 
         return None
 
+    def _cgpa_search(self, params, user_id):
+        if not user_id:
+            return self._denied("Please log in as an admin to search students by CGPA.")
+        user = User.query.get(user_id)
+        if user and user.role.lower() == "admin":
+            return self._students_by_cgpa(params["cgpa"], params.get("cgpa_op", ">="), params.get("branch"))
+        return self._denied("Student CGPA searches are available to admins only.")
+
     def _db_only_answer(self, message, user_id=None):
-        msg = message.lower()
-
-        if self._looks_like_cgpa_filter_query(msg):
-            threshold = self._extract_threshold(msg)
-            if threshold is not None:
-                if not user_id:
-                    return self._denied("Please log in as an admin to search students by CGPA.")
-                user = User.query.get(user_id)
-                if user and user.role.lower() == "admin":
-                    return self._students_by_cgpa(threshold)
-                return self._denied("Student CGPA searches are available to admins only.")
-
-        if any(w in msg for w in ["upcoming", "drive", "drives", "recruit"]):
+        prediction = intent_classifier.predict(message)
+        intent = prediction.intent
+
+        if intent == "student_search" and "cgpa" in prediction.params:
+            return self._cgpa_search(prediction.params, user_id)
+
+        if intent == "upcoming_drives":
             upcoming = (
                 Opportunity.query.filter(Opportunity.deadline > datetime.utcnow())
                 .order_by(Opportunity.deadline)
@@ -616,7 +1178,18 @@ class ChatbotEngine:
                 lines.append("* {} @ {} - deadline {}".format(o.title, _company_label(o), dl))
             return self._ok("\n".join(lines), "upcoming_drives")
 
-        if any(w in msg for w in ["opportunit", "job", "opening", "intern"]):
+        package = {k: v for k, v in prediction.params.items() if k in self._PACKAGE_PARAMS}
+        if package and intent in ("search_company", "browse_opportunities", "check_eligibility"):
+            low, high = package.get("min_lpa"), package.get("max_lpa")
+            opps = queries.open_opportunities(min_lpa=low, max_lpa=high, sort="package", limit=6)
+            if not opps:
+                return self._ok("No open opportunities in that package range.", "search")
+            lines = ["Open opportunities by package, highest first:"]
+            for o in opps:
+                lines.append("* {} @ {} - {}".format(o.title, _company_label(o), o.package_label or "CTC not disclosed"))
+            return self._ok("\n".join(lines), "search")
+
+        if intent in ("search_company", "browse_opportunities", "check_eligibility"):
             opps = Opportunity.query.order_by(Opportunity.created_at.desc()).limit(6).all()
             if not opps:
                 return self._ok("No opportunities found.", "search")
@@ -625,26 +1198,21 @@ class ChatbotEngine:
                 lines.append("* {} @ {}".format(o.title, _company_label(o)))
             return self._ok("\n".join(lines), "search")
 
-        if user_id and any(w in msg for w in ["application", "applied", "status"]):
-            apps = Application.query.filter_by(student_id=user_id).all()
+        if user_id and intent == "application_status":
+            apps = queries.student_applications(user_id)
             if not apps:
                 return self._ok("You haven't applied to any opportunities yet.", "application_status")
             lines = ["You have {} application(s):".format(len(apps))]
             for app in apps[:8]:
-                opp = Opportunity.query.get(app.opportunity_id)
+                opp = app.opportunity
                 lines.append("* {} @ {} -> {}".format(
                     opp.title if opp else "N/A", _company_label(opp), app.status
                 ))
             return self._ok("\n".join(lines), "application_status")
 
-        if any(w in msg for w in ["stat", "placement", "rate", "placed"]):
-            total = StudentProfile.query.count()
-            placed = (
-                db.session.query(Application)
-                .filter_by(status="Selected")
-                .distinct(Application.student_id)
-                .count()
-            )
+        if intent in ("placement_stats", "branch_analytics"):
+            counts = placement_counters.totals()
+            total, placed = counts["profiles"], counts["placed"]
             rate = (placed / total * 100) if total else 0
             return self._ok(
                 "Placement stats:\n* Total students: {}\n* Placed: {}\n* Rate: {:.1f}%".format(
@@ -695,30 +1263,31 @@ class ChatbotEngine:
             return {"answer": resp, "success": True, "context": "greeting", "intent": None}
         return None
 
-    def _students_by_cgpa(self, threshold):
-        rows = (
+    def _students_by_cgpa(self, threshold, op=">=", branch=None):
+        query = (
             db.session.query(User.username, User.email, StudentProfile.branch, StudentProfile.cgpa)
             .join(StudentProfile, StudentProfile.user_id == User.id)
-            .filter(StudentProfile.cgpa >= threshold)
-            .order_by(StudentProfile.cgpa.desc())
-            .limit(25)
-            .all()
+            .filter(StudentProfile.cgpa <= threshold if op == "<=" else StudentProfile.cgpa >= threshold)
         )
+        if branch:
+            query = query.filter(StudentProfile.branch.ilike(branch))
+        rows = query.order_by(StudentProfile.cgpa.desc()).limit(25).all()
+        label = "CGPA {} {}".format(op, threshold) + (" in {}".format(branch) if branch else "")
         if not rows:
-            return self._ok("No students found with CGPA >= {}.".format(threshold), "student_search")
-        lines = ["Students with CGPA >= {}:".format(threshold)]
+            return self._ok("No students found with {}.".format(label), "student_search")
+        lines = ["Students with {}:".format(label)]
         for s in rows:
             lines.append("* {} ({}) - {}, CGPA {}".format(s.username, s.email, s.branch, s.cgpa))
         return self._ok("\n".join(lines), "student_search")
 
-    def _list_students(self):
-        rows = (
+    def _list_students(self, branch=None):
+        query = (
             db.session.query(User.username, User.email, StudentProfile.branch, StudentProfile.cgpa)
             .join(StudentProfile, StudentProfile.user_id == User.id)
-            .order_by(User.username)
-            .limit(25)
-            .all()
         )
+        if branch:
+            query = query.filter(StudentProfile.branch.ilike(branch))
+        rows = query.order_by(User.username).limit(25).all()
         if not rows:
             return self._ok("No students found.", "list_students")
         lines = ["Students:"]
@@ -726,14 +1295,15 @@ class ChatbotEngine:
             lines.append("* {} ({}) - {}, CGPA {}".format(s.username, s.email, s.branch, s.cgpa))
         return self._ok("\n".join(lines), "list_students")
 
-    def _list_applicants(self):
-        rows = (
+    def _list_applicants(self, company=None):
+        query = (
             db.session.query(User.username, User.email, Application.status, Opportunity.title)
             .join(Application, Application.student_id == User.id)
             .join(Opportunity, Opportunity.id == Application.opportunity_id, isouter=True)
-            .limit(25)
-            .all()
         )
+        if company:
+            query = query.filter(Opportunity.company_name.ilike("%{}%".format(company)))
+        rows = query.limit(25).all()
         if not rows:
             return self._ok("No applicants found.", "list_applicants")
         lines = ["Applicants:"]
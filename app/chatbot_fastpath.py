@@ -0,0 +1,281 @@
+"""
+Deterministic fast path for the chatbot.
+
+Most chat traffic is a handful of structured questions ("upcoming drives",
+"my application status", "placement stats", ...). The local intent
+classifier (app.chatbot_classifier) recognises them. When it is confident, the question is answered by
+SecureIntentRouter (with its role checks and parameter sanitising) and the
+result is rendered through a fixed template, with no LLM call. Anything open-ended
+("how should I prepare for...", "compare ...") or ambiguous escalates to the
+LLM tier as before.
+
+Each answer is tagged with the tier that produced it (greeting,
+admin_shortcut, fast_path, cache, llm, db_fallback) and per-tier hit counts
+and latencies are reported by /chatbot/api/metrics.
+
+Configuration:
+    CHATBOT_FAST_PATH             1/0 to enable or disable the fast path (default 1)
+    CHATBOT_FAST_PATH_THRESHOLD   minimum calibrated classifier confidence (default 0.9)
+"""
+
+import logging
+import os
+from datetime import datetime
+
+from app.chatbot_classifier import intent_classifier
+from app.chatbot_metrics import metrics
+from app.chatbot_snapshot import portal_snapshot, COMPANY_NAMES
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('greeting', 'admin_shortcut', 'fast_path', 'cache', 'semantic_cache', 'llm', 'db_fallback')
+
+def classify_message(message, company_names=()):
+    """
+    Guess the structured intent of a message with the local intent classifier.
+
+    Returns (intent, confidence, parameters); intent is None when the top
+    intent is not one SecureIntentRouter answers (greeting, advice, ...).
+    """
+    prediction = intent_classifier.predict(message, company_names)
+    intent, confidence, params = prediction.intent, prediction.confidence, prediction.params
+    if intent not in RENDERERS:
+        return None, confidence, params
+    if intent == 'search_company' and 'company' not in params:
+        return None, confidence, params
+    if 'company' in params and intent != 'search_company':
+        # The router handlers for other intents ignore the company filter
+        confidence *= 0.5
+    return intent, round(confidence, 3), params
+
+
+# ==================== Templates ====================
+
+def _date(iso_value):
+    if not iso_value:
+        return "N/A"
+    try:
+        return datetime.fromisoformat(iso_value).strftime("%Y-%m-%d")
+    except ValueError:
+        return iso_value
+
+
+def _package_range(params):
+    """" paying at least 6 LPA" (or "") for the package range of a question."""
+    low, high = params.get('min_lpa'), params.get('max_lpa')
+    if low is not None and high is not None:
+        return " paying {:g}-{:g} LPA".format(low, high)
+    if low is not None:
+        return " paying at least {:g} LPA".format(low)
+    if high is not None:
+        return " paying up to {:g} LPA".format(high)
+    return ""
+
+
+def _ordering(params):
+    return ", highest paying first" if params.get('sort') == 'package' else ""
+
+
+def _ctc(r):
+    return r.get('package') or r.get('ctc') or "Not disclosed"
+
+
+def _render_search_company(data, params):
+    results = data.get('results') or []
+    company = params.get('company', '').title()
+    scope = _package_range(params)
+    if not results:
+        return "No opportunities from {}{} are listed right now.".format(company, scope)
+    lines = ["Found {} opportunit{} from {}{}{}:".format(
+        len(results), "y" if len(results) == 1 else "ies", company, scope, _ordering(params)
+    )]
+    for r in results:
+        lines.append("* **{}** ({}) | CTC: {} | Deadline: {}".format(
+            r['title'], r.get('type') or "N/A", _ctc(r), _date(r.get('deadline'))
+        ))
+    return "\n".join(lines)
+
+
+def _render_check_eligibility(data, params):
+    results = data.get('eligible') or []
+    if data.get('count') is None:
+        # Not a student, or the profile is incomplete
+        return None
+    scope = _package_range(params)
+    if not results:
+        return "No open opportunities{} match your CGPA and branch right now. Check back as new drives are posted.".format(
+            scope
+        )
+    lines = ["You are eligible for {} open opportunit{}{}{}:".format(
+        len(results), "y" if len(results) == 1 else "ies", scope, _ordering(params)
+    )]
+    for r in results:
+        lines.append("* **{}** @ {} | CTC: {} | Min CGPA: {} | Deadline: {}".format(
+            r['title'], r.get('company') or "Unknown Company", _ctc(r), r.get('min_cgpa') or "None",
+            _date(r.get('deadline'))
+        ))
+    return "\n".join(lines)
+
+
+def _render_application_status(data, params):
+    results = data.get('applications') or []
+    if not results:
+        return "You haven't applied to any opportunities yet."
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    lines = ["You have {} application(s):".format(len(results))]
+    for r in results:
+        lines.append("* **{}** @ {} -> {}".format(r.get('title') or "N/A", r.get('company') or "Unknown", r['status']))
+    lines.append("Summary: {}".format(", ".join("{}: {}".format(s, c) for s, c in counts.items())))
+    return "\n".join(lines)
+
+
+def _render_upcoming_drives(data, params):
+    results = data.get('drives') or []
+    if not results:
+        return "No recruitment drives are scheduled in the next 30 days."
+    lines = ["{} drive(s) in the next 30 days:".format(len(results))]
+    for r in results:
+        lines.append("* **{}** @ {} | Deadline: {} ({} days left) | CTC: {}".format(
+            r['title'], r.get('company') or "Unknown Company", _date(r.get('deadline')),
+            r.get('days_left'), _ctc(r)
+        ))
+    return "\n".join(lines)
+
+
+def _render_placement_stats(data, params):
+    stats = data.get('stats') or {}
+    if not stats:
+        return None
+    lines = [
+        "Placement statistics:",
+        "* Total students: {}".format(stats['total_students']),
+        "* Placed students: {}".format(stats['placed_students']),
+        "* Placement rate: {}".format(stats['placement_rate']),
+        "* Total applications: {}".format(stats['total_applications']),
+        "* Avg applications per student: {}".format(stats['avg_applications_per_student']),
+    ]
+    by_status = stats.get('by_status') or {}
+    if by_status:
+        lines.append("* By status: {}".format(", ".join("{}: {}".format(s, c) for s, c in by_status.items())))
+    return "\n".join(lines)
+
+
+def _render_list_applicants(data, params):
+    results = data.get('applicants') or []
+    if not results:
+        return "No applications have been submitted yet."
+    lines = ["Latest {} applicant(s):".format(len(results))]
+    for r in results:
+        lines.append("* {} ({}) | CGPA: {} | {}".format(r['name'], r['email'], r['cgpa'], r['status']))
+    return "\n".join(lines)
+
+
+def _render_branch_analytics(data, params):
+    analytics = data.get('analytics') or {}
+    if not analytics:
+        return "No branch data is available yet."
+    lines = ["Branch analytics:"]
+    for branch, row in sorted(analytics.items(), key=lambda item: str(item[0])):
+        lines.append("* **{}**: {} students, avg CGPA {}, {} applications, {} placed".format(
+            branch, row['students'], row['avg_cgpa'], row['applications'], row['placed']
+        ))
+    return "\n".join(lines)
+
+
+RENDERERS = {
+    'search_company': _render_search_company,
+    'check_eligibility': _render_check_eligibility,
+    'application_status': _render_application_status,
+    'upcoming_drives': _render_upcoming_drives,
+    'placement_stats': _render_placement_stats,
+    'list_applicants': _render_list_applicants,
+    'branch_analytics': _render_branch_analytics,
+}
+
+
+class FastPath:
+    """Answers confidently classified structured questions via SecureIntentRouter."""
+
+    def __init__(self, enabled=True, threshold=0.9):
+        self.enabled = enabled
+        self.threshold = threshold
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('CHATBOT_FAST_PATH', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            threshold=float(os.getenv('CHATBOT_FAST_PATH_THRESHOLD', '0.9')),
+        )
+
+    def answer(self, db, message, user_id=None):
+        """Return a templated response dict, or None to escalate to the next tier."""
+        if not self.enabled:
+            return None
+        from app.chatbot_intent_router import SecureIntentRouter
+
+        try:
+            company_names = portal_snapshot.get(COMPANY_NAMES) or ()
+        except Exception:
+            company_names = ()
+        intent, confidence, params = classify_message(message, company_names)
+        if intent is None:
+            return None
+        if confidence < self.threshold:
+            metrics.incr('fast_path.low_confidence')
+            return None
+
+        result = SecureIntentRouter(db).route_intent(intent, params, user_id)
+        if not result.get('success'):
+            # Permission denied or handler failure: let the next tier answer
+            metrics.incr('fast_path.router_declined')
+            logger.debug("Fast path declined %s: %s", intent, result.get('error'))
+            return None
+
+        answer = RENDERERS[intent](result.get('data') or {}, params)
+        if answer is None:
+            metrics.incr('fast_path.router_declined')
+            return None
+        return {
+            "answer": answer,
+            "success": True,
+            "context": intent,
+            "intent": intent,
+            "confidence": "high",
+            "classifier_confidence": confidence,
+            "extraction_method": "fast_path",
+        }
+
+
+def record_tier(response, tier, seconds):
+    """Tag ``response`` with the tier that produced it and record its latency."""
+    response["tier"] = tier
+    metrics.incr('tier.{}.hits'.format(tier))
+    metrics.observe('tier.{}.latency'.format(tier), seconds * 1000)
+    return response
+
+
+def tier_stats():
+    total = sum(metrics.counter('tier.{}.hits'.format(tier)) for tier in TIERS)
+    report = {}
+    for tier in TIERS:
+        hits = metrics.counter('tier.{}.hits'.format(tier))
+        name = 'tier.{}.latency'.format(tier)
+        p50, p95 = metrics.percentile(name, 50), metrics.percentile(name, 95)
+        report[tier] = {
+            'hits': hits,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'p50_ms': round(p50, 2) if p50 is not None else None,
+            'p95_ms': round(p95, 2) if p95 is not None else None,
+        }
+    return {
+        'requests': total,
+        'tiers': report,
+        'fast_path_low_confidence': metrics.counter('fast_path.low_confidence'),
+        'fast_path_router_declined': metrics.counter('fast_path.router_declined'),
+    }
+
+
+# Shared fast path
+fast_path = FastPath.from_env()
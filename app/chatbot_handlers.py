@@ -3,10 +3,12 @@ Example SQLAlchemy handlers for chatbot intent execution.
 Demonstrating proper database queries for the placement portal.
 """
 
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, func
 from datetime import datetime, timedelta
-from app.models import User, StudentProfile, Opportunity, Application, Job
+from app.models import User, StudentProfile, Opportunity
 from app import db
+from app import chatbot_queries as queries
+from app.placement_counters import placement_counters
 
 
 # ==================== Example Security Handlers ====================
@@ -38,29 +40,18 @@ def get_student_profile(student_id: int) -> dict:
     }
 
 
-def get_eligible_opportunities(student_id: int, limit: int = 10) -> list:
+def get_eligible_opportunities(student_id: int, limit: int = 10, sort: str = None) -> list:
     """
     Get opportunities student is eligible for.
     Example of filtered query with business logic.
+    sort='package' lists the highest paying first, ordered in SQL.
     """
     profile = StudentProfile.query.filter_by(user_id=student_id).first()
     if not profile:
         return []
     
     # Find opportunities matching criteria
-    eligible = Opportunity.query.filter(
-        and_(
-            or_(
-                Opportunity.min_cgpa <= profile.cgpa,
-                Opportunity.min_cgpa.is_(None)
-            ),
-            or_(
-                Opportunity.allowed_branches.contains(profile.branch),
-                Opportunity.allowed_branches.is_(None)
-            ),
-            Opportunity.deadline > datetime.utcnow()
-        )
-    ).limit(limit).all()
+    eligible = queries.eligible_opportunities(profile, limit=limit, sort=sort)
     
     return [
         {
@@ -68,6 +59,7 @@ def get_eligible_opportunities(student_id: int, limit: int = 10) -> list:
             'title': opp.title,
             'company': opp.company_name,
             'ctc': opp.ctc,
+            'package': opp.package_label,
             'deadline': opp.deadline.isoformat() if opp.deadline else None,
             'type': opp.type,
         }
@@ -80,17 +72,12 @@ def count_applications_by_status(student_id: int) -> dict:
     Count student's applications grouped by status.
     Example of aggregation query.
     """
-    applications = Application.query.filter_by(student_id=student_id).all()
-    
-    status_counts = {}
-    for app in applications:
-        status = app.status
-        status_counts[status] = status_counts.get(status, 0) + 1
+    status_counts = queries.status_counts(student_id)
     
     return {
-        'total': len(applications),
+        'total': sum(status_counts.values()),
         'by_status': status_counts,
-        'placement_status': 'Placed' if any(app.status == 'Selected' for app in applications) else 'Not Placed'
+        'placement_status': 'Placed' if status_counts.get('Selected') else 'Not Placed'
     }
 
 
@@ -110,6 +97,7 @@ def search_companies(company_name: str, limit: int = 10) -> list:
             'opportunity': opp.title,
             'type': opp.type,
             'ctc': opp.ctc,
+            'package': opp.package_label,
             'deadline': opp.deadline.isoformat() if opp.deadline else None,
         })
     
@@ -121,28 +109,12 @@ def get_branch_statistics(branch: str = None) -> dict:
     Get statistics for a branch.
     Example of complex aggregation.
     """
-    if branch:
-        profiles = StudentProfile.query.filter_by(branch=branch).all()
-    else:
-        profiles = StudentProfile.query.all()
+    # Students, CGPA, applications and placements from the in-memory counters
+    total_students, avg_cgpa, total_applications, placed_count = placement_counters.branch_totals(branch)
     
-    if not profiles:
+    if not total_students:
         return {'message': 'No students found', 'stats': {}}
     
-    total_students = len(profiles)
-    total_cgpa = sum(p.cgpa for p in profiles)
-    avg_cgpa = total_cgpa / total_students if total_students > 0 else 0
-    
-    # Calculate placements
-    placed_count = 0
-    total_applications = 0
-    
-    for profile in profiles:
-        applications = Application.query.filter_by(student_id=profile.user_id).all()
-        total_applications += len(applications)
-        if any(app.status == 'Selected' for app in applications):
-            placed_count += 1
-    
     return {
         'branch': branch or 'All Branches',
         'stats': {
@@ -193,21 +165,16 @@ def get_admin_dashboard_stats() -> dict:
     Get overall placement statistics.
     ADMIN ONLY - Must enforce role check before calling.
     """
-    total_students = User.query.filter_by(role='Student').count()
+    counts = placement_counters.totals()
+    total_students = counts['students']
     total_companies = Opportunity.query.distinct(Opportunity.company_name).count()
-    total_applications = Application.query.count()
     
     # Count by status
-    statuses = {}
-    for status in ['Applied', 'Shortlisted', 'Selected', 'Rejected']:
-        statuses[status] = Application.query.filter_by(status=status).count()
+    statuses = {status: counts['by_status'].get(status, 0) for status in queries.STATUSES}
+    total_applications = counts['applications']
     
     # Calculate placement rate
-    placed_count = db.session.query(
-        Application.student_id
-    ).filter(
-        Application.status == 'Selected'
-    ).distinct().count()
+    placed_count = counts['placed']
     
     placement_rate = (placed_count / total_students * 100) if total_students > 0 else 0
     
@@ -226,21 +193,11 @@ def get_recent_applications(limit: int = 50) -> list:
     Get recent applications across all students.
     ADMIN ONLY - Must enforce role check before calling.
     """
-    applications = Application.query.order_by(
-        Application.applied_at.desc()
-    ).limit(limit).all()
+    # Student, profile and company come joined in, not one lookup per application
+    rows = queries.recent_applicants(limit)
     
     results = []
-    for app in applications:
-        student = User.query.get(app.student_id)
-        profile = StudentProfile.query.filter_by(user_id=app.student_id).first()
-        
-        company = None
-        if app.opportunity:
-            company = app.opportunity.company_name
-        elif app.job:
-            company = app.job.company_name
-        
+    for app, student, profile, company in rows:
         results.append({
             'student_name': student.username if student else 'Unknown',
             'company': company,
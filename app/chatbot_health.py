@@ -0,0 +1,291 @@
+"""
+Circuit breakers and a background health prober for the LLM providers.
+
+Each provider has a breaker with three states:
+    closed     requests flow normally; consecutive failures are counted
+    open       requests are skipped until the cooldown has elapsed
+    half_open  one trial request is let through; success closes the
+               breaker, failure opens it again
+
+Real calls report their outcome to the breaker, and a daemon thread probes
+each configured provider with a free metadata request (Gemini model info,
+Mistral model list, Ollama tags) so the request path never has to ask
+"are you up?" itself.
+
+Configuration:
+    CHATBOT_BREAKER_THRESHOLD / <PROVIDER>_BREAKER_THRESHOLD  failures before opening (default 3)
+    CHATBOT_BREAKER_COOLDOWN / <PROVIDER>_BREAKER_COOLDOWN    seconds to stay open (default 30)
+    CHATBOT_HEALTH_PROBE_INTERVAL                             seconds between probes (default 30, 0 disables)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from app.chatbot_http import get_provider_client
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def _env_setting(provider, key, default):
+    for name in ('{}_BREAKER_{}'.format(provider.upper(), key), 'CHATBOT_BREAKER_{}'.format(key)):
+        raw = os.getenv(name, '').strip()
+        if raw:
+            try:
+                return float(raw)
+            except ValueError:
+                logger.warning("Ignoring invalid %s=%r", name, raw)
+    return default
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one provider."""
+
+    def __init__(self, name, failure_threshold=3, cooldown_seconds=30.0):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = cooldown_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._last_error = None
+        self._transitions = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._transition(HALF_OPEN, 'cooldown_elapsed')
+
+    def _transition(self, new_state, reason):
+        if new_state == self._state:
+            return
+        old_state = self._state
+        self._state = new_state
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        if new_state != HALF_OPEN:
+            self._trial_started = None
+        if new_state == CLOSED:
+            self._failures = 0
+        self._transitions.append({
+            'at': datetime.utcnow().isoformat() + 'Z',
+            'from': old_state,
+            'to': new_state,
+            'reason': reason,
+        })
+        metrics.incr('breaker.{}.{}'.format(self.name, new_state))
+        log = logger.warning if new_state == OPEN else logger.info
+        log("Circuit breaker %s: %s -> %s (%s)", self.name, old_state, new_state, reason)
+
+    def allow_request(self):
+        """True if a call may be made now; in half-open state only one trial at a time."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                metrics.incr('breaker.{}.rejected'.format(self.name))
+                return False
+            now = time.monotonic()
+            # A trial whose outcome never came back (e.g. cancelled) expires after a cooldown
+            if self._trial_started is None or now - self._trial_started >= self.cooldown_seconds:
+                self._trial_started = now
+                return True
+            metrics.incr('breaker.{}.rejected'.format(self.name))
+            return False
+
+    def record_success(self, reason='call_ok'):
+        with self._lock:
+            self._failures = 0
+            self._last_error = None
+            self._maybe_half_open()
+            if self._state != CLOSED:
+                self._transition(CLOSED, reason)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._last_error = error
+            self._maybe_half_open()
+            if self._state == HALF_OPEN:
+                self._transition(OPEN, 'trial_failed: {}'.format(error))
+                return
+            self._failures += 1
+            if self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._transition(OPEN, 'failures={}: {}'.format(self._failures, error))
+            elif self._state == OPEN:
+                # Still failing while open: restart the cooldown
+                self._opened_at = time.monotonic()
+
+    def record_probe(self, ok, error=None):
+        """Probe results close a half-open/cooled-down breaker or count as failures."""
+        if ok:
+            with self._lock:
+                self._maybe_half_open()
+                if self._state == HALF_OPEN:
+                    self._transition(CLOSED, 'probe_ok')
+                if self._state == CLOSED:
+                    self._failures = 0
+                    self._last_error = None
+        else:
+            self.record_failure('probe: {}'.format(error))
+
+    def snapshot(self):
+        with self._lock:
+            self._maybe_half_open()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = round(max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown_seconds,
+                'retry_in_seconds': retry_in,
+                'last_error': self._last_error,
+                'transitions': list(self._transitions),
+            }
+
+
+class BreakerRegistry:
+    """Per-provider breakers, created on first use with env-configured thresholds."""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(
+                        name,
+                        failure_threshold=_env_setting(name, 'THRESHOLD', 3),
+                        cooldown_seconds=_env_setting(name, 'COOLDOWN', 30.0),
+                    )
+        return breaker
+
+    def snapshot(self):
+        return {name: breaker.snapshot() for name, breaker in list(self._breakers.items())}
+
+
+breakers = BreakerRegistry()
+
+
+# ==================== Probes ====================
+
+def _probe_gemini():
+    api_key = (os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY') or '').strip()
+    base = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
+    model = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash').strip()
+    resp = get_provider_client('gemini').get(
+        '{}/models/{}'.format(base, model), params={'key': api_key}, timeout=5, retries=0
+    )
+    return resp.status_code == 200, 'http_{}'.format(resp.status_code)
+
+
+def _probe_mistral():
+    base = os.getenv('MISTRAL_API_BASE', 'https://api.mistral.ai/v1').rstrip('/')
+    resp = get_provider_client('mistral').get(
+        '{}/models'.format(base),
+        headers={'Authorization': 'Bearer {}'.format(os.getenv('MISTRAL_API_KEY', '').strip())},
+        timeout=5,
+        retries=0,
+    )
+    return resp.status_code == 200, 'http_{}'.format(resp.status_code)
+
+
+def _probe_ollama():
+    base = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434').rstrip('/')
+    resp = get_provider_client('ollama').get('{}/api/tags'.format(base), timeout=2, retries=0)
+    return resp.status_code == 200, 'http_{}'.format(resp.status_code)
+
+
+def configured_probes():
+    """Probes for the providers that are configured in this environment."""
+    probes = {}
+    if (os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY') or '').strip():
+        probes['gemini'] = _probe_gemini
+    if os.getenv('MISTRAL_API_KEY', '').strip():
+        probes['mistral'] = _probe_mistral
+    if os.getenv('OLLAMA_CHAT_MODEL', '').strip():
+        probes['ollama'] = _probe_ollama
+    return probes
+
+
+class HealthProber:
+    """Daemon thread that keeps the breakers fresh; one per worker process."""
+
+    def __init__(self, registry, interval_seconds=30.0):
+        self.registry = registry
+        self.interval_seconds = interval_seconds
+        self.last_run = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, registry):
+        return cls(registry, float(os.getenv('CHATBOT_HEALTH_PROBE_INTERVAL', '30')))
+
+    def ensure_running(self):
+        """Start the probe thread if this process does not have one yet (safe after fork)."""
+        if self.interval_seconds <= 0:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='llm-health-prober', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def probe_once(self):
+        for name, probe in configured_probes().items():
+            try:
+                ok, detail = probe()
+            except Exception as exc:
+                ok, detail = False, type(exc).__name__
+            self.registry.get(name).record_probe(ok, None if ok else detail)
+            metrics.incr('probe.{}.{}'.format(name, 'ok' if ok else 'failed'))
+        self.last_run = datetime.utcnow().isoformat() + 'Z'
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as exc:
+                logger.error("Health probe run failed: %s", exc, exc_info=True)
+            self._stop.wait(self.interval_seconds)
+
+    def snapshot(self):
+        return {
+            'interval_seconds': self.interval_seconds,
+            'running': bool(self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()),
+            'last_run': self.last_run,
+        }
+
+
+health_prober = HealthProber.from_env(breakers)
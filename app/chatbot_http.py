@@ -0,0 +1,198 @@
+"""
+Pooled HTTP clients for the chatbot's LLM providers (Gemini, Mistral, Ollama).
+
+Each provider gets one keep-alive ``requests.Session`` per worker process, so
+repeated chat messages reuse TCP/TLS connections instead of paying a fresh
+handshake every time. Requests are retried with jittered exponential backoff
+on connection failures and 429/5xx responses.
+
+Configuration (environment variables, provider-specific value wins):
+    CHATBOT_HTTP_POOL_SIZE / <PROVIDER>_HTTP_POOL_SIZE             default 10
+    CHATBOT_HTTP_CONNECT_TIMEOUT / <PROVIDER>_HTTP_CONNECT_TIMEOUT default 3.05 s
+    CHATBOT_HTTP_RETRIES / <PROVIDER>_HTTP_RETRIES                 default 2
+    CHATBOT_HTTP_BACKOFF / <PROVIDER>_HTTP_BACKOFF                 default 0.25 s
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, RequestException
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 4.0
+
+
+def _env_number(provider, key, default, cast=float):
+    for name in ('{}_HTTP_{}'.format(provider.upper(), key), 'CHATBOT_HTTP_{}'.format(key)):
+        raw = os.getenv(name, '').strip()
+        if raw:
+            try:
+                return cast(raw)
+            except ValueError:
+                logger.warning("Ignoring invalid %s=%r", name, raw)
+    return default
+
+
+class RequestCancelled(RequestException):
+    """The caller gave up on this request (e.g. another provider answered first)."""
+
+
+class ProviderClient:
+    """Keep-alive session, timeouts and retry policy for one provider."""
+
+    def __init__(self, name, pool_size=10, connect_timeout=3.05, retries=2, backoff=0.25):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        # Retries are handled here (with jitter and metrics), not by urllib3
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+
+    @classmethod
+    def from_env(cls, name):
+        return cls(
+            name,
+            pool_size=_env_number(name, 'POOL_SIZE', 10, int),
+            connect_timeout=_env_number(name, 'CONNECT_TIMEOUT', 3.05),
+            retries=_env_number(name, 'RETRIES', 2, int),
+            backoff=_env_number(name, 'BACKOFF', 0.25),
+        )
+
+    def request(self, method, url, timeout=25, retries=None, cancel_event=None, **kwargs):
+        """
+        Send a request through the pooled session.
+
+        ``timeout`` is the read timeout in seconds; the connect timeout comes
+        from the client configuration. Read timeouts are not retried (the
+        provider may still be generating), connection errors and 429/5xx
+        responses are. Once ``cancel_event`` is set no further attempt is
+        made and RequestCancelled is raised. Exceptions are the usual
+        ``requests`` ones.
+        """
+        retries = self.retries if retries is None else retries
+        prefix = 'http.{}'.format(self.name)
+        attempt = 0
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                metrics.incr(prefix + '.cancelled')
+                raise RequestCancelled('{} request cancelled'.format(self.name))
+            started = time.monotonic()
+            metrics.incr(prefix + '.requests')
+            try:
+                resp = self.session.request(
+                    method, url, timeout=(self.connect_timeout, timeout), **kwargs
+                )
+            except RequestsConnectionError as exc:
+                metrics.incr(prefix + '.connection_errors')
+                if attempt >= retries:
+                    raise
+                logger.debug("%s connection error, retrying: %s", self.name, exc)
+                attempt += 1
+                self._sleep_backoff(attempt)
+                continue
+            except requests.exceptions.Timeout:
+                metrics.incr(prefix + '.timeouts')
+                raise
+            finally:
+                metrics.observe(prefix + '.latency', (time.monotonic() - started) * 1000)
+
+            metrics.incr('{}.status_{}'.format(prefix, resp.status_code))
+            if resp.status_code in RETRY_STATUSES and attempt < retries:
+                retry_after = self._retry_after(resp)
+                resp.close()
+                attempt += 1
+                metrics.incr(prefix + '.retries')
+                logger.debug("%s returned %s, retry %s/%s", self.name, resp.status_code, attempt, retries)
+                self._sleep_backoff(attempt, retry_after)
+                continue
+            return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _sleep_backoff(self, attempt, minimum=0.0):
+        # Full jitter: uniform in [0, base * 2^(attempt-1)], never below Retry-After
+        ceiling = min(MAX_BACKOFF_SECONDS, self.backoff * (2 ** (attempt - 1)))
+        time.sleep(max(minimum, random.uniform(0, ceiling)))
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return min(MAX_BACKOFF_SECONDS, float(resp.headers.get('Retry-After', 0)))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def connection_stats(self):
+        """Connections opened vs requests served by this client's urllib3 pools."""
+        opened = served = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            served += pool.num_requests
+        return {
+            'connections_opened': opened,
+            'requests_sent': served,
+            'connections_reused': max(0, served - opened),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_provider_client(name):
+    """Return this worker's shared client for ``name`` ('gemini', 'mistral', 'ollama')."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = ProviderClient.from_env(name)
+    return client
+
+
+def provider_client_stats():
+    """Per-provider request, retry, error and connection metrics for reporting."""
+    stats = {}
+    for name, client in list(_clients.items()):
+        prefix = 'http.{}'.format(name)
+        snap = metrics.snapshot(prefix + '.')
+        stats[name] = {
+            'counters': {k[len(prefix) + 1:]: v for k, v in snap['counters'].items()},
+            'latency': snap['latency'].get(prefix + '.latency'),
+            'pool': client.connection_stats(),
+        }
+    return stats
+
+
+def _reset_after_fork():
+    # Sessions must not be shared with a parent process (gunicorn --preload)
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
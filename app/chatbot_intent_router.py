@@ -6,9 +6,11 @@ Implements role-based access control and input validation.
 import logging
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from sqlalchemy import and_
 
-from app.models import User, StudentProfile, Opportunity, Application, Job
+from app.models import User, StudentProfile, Opportunity
+from app import chatbot_queries as queries
+from app.placement_counters import placement_counters
 from app.chatbot_security import (
     ALLOWED_INTENTS,
     INTENT_PERMISSIONS,
@@ -111,10 +113,12 @@ class SecureIntentRouter:
         if not company:
             return {'message': 'Please specify a company name.', 'results': []}
         
-        # Search opportunities
-        opps = Opportunity.query.filter(
-            Opportunity.company_name.ilike(f'%{company}%')
-        ).limit(limit).all()
+        # Search opportunities, optionally within a package range / highest paying first
+        query = Opportunity.query.filter(
+            Opportunity.company_name.ilike(f'%{company}%'),
+            *Opportunity.package_filter(params.get('min_lpa'), params.get('max_lpa'))
+        )
+        opps = queries.sort_opportunities(query, params.get('sort')).limit(limit).all()
         
         results = []
         for opp in opps:
@@ -124,6 +128,7 @@ class SecureIntentRouter:
                 'company': opp.company_name,
                 'type': opp.type,
                 'ctc': opp.ctc,
+                'package': opp.package_label,
                 'deadline': opp.deadline.isoformat() if opp.deadline else None,
                 'mode': opp.mode,
             })
@@ -147,19 +152,10 @@ class SecureIntentRouter:
             return {'message': 'Student profile incomplete', 'eligible': []}
         
         # Find eligible opportunities
-        eligible = Opportunity.query.filter(
-            and_(
-                or_(
-                    Opportunity.min_cgpa <= profile.cgpa,
-                    Opportunity.min_cgpa.is_(None)
-                ),
-                or_(
-                    Opportunity.allowed_branches.contains(profile.branch),
-                    Opportunity.allowed_branches.is_(None)
-                ),
-                Opportunity.deadline > datetime.utcnow()
-            )
-        ).limit(params.get('limit', 10)).all()
+        eligible = queries.eligible_opportunities(
+            profile, limit=params.get('limit', 10),
+            min_lpa=params.get('min_lpa'), max_lpa=params.get('max_lpa'), sort=params.get('sort'),
+        )
         
         results = []
         for opp in eligible:
@@ -168,6 +164,8 @@ class SecureIntentRouter:
                 'title': opp.title,
                 'company': opp.company_name,
                 'type': opp.type,
+                'ctc': opp.ctc,
+                'package': opp.package_label,
                 'min_cgpa': opp.min_cgpa,
                 'deadline': opp.deadline.isoformat() if opp.deadline else None,
                 'your_cgpa': round(profile.cgpa, 2),
@@ -188,26 +186,12 @@ class SecureIntentRouter:
         if user.role.lower() == 'student' and student_id != user_id:
             return {'message': 'Cannot view other student applications', 'applications': []}
         
-        applications = Application.query.filter_by(student_id=student_id).all()
+        # Opportunities and jobs come joined in, not one lookup per application
+        applications = queries.student_applications(student_id)
         
         results = []
         for app in applications:
-            opp = None
-            company = None
-            title = None
-            ctc = None
-            
-            if app.opportunity_id:
-                opp = Opportunity.query.get(app.opportunity_id)
-                company = opp.company_name if opp else 'Unknown'
-                title = opp.title if opp else 'Unknown'
-                ctc = opp.ctc if opp else None
-            elif app.job_id:
-                job = Job.query.get(app.job_id)
-                company = job.company_name if job else 'Unknown'
-                title = 'Job Opening'
-                ctc = job.ctc if job else None
-            
+            company, title, ctc = queries.application_target(app)
             results.append({
                 'id': app.id,
                 'company': company,
@@ -247,6 +231,7 @@ class SecureIntentRouter:
                 'deadline': drive.deadline.isoformat() if drive.deadline else None,
                 'days_left': max(0, days_left),
                 'ctc': drive.ctc,
+                'package': drive.package_label,
             })
         
         return {
@@ -261,23 +246,14 @@ class SecureIntentRouter:
         if not user or user.role.lower() != 'admin':
             return {'message': 'Admin access required', 'stats': {}}
         
-        total_students = User.query.filter_by(role='Student').count()
-        total_applications = Application.query.count()
-        
-        # Count by status
-        statuses = {}
-        for status in ['Applied', 'Shortlisted', 'Selected', 'Rejected']:
-            count = Application.query.filter_by(status=status).count()
-            statuses[status] = count
+        # Maintained in memory, no counting queries per question
+        counts = placement_counters.totals()
+        total_students = counts['students']
+        statuses = {status: counts['by_status'].get(status, 0) for status in queries.STATUSES}
+        total_applications = counts['applications']
         
         # Placed students (have at least one 'Selected' application)
-        placed_query = self.db.session.query(
-            Application.student_id
-        ).filter(
-            Application.status == 'Selected'
-        ).distinct()
-        
-        placed_count = placed_query.count()
+        placed_count = counts['placed']
         
         return {
             'message': 'Placement Statistics',
@@ -300,15 +276,11 @@ class SecureIntentRouter:
         # Can filter by company or limit
         limit = params.get('limit', 50)
         
-        applications = Application.query.join(
-            User, Application.student_id == User.id
-        ).order_by(Application.applied_at.desc()).limit(limit).all()
+        # Applicant and profile come joined in, not one lookup per application
+        rows = queries.recent_applicants(limit)
         
         results = []
-        for app in applications:
-            student = User.query.get(app.student_id)
-            profile = StudentProfile.query.filter_by(user_id=app.student_id).first()
-            
+        for app, student, profile, _company in rows:
             results.append({
                 'student_id': student.id,
                 'name': student.username,
@@ -332,41 +304,8 @@ class SecureIntentRouter:
         
         branch = params.get('branch', '').strip()
         
-        # Get all students from branch
-        if branch:
-            profiles = StudentProfile.query.filter_by(branch=branch).all()
-        else:
-            profiles = StudentProfile.query.all()
-        
-        branch_stats = {}
-        for profile in profiles:
-            b = profile.branch
-            if b not in branch_stats:
-                branch_stats[b] = {
-                    'students': 0,
-                    'avg_cgpa': 0,
-                    'applications': 0,
-                    'placed': 0
-                }
-            
-            branch_stats[b]['students'] += 1
-            branch_stats[b]['avg_cgpa'] += profile.cgpa
-            
-            # Count applications
-            apps = Application.query.filter_by(student_id=profile.user_id).all()
-            branch_stats[b]['applications'] += len(apps)
-            
-            # Count placed
-            placed = any(app.status == 'Selected' for app in apps)
-            if placed:
-                branch_stats[b]['placed'] += 1
-        
-        # Average CGPA
-        for b in branch_stats:
-            if branch_stats[b]['students'] > 0:
-                branch_stats[b]['avg_cgpa'] = round(
-                    branch_stats[b]['avg_cgpa'] / branch_stats[b]['students'], 2
-                )
+        # Students, average CGPA, applications and placed per branch, maintained in memory
+        branch_stats = placement_counters.branch_statistics(branch or None)
         
         return {
             'message': 'Branch Analytics',
@@ -0,0 +1,256 @@
+"""
+Asynchronous chat jobs.
+
+``POST /chatbot/api/chat/jobs`` hands a message to a small, bounded pool of
+background threads and returns immediately with a job id; the browser then
+polls ``GET /chatbot/api/chat/jobs/<id>`` for the partial and final answer.
+A 20-45 s provider round trip therefore occupies a chat worker thread
+instead of a gunicorn request worker, and page traffic keeps flowing during
+chat spikes.
+
+Jobs live in memory in the worker process that accepted them, so run the
+app with a single (threaded) gunicorn worker or sticky sessions.
+
+Configuration:
+    CHATBOT_JOB_WORKERS     background threads running chat jobs (default 4)
+    CHATBOT_JOB_QUEUE_LIMIT max queued + running jobs per process (default 32)
+    CHATBOT_JOB_PER_USER    max unfinished jobs per user/browser (default 2)
+    CHATBOT_JOB_TTL         seconds a finished job can still be fetched (default 300)
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+
+class JobRejected(Exception):
+    """The job could not be accepted; ``reason`` is 'queue_full' or 'user_limit'."""
+
+    def __init__(self, reason, retry_after=2):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ChatJob:
+    """One chat message being answered in the background."""
+
+    def __init__(self, owner, message, user_id=None, conversation_id=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.message = message
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.status = QUEUED
+        self.text = ''
+        self.response = None
+        self.created_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def start(self):
+        with self._lock:
+            if self.status != QUEUED:
+                return False
+            self.status = RUNNING
+            self.started_at = time.monotonic()
+            return True
+
+    def append(self, chunk):
+        with self._lock:
+            self.text += chunk
+
+    def finish(self, status, response=None):
+        with self._lock:
+            self.status = status
+            self.response = response
+            self.finished_at = time.monotonic()
+
+    def as_dict(self, since=0):
+        """Job state with the answer text generated after offset ``since``."""
+        with self._lock:
+            text = self.text
+            payload = {
+                'success': True,
+                'job_id': self.id,
+                'status': self.status,
+                'done': self.status in FINISHED_STATES,
+                'text': text[since:] if 0 <= since <= len(text) else text,
+                'offset': len(text),
+            }
+            if self.response is not None:
+                payload['response'] = self.response
+        return payload
+
+
+class ChatJobQueue:
+    """Bounded in-process job runner with per-user caps and expiry."""
+
+    def __init__(self, max_workers=4, max_pending=32, per_user_limit=2, ttl_seconds=300):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.per_user_limit = per_user_limit
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_workers=int(os.getenv('CHATBOT_JOB_WORKERS', '4')),
+            max_pending=int(os.getenv('CHATBOT_JOB_QUEUE_LIMIT', '32')),
+            per_user_limit=int(os.getenv('CHATBOT_JOB_PER_USER', '2')),
+            ttl_seconds=float(os.getenv('CHATBOT_JOB_TTL', '300')),
+        )
+
+    def _get_executor(self):
+        # Threads do not survive a fork, so build the pool lazily per process
+        if self._executor is None or self._pid != os.getpid():
+            self._jobs.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='chat-job')
+            self._pid = os.getpid()
+        return self._executor
+
+    def _purge_expired(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl_seconds
+            # Unfinished jobs are dropped too if nobody has collected them for long
+            or now - job.created_at > self.ttl_seconds * 2
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            job.cancel_event.set()
+        if expired:
+            metrics.incr('jobs.expired', len(expired))
+
+    def submit(self, app, owner, message, user_id=None, conversation_id=None):
+        """
+        Queue ``message`` for ``owner`` (user id or anonymous browser id).
+        The answer is recorded in ``conversation_id``'s conversation memory.
+
+        Raises JobRejected when the process-wide queue or the owner's
+        concurrency cap is full.
+        """
+        now = time.monotonic()
+        with self._lock:
+            executor = self._get_executor()
+            self._purge_expired(now)
+            pending = [job for job in self._jobs.values() if not job.finished]
+            if len(pending) >= self.max_pending:
+                metrics.incr('jobs.rejected.queue_full')
+                raise JobRejected('queue_full', retry_after=5)
+            if sum(1 for job in pending if job.owner == owner) >= self.per_user_limit:
+                metrics.incr('jobs.rejected.user_limit')
+                raise JobRejected('user_limit')
+            job = ChatJob(owner, message, user_id, conversation_id)
+            self._jobs[job.id] = job
+        metrics.incr('jobs.submitted')
+        executor.submit(self._run, app, job)
+        return job
+
+    def get(self, job_id, owner):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def cancel(self, job_id, owner):
+        job = self.get(job_id, owner)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if not job.finished:
+            job.finish(CANCELLED)
+        return job
+
+    def _run(self, app, job):
+        from app import db
+        from app.chatbot_engine import ChatbotEngine
+        from app.chatbot_memory import conversation_store
+
+        if job.cancel_event.is_set() or not job.start():
+            return
+        metrics.observe('jobs.queue_wait', (job.started_at - job.created_at) * 1000)
+        try:
+            # Each job gets its own app context and therefore its own DB session
+            with app.app_context():
+                engine = ChatbotEngine(session=db.session)
+                stream = engine.stream_query(
+                    job.message, user_id=job.user_id,
+                    conversation_history=conversation_store.history(job.conversation_id),
+                )
+                try:
+                    for event, payload in stream:
+                        if job.cancel_event.is_set():
+                            break
+                        if event == 'delta':
+                            job.append(payload)
+                            continue
+                        payload.setdefault('intent', None)
+                        payload.setdefault('confidence', 'unknown')
+                        if not job.finished:
+                            job.finish(DONE, payload)
+                            if payload.get('success'):
+                                conversation_store.record(job.conversation_id, job.message, payload.get('answer'))
+                finally:
+                    # Closing the generator closes the upstream provider connection
+                    stream.close()
+        except Exception as e:
+            logger.error(f"Chat job {job.id} failed: {str(e)}", exc_info=True)
+            job.finish(FAILED, {
+                'success': False,
+                'answer': 'An error occurred while processing your request. Our team has been notified.',
+                'context': 'error',
+                'intent': None,
+                'error': 'Internal error',
+            })
+        if not job.finished:
+            job.finish(CANCELLED)
+        metrics.incr('jobs.{}'.format(job.status))
+        metrics.observe('jobs.run_time', (job.finished_at - job.started_at) * 1000)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'per_user_limit': self.per_user_limit,
+            'ttl_seconds': self.ttl_seconds,
+            'queued': sum(1 for job in jobs if job.status == QUEUED),
+            'running': sum(1 for job in jobs if job.status == RUNNING),
+            'stored': len(jobs),
+            'submitted': metrics.counter('jobs.submitted'),
+            'rejected': metrics.counter('jobs.rejected.queue_full') + metrics.counter('jobs.rejected.user_limit'),
+            'queue_wait_p95_ms': metrics.percentile('jobs.queue_wait', 95),
+            'run_time_p95_ms': metrics.percentile('jobs.run_time', 95),
+        }
+
+
+# Shared per-worker job queue
+chat_jobs = ChatJobQueue.from_env()
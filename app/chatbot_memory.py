@@ -0,0 +1,229 @@
+"""
+Server-side conversation memory for the chatbot.
+
+Each browser session gets a conversation id (kept in the Flask session);
+the store keeps the last few turns of that conversation so follow-up
+questions ("and what is their CTC?") reach the provider with the earlier
+exchange. The browser never has to send its history back.
+
+Memory stays bounded at three levels:
+    * every conversation keeps at most CHATBOT_MEMORY_TURNS turns verbatim
+    * once those turns pass CHATBOT_MEMORY_SUMMARY_TOKENS, the oldest ones
+      are folded into a short running summary (one line per exchange: the
+      question and the first sentence of the answer), so the history sent
+      with each prompt stays roughly flat however long the chat runs
+    * the store as a whole holds at most CHATBOT_MEMORY_MAX_CONVERSATIONS
+      conversations and CHATBOT_MEMORY_MAX_TOKENS tokens; the least recently
+      used conversations are evicted first, and idle ones expire
+
+The summary is built locally, so summarizing costs no provider call. It is
+returned as a ``{'role': 'summary'}`` history entry, which PromptAssembler
+adds to the system prompt.
+
+``is_follow_up`` spots messages that explicitly lean on earlier turns; the
+model router scores them as multi-turn. The answer caches do not rely on it:
+elliptical follow-ups ("What is the deadline?") look self-contained, so
+mid-conversation answers are keyed to the history they were written with.
+
+Like the chat jobs, conversations live in the memory of one worker process.
+
+Configuration:
+    CHATBOT_MEMORY                     1/0 to enable or disable conversation memory (default 1)
+    CHATBOT_MEMORY_TURNS               turns kept verbatim per conversation (default 8)
+    CHATBOT_MEMORY_SUMMARY_TOKENS      verbatim-turn tokens that trigger summarization (default 400)
+    CHATBOT_MEMORY_SUMMARY_MAX_TOKENS  max tokens of the running summary (default 200)
+    CHATBOT_MEMORY_MAX_CONVERSATIONS   conversations kept per worker (default 1000)
+    CHATBOT_MEMORY_MAX_TOKENS          tokens kept across all conversations (default 400000)
+    CHATBOT_MEMORY_IDLE_TTL            seconds before an idle conversation is dropped (default 1800)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app.chatbot_metrics import metrics
+from app.chatbot_prompt import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# The most recent turns always stay verbatim when the rest are summarized
+KEEP_RECENT_TURNS = 2
+# Longest stored turn; longer answers are cut (the summary only needs the start)
+MAX_TURN_CHARS = 1500
+SUMMARY_QUESTION_CHARS = 140
+SUMMARY_ANSWER_CHARS = 180
+
+# Messages that lean on earlier turns: "and what about Amazon?", "their CTC".
+# No "it": case-insensitive, it would also match the IT branch.
+_FOLLOW_UP = re.compile(
+    r"^\s*(and|also|what about|how about|then|so)\b|\b(they|them|their|these|those|that one)\b",
+    re.IGNORECASE,
+)
+
+
+def is_follow_up(message):
+    """Whether ``message`` refers back to earlier turns instead of standing on its own."""
+    return bool(_FOLLOW_UP.search(message or ""))
+
+
+def _first_sentence(text, limit):
+    text = re.sub(r"[*_#`>|-]+", " ", text or "")
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 3].rstrip() + "..."
+
+
+def summarize_exchange(question, answer):
+    """One summary line for a question and its answer."""
+    return "Q: {} A: {}".format(
+        _first_sentence(question, SUMMARY_QUESTION_CHARS),
+        _first_sentence(answer, SUMMARY_ANSWER_CHARS),
+    )
+
+
+class Conversation:
+    """Recent turns plus the running summary of older ones."""
+
+    __slots__ = ('turns', 'summary', 'tokens', 'last_used')
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.summary = []
+        self.tokens = 0
+        self.last_used = time.monotonic()
+
+    def recount(self):
+        self.tokens = sum(estimate_tokens(t['content']) for t in self.turns) + sum(
+            estimate_tokens(line) for line in self.summary)
+        return self.tokens
+
+    def history(self):
+        turns = [dict(turn) for turn in self.turns]
+        if self.summary:
+            turns.insert(0, {'role': 'summary', 'content': "\n".join(self.summary)})
+        return turns
+
+
+class ConversationStore:
+    """Thread-safe LRU map of conversation id -> Conversation."""
+
+    def __init__(self, enabled=True, max_turns=8, summary_tokens=400, summary_max_tokens=200,
+                 max_conversations=1000, max_tokens=400000, idle_ttl=1800):
+        self.enabled = enabled
+        # Whole exchanges only, so the turns always start with a question
+        self.max_turns = max(2, max_turns - max_turns % 2)
+        self.summary_tokens = summary_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.max_conversations = max_conversations
+        self.max_tokens = max_tokens
+        self.idle_ttl = idle_ttl
+        self._conversations = OrderedDict()
+        self._total_tokens = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('CHATBOT_MEMORY', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            max_turns=int(os.getenv('CHATBOT_MEMORY_TURNS', '8')),
+            summary_tokens=int(os.getenv('CHATBOT_MEMORY_SUMMARY_TOKENS', '400')),
+            summary_max_tokens=int(os.getenv('CHATBOT_MEMORY_SUMMARY_MAX_TOKENS', '200')),
+            max_conversations=int(os.getenv('CHATBOT_MEMORY_MAX_CONVERSATIONS', '1000')),
+            max_tokens=int(os.getenv('CHATBOT_MEMORY_MAX_TOKENS', '400000')),
+            idle_ttl=float(os.getenv('CHATBOT_MEMORY_IDLE_TTL', '1800')),
+        )
+
+    def history(self, conversation_id):
+        """Turns to send with the next question (summary first), or None."""
+        if not self.enabled or not conversation_id:
+            return None
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            if time.monotonic() - conversation.last_used > self.idle_ttl:
+                self._drop(conversation_id)
+                metrics.incr('memory.expired')
+                return None
+            return conversation.history() or None
+
+    def record(self, conversation_id, question, answer):
+        """Append one exchange, summarizing and evicting as needed."""
+        if not self.enabled or not conversation_id or not question or not answer:
+            return
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = self._conversations[conversation_id] = Conversation(self.max_turns)
+                metrics.incr('memory.conversations')
+            self._conversations.move_to_end(conversation_id)
+            self._total_tokens -= conversation.tokens
+            for role, content in (('user', question), ('assistant', answer)):
+                if len(conversation.turns) == conversation.turns.maxlen:
+                    self._fold(conversation, 2)
+                conversation.turns.append({'role': role, 'content': content[:MAX_TURN_CHARS]})
+            if conversation.recount() - self._summary_tokens(conversation) > self.summary_tokens:
+                self._fold(conversation, len(conversation.turns) - KEEP_RECENT_TURNS)
+            self._total_tokens += conversation.recount()
+            conversation.last_used = time.monotonic()
+            self._evict()
+
+    def forget(self, conversation_id):
+        with self._lock:
+            self._drop(conversation_id)
+
+    @staticmethod
+    def _summary_tokens(conversation):
+        return sum(estimate_tokens(line) for line in conversation.summary)
+
+    def _fold(self, conversation, count):
+        """Move the oldest ``count`` turns (whole exchanges) into the summary."""
+        count -= count % 2
+        if count <= 0:
+            return
+        old = [conversation.turns.popleft() for _ in range(min(count, len(conversation.turns)))]
+        for question, answer in zip(old[::2], old[1::2]):
+            conversation.summary.append(summarize_exchange(question['content'], answer['content']))
+        while len(conversation.summary) > 1 and self._summary_tokens(conversation) > self.summary_max_tokens:
+            conversation.summary.pop(0)
+        metrics.incr('memory.summarized_turns', len(old))
+
+    def _drop(self, conversation_id):
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self._total_tokens -= conversation.tokens
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            idle = now - oldest.last_used > self.idle_ttl
+            if not idle and len(self._conversations) <= self.max_conversations \
+                    and self._total_tokens <= self.max_tokens:
+                break
+            self._drop(oldest_id)
+            metrics.incr('memory.expired' if idle else 'memory.evictions')
+
+    def stats(self):
+        with self._lock:
+            count = len(self._conversations)
+            tokens = self._total_tokens
+        return {
+            'enabled': self.enabled,
+            'conversations': count,
+            'tokens': tokens,
+            'max_conversations': self.max_conversations,
+            'max_tokens': self.max_tokens,
+            'started': metrics.counter('memory.conversations'),
+            'summarized_turns': metrics.counter('memory.summarized_turns'),
+            'evictions': metrics.counter('memory.evictions'),
+            'expired': metrics.counter('memory.expired'),
+        }
+
+
+# Shared per-worker store
+conversation_store = ConversationStore.from_env()
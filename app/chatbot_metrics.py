@@ -0,0 +1,81 @@
+"""
+In-process metrics for the chatbot subsystem.
+
+A single registry collects counters and latency samples from the provider
+clients, caches and pipeline tiers so they can be reported together by
+/chatbot/api/metrics. Values are per worker process.
+"""
+
+import threading
+from collections import deque
+
+
+class MetricsRegistry:
+    """Thread-safe counters plus bounded latency reservoirs (milliseconds)."""
+
+    def __init__(self, sample_size=512):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self._counters = {}
+        self._latencies = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, value_ms):
+        with self._lock:
+            samples = self._latencies.get(name)
+            if samples is None:
+                samples = self._latencies[name] = deque(maxlen=self._sample_size)
+            samples.append(float(value_ms))
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name, pct):
+        """Percentile of the recent samples for ``name``, or None when there are none."""
+        with self._lock:
+            samples = sorted(self._latencies.get(name) or ())
+        return _percentile(samples, pct)
+
+    def snapshot(self, prefix=None):
+        with self._lock:
+            counters = {
+                k: v for k, v in self._counters.items()
+                if prefix is None or k.startswith(prefix)
+            }
+            latencies = {
+                k: sorted(v) for k, v in self._latencies.items()
+                if prefix is None or k.startswith(prefix)
+            }
+
+        summary = {}
+        for name, samples in latencies.items():
+            if not samples:
+                continue
+            summary[name] = {
+                'count': len(samples),
+                'avg_ms': round(sum(samples) / len(samples), 2),
+                'p50_ms': round(_percentile(samples, 50), 2),
+                'p95_ms': round(_percentile(samples, 95), 2),
+                'p99_ms': round(_percentile(samples, 99), 2),
+            }
+        return {'counters': counters, 'latency': summary}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._latencies.clear()
+
+
+def _percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    idx = min(len(sorted_samples) - 1, max(0, int(round(pct / 100.0 * (len(sorted_samples) - 1)))))
+    return sorted_samples[idx]
+
+
+# Shared registry used across the chatbot modules
+metrics = MetricsRegistry()
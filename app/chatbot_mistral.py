@@ -5,12 +5,14 @@ Falls back to keyword matching if Mistral is unavailable.
 """
 
 import json
-import requests
 import logging
 import os
 from typing import Optional, Dict
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
+from app.chatbot_health import breakers
+from app.chatbot_http import get_provider_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -58,52 +60,19 @@ Return ONLY valid JSON. If intent is unclear, use confidence: low."""
     
     @classmethod
     def _check_mistral_available(cls) -> bool:
-        """Check if Mistral service is available. Only check once per session."""
-        if cls._mistral_available is not None:
-            return cls._mistral_available
-        
-        api_key = os.getenv('MISTRAL_API_KEY')
-        if not api_key:
+        """
+        Check the Mistral circuit breaker instead of sending a test completion.
+        The background health prober (free /v1/models request) and real calls
+        keep the breaker current, so a recovered Mistral is picked up again.
+        """
+        if not os.getenv('MISTRAL_API_KEY'):
             cls._mistral_available = False
             return False
         
-        try:
-            # Try a quick test call
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "mistral-small-latest",
-                "messages": [
-                    {"role": "user", "content": "test"}
-                ],
-                "max_tokens": 10
-            }
-            
-            response = requests.post(
-                "https://api.mistral.ai/v1/messages",
-                headers=headers,
-                json=data,
-                timeout=3
-            )
-            
-            cls._mistral_available = response.status_code in [200, 201]
-            if not cls._mistral_available:
-                logger.warning(f"Mistral service returned status {response.status_code}. Using fallback intent matching.")
-            return cls._mistral_available
-        except (ConnectionError, Timeout, RequestException) as e:
-            cls._mistral_available = False
-            if not cls._connection_error_logged:
-                logger.warning("Mistral service is not available. Using fallback intent matching. "
-                             f"Error: {str(e)}")
-                cls._connection_error_logged = True
-            return False
-        except Exception as e:
-            cls._mistral_available = False
-            logger.warning(f"Error checking Mistral availability: {str(e)}")
-            return False
+        cls._mistral_available = breakers.get('mistral').allow_request()
+        if not cls._mistral_available:
+            logger.debug("Mistral circuit is open. Using fallback intent matching.")
+        return cls._mistral_available
     
     def extract_intent(self, user_message: str) -> Optional[Dict]:
         """
@@ -145,7 +114,7 @@ Return ONLY valid JSON. If intent is unclear, use confidence: low."""
                 "temperature": 0.3  # Low temperature for consistent intent extraction
             }
             
-            response = requests.post(
+            response = get_provider_client('mistral').post(
                 self.api_url,
                 headers=headers,
                 json=data,
@@ -154,8 +123,11 @@ Return ONLY valid JSON. If intent is unclear, use confidence: low."""
             
             if response.status_code not in [200, 201]:
                 logger.error(f"Mistral API error: {response.status_code} - {response.text}")
+                breakers.get('mistral').record_failure(f'http_{response.status_code}')
                 return None
             
+            breakers.get('mistral').record_success()
+
             # Parse response
             result = response.json()
             response_text = result.get('content', [{}])[0].get('text', '')
@@ -195,9 +167,11 @@ Return ONLY valid JSON. If intent is unclear, use confidence: low."""
             return None
         except Timeout:
             logger.error("Mistral API request timed out")
+            breakers.get('mistral').record_failure('timeout')
             return None
         except RequestException as e:
             logger.error(f"Mistral API request failed: {str(e)}")
+            breakers.get('mistral').record_failure(type(e).__name__)
             return None
         except Exception as e:
             logger.error(f"Unexpected error in Mistral extraction: {str(e)}")
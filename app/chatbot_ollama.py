@@ -1,206 +1,406 @@
 """
-Ollama-powered intent extractor for the chatbot.
-Converts natural language to structured intents using TinyLlama model.
-Falls back to keyword matching if Ollama is unavailable.
+Ollama-powered intent extractor for the chatbot, plus model warm-up and
+timing metrics for the local Ollama tier.
+Converts natural language to structured intents. The local intent classifier
+(app.chatbot_classifier) answers first; the Ollama model is only asked
+when the classifier is unsure.
+
+Local inference is kept on the fast path:
+    * models are loaded when the app starts (warm-up) and kept resident
+      with ``keep_alive``, so no request pays the model load time
+    * output is constrained with Ollama's ``format`` (a JSON schema, or
+      plain ``json`` for Ollama versions before 0.5), so replies parse
+      reliably instead of being fished out of free text
+    * the reply is streamed and the connection closed as soon as the JSON
+      object is complete
+    * extracted intents are cached per normalized message
+
+Load time, time to first token, tokens/sec and the parse-failure rate are
+recorded and reported by ``ollama_stats()`` (/chatbot/api/metrics).
+
+Configuration:
+    OLLAMA_BASE_URL             Ollama server (default http://localhost:11434)
+    OLLAMA_INTENT_MODEL         model used for intent extraction (default tinyllama)
+    OLLAMA_KEEP_ALIVE           how long models stay loaded after a request, e.g. 30m or -1 (default 30m)
+    OLLAMA_FORMAT               schema or json (default schema)
+    OLLAMA_INTENT_TIMEOUT       seconds per intent extraction (default 10)
+    OLLAMA_INTENT_CACHE_SIZE    cached intents (default 512)
+    OLLAMA_INTENT_CACHE_TTL     seconds a cached intent is reused (default 600)
+    CHATBOT_OLLAMA_WARMUP       1/0 to load the configured models at startup (default 1)
 """
 
 import json
-import requests
 import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
+from app.chatbot_cache import normalize_message
+from app.chatbot_classifier import intent_classifier
+from app.chatbot_health import breakers
+from app.chatbot_http import get_provider_client
+from app.chatbot_metrics import metrics
+
 logger = logging.getLogger(__name__)
 
+CONFIDENCE_LEVELS = ['high', 'medium', 'low']
+# Reply for messages without a structured intent (answered by the LLM instead)
+GENERAL = 'general'
+
+
+def ollama_base_url():
+    return os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434').rstrip('/')
+
+
+def keep_alive():
+    """``keep_alive`` value sent with every Ollama request (a duration, or a number of seconds)."""
+    value = os.getenv('OLLAMA_KEEP_ALIVE', '30m').strip()
+    return int(value) if re.fullmatch(r'-?\d+', value) else value
+
+
+def record_timings(data, model=None):
+    """
+    Record the timings Ollama reports in a final (``done``) response:
+    model load time when the request had to load it, and generation speed.
+    Durations are in nanoseconds.
+    """
+    load = data.get('load_duration')
+    # Ollama reports a few ms of load time even for a resident model
+    if load and load > 50e6:
+        metrics.observe('ollama.load', load / 1e6)
+        metrics.incr('ollama.cold_loads')
+        logger.info("Ollama loaded %s in %.0f ms", model or data.get('model'), load / 1e6)
+    eval_count, eval_duration = data.get('eval_count'), data.get('eval_duration')
+    if eval_count and eval_duration:
+        metrics.observe('ollama.tokens_per_sec', eval_count / (eval_duration / 1e9))
+
+
+def intent_schema():
+    """JSON schema the intent reply must follow (Ollama structured outputs)."""
+    from app.chatbot_security import ALLOWED_INTENTS
+
+    return {
+        'type': 'object',
+        'properties': {
+            'intent': {'type': 'string', 'enum': sorted(ALLOWED_INTENTS) + [GENERAL]},
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'company': {'type': ['string', 'null']},
+                    'branch': {'type': ['string', 'null']},
+                    'limit': {'type': 'integer'},
+                },
+            },
+            'confidence': {'type': 'string', 'enum': CONFIDENCE_LEVELS},
+        },
+        'required': ['intent', 'parameters', 'confidence'],
+    }
+
+
+class IntentCache:
+    """Thread-safe LRU + TTL map from normalized message to extracted intent."""
+
+    def __init__(self, max_entries=512, ttl_seconds=600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value, parameters=dict(value['parameters']))
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class OllamaIntentExtractor:
     """Extract structured intents from natural language using Ollama."""
-    
-    # Ollama API configuration
-    OLLAMA_API_URL = "http://localhost:11434/api/generate"
+
+    # Ollama API configuration (defaults; see the module docstring for env overrides)
     MODEL_NAME = "tinyllama"  # Lightweight default model for local inference
-    TIMEOUT_SECONDS = 30  # Increased from 3 to 30 seconds for Ollama response time
-    MAX_TOKENS = 200
-    
+    TIMEOUT_SECONDS = 10  # The model is kept loaded, so a reply takes well under this
+    MAX_TOKENS = 120
+    # Calibrated classifier confidence above which the model is not consulted
+    LOCAL_CONFIDENCE = 0.6
+
     # Track if Ollama is available (to reduce log spam)
     _ollama_available = None
     _connection_error_logged = False
-    
+
     # Intent classification prompt template - simplified for Ollama
     INTENT_PROMPT_TEMPLATE = """Extract intent from: {user_message}
 
 Return JSON only:
 {{"intent": "search_company", "parameters": {{"company": null}}, "confidence": "high"}}
 
-Possible intents: search_company, check_eligibility, application_status, upcoming_drives, placement_stats, list_applicants, branch_analytics"""
-    
+Possible intents: search_company, check_eligibility, application_status, upcoming_drives, placement_stats, list_applicants, branch_analytics, general"""
+
     def __init__(self):
         """Initialize the intent extractor."""
-        self.api_url = self.OLLAMA_API_URL
-        self.model_name = self.MODEL_NAME
-        self.timeout = self.TIMEOUT_SECONDS
-    
+        self.api_url = "{}/api/generate".format(ollama_base_url())
+        self.model_name = os.getenv('OLLAMA_INTENT_MODEL', self.MODEL_NAME).strip() or self.MODEL_NAME
+        self.timeout = float(os.getenv('OLLAMA_INTENT_TIMEOUT', str(self.TIMEOUT_SECONDS)))
+        self.output_format = os.getenv('OLLAMA_FORMAT', 'schema').strip().lower()
+        self.cache = IntentCache(
+            max_entries=int(os.getenv('OLLAMA_INTENT_CACHE_SIZE', '512')),
+            ttl_seconds=float(os.getenv('OLLAMA_INTENT_CACHE_TTL', '600')),
+        )
+
     @classmethod
     def _check_ollama_available(cls) -> bool:
-        """Check if Ollama service is running. Checks every time."""
-        try:
-            # Try a quick health check
-            response = requests.get(
-                "http://localhost:11434/api/tags",
-                timeout=2
-            )
-            if response.status_code == 200:
-                cls._ollama_available = True
-                cls._connection_error_logged = False
-                return True
-            cls._ollama_available = False
-            return False
-        except (ConnectionError, Timeout, RequestException):
-            cls._ollama_available = False
-            # Only log error once
-            if not cls._connection_error_logged:
-                logger.warning("Ollama service is not available. Using fallback intent matching. "
-                             f"Make sure Ollama is running on {cls.OLLAMA_API_URL}")
-                cls._connection_error_logged = True
-            return False
-        
+        """
+        Check the Ollama circuit breaker instead of calling /api/tags.
+        The background health prober and real calls keep the breaker current.
+        """
+        available = breakers.get('ollama').allow_request()
+        if not available and not cls._connection_error_logged:
+            logger.warning("Ollama circuit is open. Using fallback intent matching. "
+                           f"Make sure Ollama is running on {ollama_base_url()}")
+            cls._connection_error_logged = True
+        cls._ollama_available = available
+        return available
+
+    def _payload(self, user_message: str) -> Dict:
+        return {
+            "model": self.model_name,
+            "prompt": self.INTENT_PROMPT_TEMPLATE.format(user_message=user_message),
+            "format": "json" if self.output_format == 'json' else intent_schema(),
+            "stream": True,
+            "keep_alive": keep_alive(),
+            "options": {
+                "temperature": 0,  # Deterministic output for the same message
+                "num_predict": self.MAX_TOKENS,
+            },
+        }
+
     def extract_intent(self, user_message: str) -> Optional[Dict]:
         """
-        Extract intent from user message using Ollama.
+        Extract intent from user message with the local classifier, asking
+        Ollama only when the classifier is unsure.
         Falls back to None if Ollama is unavailable.
-        
+
         Args:
             user_message: Natural language query from user
-            
+
         Returns:
             Dictionary with intent, parameters, and confidence, or None if extraction fails
         """
         if not user_message or not isinstance(user_message, str):
             return None
-        
+
+        local = self._classify_locally(user_message)
+        if local is not False:
+            return local
+
+        user_message = user_message.strip()[:500]  # Limit input length
+        cache_key = (self.model_name, normalize_message(user_message))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            metrics.incr('ollama.intent.cache_hits')
+            return None if cached['intent'] == GENERAL else cached
+
         # Quick check if Ollama is available
         if not self._check_ollama_available():
             return None  # Let the fallback handle it
-        
-        user_message = user_message.strip()[:500]  # Limit input length
-        
+
         try:
-            prompt = self.INTENT_PROMPT_TEMPLATE.format(user_message=user_message)
-            
             logger.debug(f"Extracting intent with Ollama from: '{user_message[:100]}'")
-            
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "temperature": 0.3,  # Lower temperature for consistency
-                    "num_predict": self.MAX_TOKENS,
-                },
-                timeout=self.timeout
-            )
-            
-            if response.status_code != 200:
-                logger.debug(f"Ollama API returned status {response.status_code}")
-                # Mark Ollama as unavailable if we get errors
-                OllamaIntentExtractor._ollama_available = False
+            metrics.incr('ollama.intent.calls')
+            response_text = self._generate(self._payload(user_message))
+            if response_text is None:
                 return None
-            
-            response_data = response.json()
-            response_text = response_data.get('response', '').strip()
-            
+
             if not response_text:
                 logger.debug("Empty response from Ollama")
+                metrics.incr('ollama.intent.parse_failed')
                 return None
-            
+
             logger.debug(f"Ollama raw response: {response_text[:100]}")
-            
+
             # Parse JSON response
             intent_data = self._parse_response(response_text)
-            
+
             if intent_data:
                 logger.debug(f"Intent extracted: {intent_data.get('intent')} (confidence: {intent_data.get('confidence')})")
+                intent_data['method'] = 'ollama'
+                self.cache.set(cache_key, intent_data)
             else:
                 logger.debug(f"Failed to parse intent from response")
-            
+                metrics.incr('ollama.intent.parse_failed')
+
+            if intent_data and intent_data['intent'] == GENERAL:
+                return None
             return intent_data
-            
+
         except (ConnectionError, Timeout) as e:
             # Connection errors are expected when Ollama is not running
             if not OllamaIntentExtractor._connection_error_logged:
                 logger.debug(f"Cannot connect to Ollama service. Using fallback matching.")
                 OllamaIntentExtractor._connection_error_logged = True
             OllamaIntentExtractor._ollama_available = False
+            breakers.get('ollama').record_failure(type(e).__name__)
             return None
         except RequestException as e:
             logger.debug(f"Ollama API request failed (expected if service not running)")
             OllamaIntentExtractor._ollama_available = False
+            breakers.get('ollama').record_failure(type(e).__name__)
             return None
         except Exception as e:
             logger.debug(f"Intent extraction error: {str(e)}")
             return None
-    
+
+    def _generate(self, payload: Dict) -> Optional[str]:
+        """
+        Stream /api/generate and return the reply text, stopping as soon as
+        the JSON object is complete. None when Ollama answered with an error.
+        """
+        started = time.monotonic()
+        first_token = None
+        pieces = []
+        depth = 0
+        with get_provider_client('ollama').post(
+            self.api_url, json=payload, timeout=self.timeout, stream=True,
+        ) as response:
+            if response.status_code != 200:
+                logger.debug(f"Ollama API returned status {response.status_code}")
+                # Mark Ollama as unavailable if we get errors
+                OllamaIntentExtractor._ollama_available = False
+                breakers.get('ollama').record_failure(f'http_{response.status_code}')
+                return None
+
+            breakers.get('ollama').record_success()
+            OllamaIntentExtractor._connection_error_logged = False
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('done'):
+                    record_timings(chunk, self.model_name)
+                    break
+                text = chunk.get('response', '')
+                if not text:
+                    continue
+                if first_token is None:
+                    first_token = time.monotonic()
+                    metrics.observe('ollama.first_token', (first_token - started) * 1000)
+                pieces.append(text)
+                # Stop generating once the top-level JSON object closes
+                depth += text.count('{') - text.count('}')
+                if depth <= 0 and '}' in text:
+                    break
+
+        if first_token is not None and len(pieces) > 1:
+            elapsed = time.monotonic() - first_token
+            if elapsed > 0:
+                metrics.observe('ollama.tokens_per_sec', (len(pieces) - 1) / elapsed)
+        metrics.observe('ollama.intent.latency', (time.monotonic() - started) * 1000)
+        return ''.join(pieces).strip()
+
+    def _classify_locally(self, user_message: str):
+        """
+        Intent from the local classifier, None when the message has no
+        structured intent, or False when the classifier is unsure.
+        """
+        from app.chatbot_security import ALLOWED_INTENTS
+
+        prediction = intent_classifier.predict(user_message)
+        if prediction.confidence < self.LOCAL_CONFIDENCE:
+            return False
+        if prediction.intent not in ALLOWED_INTENTS:
+            return None
+        parameters = {k: v for k, v in prediction.params.items() if k in ('company', 'branch')}
+        parameters['limit'] = 10
+        return {
+            'intent': prediction.intent,
+            'parameters': parameters,
+            'confidence': 'high' if prediction.confidence >= 0.9 else 'medium',
+            'method': 'local_classifier',
+        }
+
     def _parse_response(self, response_text: str) -> Optional[Dict]:
         """
         Parse JSON from Ollama response.
-        
+
         Args:
             response_text: Raw response text from Ollama
-            
+
         Returns:
             Parsed JSON dict with intent info, or None if parsing fails
         """
         try:
-            # Try to extract JSON object
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            
-            if not json_match:
-                logger.warning("No JSON found in response")
-                return None
-            
-            json_str = json_match.group(0)
-            data = json.loads(json_str)
-            
+            # Constrained output is plain JSON; older models/servers may wrap it in text
+            try:
+                data = json.loads(response_text)
+            except json.JSONDecodeError:
+                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+                if not json_match:
+                    logger.warning("No JSON found in response")
+                    return None
+                data = json.loads(json_match.group(0))
+
             # Validate required fields
-            if 'intent' not in data:
+            if not isinstance(data, dict) or 'intent' not in data:
                 logger.warning("Missing 'intent' field in response")
                 return None
-            
+
             intent = str(data['intent']).lower().strip()
-            
+
             # Validate against allowed intents
             from app.chatbot_security import ALLOWED_INTENTS
-            if intent not in ALLOWED_INTENTS:
+            if intent not in ALLOWED_INTENTS and intent != GENERAL:
                 logger.warning(f"Unknown intent: {intent}")
                 return None
-            
+
             # Extract parameters
             parameters = data.get('parameters', {})
             if not isinstance(parameters, dict):
                 parameters = {}
-            
+
             confidence = data.get('confidence', 'low')
-            
+            if confidence not in CONFIDENCE_LEVELS:
+                confidence = 'low'
+
             # Clean up parameters
             cleaned_params = {}
             if 'company' in parameters:
                 val = parameters['company']
                 if val and isinstance(val, str):
                     cleaned_params['company'] = val[:100]
-            
+
             if 'branch' in parameters:
                 val = parameters['branch']
                 if val and isinstance(val, str):
                     cleaned_params['branch'] = val[:50]
-            
+
             if 'student_id' in parameters:
                 try:
                     cleaned_params['student_id'] = int(parameters['student_id'])
                 except (ValueError, TypeError):
                     pass
-            
+
             if 'limit' in parameters:
                 try:
                     limit = int(parameters['limit'])
@@ -209,13 +409,13 @@ Possible intents: search_company, check_eligibility, application_status, upcomin
                     cleaned_params['limit'] = 10
             else:
                 cleaned_params['limit'] = 10
-            
+
             return {
                 'intent': intent,
                 'parameters': cleaned_params,
                 'confidence': confidence
             }
-            
+
         except json.JSONDecodeError as e:
             logger.warning(f"JSON decode error: {str(e)}")
             return None
@@ -239,12 +439,96 @@ def get_intent_extractor() -> OllamaIntentExtractor:
 def ollama_intent_extractor(user_message: str) -> Optional[Dict]:
     """
     Extract intent using Ollama service.
-    
+
     Args:
         user_message: User's natural language query
-        
+
     Returns:
         Dict with 'intent', 'parameters', 'confidence' or None
     """
     extractor = get_intent_extractor()
     return extractor.extract_intent(user_message)
+
+
+# ==================== Warm-up ====================
+
+def configured_models():
+    """Ollama models this deployment uses: the chat model and, if set, the intent model."""
+    models = []
+    for key in ('OLLAMA_CHAT_MODEL', 'OLLAMA_LIGHT_MODEL', 'OLLAMA_INTENT_MODEL'):
+        model = os.getenv(key, '').strip()
+        if model and model not in models:
+            models.append(model)
+    return models
+
+
+def warm_up(models=None):
+    """
+    Load ``models`` into memory (a request without a prompt only loads the
+    model) and pin them for OLLAMA_KEEP_ALIVE. Returns {model: load ms or error}.
+    """
+    results = {}
+    for model in models if models is not None else configured_models():
+        started = time.monotonic()
+        try:
+            resp = get_provider_client('ollama').post(
+                '{}/api/generate'.format(ollama_base_url()),
+                json={'model': model, 'keep_alive': keep_alive(), 'stream': False},
+                timeout=120,
+                retries=0,
+            )
+            if resp.status_code != 200:
+                results[model] = 'http_{}'.format(resp.status_code)
+                metrics.incr('ollama.warmup.failed')
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            record_timings(resp.json(), model)
+            results[model] = round(elapsed_ms, 1)
+            metrics.incr('ollama.warmup.ok')
+            metrics.observe('ollama.warmup', elapsed_ms)
+        except (RequestException, ValueError) as exc:
+            results[model] = type(exc).__name__
+            metrics.incr('ollama.warmup.failed')
+    if results:
+        logger.info("Ollama warm-up: %s", results)
+    return results
+
+
+def start_warm_up():
+    """Warm the configured models on a daemon thread (called when the app starts)."""
+    if os.getenv('CHATBOT_OLLAMA_WARMUP', '1').strip().lower() in ('0', 'false', 'no', 'off'):
+        return None
+    models = configured_models()
+    if not models:
+        return None
+    thread = threading.Thread(target=warm_up, args=(models,), name='ollama-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def ollama_stats():
+    snap = metrics.snapshot('ollama.')
+    counters, latency = snap['counters'], snap['latency']
+    calls = counters.get('ollama.intent.calls', 0)
+    parse_failed = counters.get('ollama.intent.parse_failed', 0)
+    tokens = latency.get('ollama.tokens_per_sec') or {}
+    extractor = _extractor
+    return {
+        'models': configured_models(),
+        'keep_alive': keep_alive(),
+        'warmups': counters.get('ollama.warmup.ok', 0),
+        'warmup_failures': counters.get('ollama.warmup.failed', 0),
+        'cold_loads': counters.get('ollama.cold_loads', 0),
+        'load_ms': latency.get('ollama.load'),
+        'first_token_ms': latency.get('ollama.first_token'),
+        # The registry labels sample summaries in ms; these are tokens/sec
+        'tokens_per_sec': {key[:-3] if key.endswith('_ms') else key: value for key, value in tokens.items()},
+        'intent': {
+            'calls': calls,
+            'cache_hits': counters.get('ollama.intent.cache_hits', 0),
+            'cached': len(extractor.cache) if extractor is not None else 0,
+            'parse_failed': parse_failed,
+            'parse_failure_rate': round(parse_failed / calls, 4) if calls else None,
+            'latency': latency.get('ollama.intent.latency'),
+        },
+    }
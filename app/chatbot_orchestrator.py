@@ -0,0 +1,240 @@
+"""
+Latency-adaptive, hedged fallback across the chatbot's LLM providers.
+
+The orchestrator keeps an exponentially weighted moving average (EWMA) of
+each provider's latency and error rate and tries the cheapest-looking
+provider first. If the primary has not answered by the time its recent p95
+latency has elapsed, a hedged request is fired at the next provider and
+whichever produces an answer first wins. The whole chain shares one
+deadline, so a message can no longer wait for every provider's own timeout
+in turn. Providers whose circuit breaker is open are skipped.
+
+Provider calls run on a small shared thread pool and must not touch the
+database session. Python threads cannot be interrupted, so "cancelling"
+the losing call means setting its cancel event (no further retries), capping
+its read timeout at the chain deadline and discarding its result.
+
+Configuration:
+    CHATBOT_DEADLINE_SECONDS        overall budget for the chain (default 30)
+    CHATBOT_HEDGE_MULTIPLIER        hedge after multiplier x p95 of the primary (default 1.0)
+    CHATBOT_HEDGE_MIN_SECONDS       never hedge earlier than this (default 1.5)
+    CHATBOT_HEDGE_DEFAULT_SECONDS   hedge delay before any latency is known (default 6)
+    CHATBOT_PROVIDER_THREADS        worker threads for provider calls (default 8)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from app.chatbot_health import breakers
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Samples needed before a provider's measured latency replaces the default
+MIN_SAMPLES = 3
+
+
+class ProviderStats:
+    """EWMA latency (seconds) and error rate for one provider."""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def record(self, seconds, ok):
+        a = self.alpha
+        self.latency = seconds if self.latency is None else (1 - a) * self.latency + a * seconds
+        self.error_rate = (1 - a) * self.error_rate + a * (0.0 if ok else 1.0)
+        self.samples += 1
+
+    def as_dict(self):
+        return {
+            'ewma_latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'ewma_error_rate': round(self.error_rate, 3),
+            'samples': self.samples,
+        }
+
+
+class ProviderOrchestrator:
+    """Orders providers by expected cost and runs them with hedging under one deadline."""
+
+    def __init__(self, deadline_seconds=30.0, hedge_multiplier=1.0, hedge_min_seconds=1.5,
+                 hedge_default_seconds=6.0, max_workers=8, max_in_flight=2):
+        self.deadline_seconds = deadline_seconds
+        self.hedge_multiplier = hedge_multiplier
+        self.hedge_min_seconds = hedge_min_seconds
+        self.hedge_default_seconds = hedge_default_seconds
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-provider')
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            deadline_seconds=float(os.getenv('CHATBOT_DEADLINE_SECONDS', '30')),
+            hedge_multiplier=float(os.getenv('CHATBOT_HEDGE_MULTIPLIER', '1.0')),
+            hedge_min_seconds=float(os.getenv('CHATBOT_HEDGE_MIN_SECONDS', '1.5')),
+            hedge_default_seconds=float(os.getenv('CHATBOT_HEDGE_DEFAULT_SECONDS', '6')),
+            max_workers=int(os.getenv('CHATBOT_PROVIDER_THREADS', '8')),
+        )
+
+    def _stats_for(self, name):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = ProviderStats()
+            return stats
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            stats = self._stats.setdefault(name, ProviderStats())
+            stats.record(seconds, ok)
+        metrics.observe('provider.{}.latency'.format(name), seconds * 1000)
+        metrics.incr('provider.{}.{}'.format(name, 'ok' if ok else 'error'))
+
+    def expected_cost(self, name):
+        """Expected seconds to an answer: EWMA latency plus a deadline-sized penalty per error."""
+        stats = self._stats_for(name)
+        if stats.samples < MIN_SAMPLES:
+            latency = self.hedge_default_seconds
+        else:
+            latency = stats.latency
+        return latency + stats.error_rate * self.deadline_seconds
+
+    def order(self, names):
+        """Provider names sorted by expected cost; ties keep the configured order."""
+        ranked = sorted(enumerate(names), key=lambda item: (self.expected_cost(item[1]), item[0]))
+        return [name for _, name in ranked]
+
+    def hedge_delay(self, name):
+        p95_ms = metrics.percentile('provider.{}.latency'.format(name), 95)
+        if p95_ms is None or self._stats_for(name).samples < MIN_SAMPLES:
+            return self.hedge_default_seconds
+        return max(self.hedge_min_seconds, self.hedge_multiplier * p95_ms / 1000.0)
+
+    def run(self, candidates):
+        """
+        Run provider calls until one returns an answer.
+
+        Args:
+            candidates: list of (name, call) where call(timeout, cancel_event)
+                returns the usual (answer, error) tuple.
+
+        Returns:
+            (method, answer, errors) where method/answer are None if every
+            provider failed or the deadline passed, and errors maps provider
+            name to its failure reason.
+        """
+        errors = {}
+        if not candidates:
+            return None, None, errors
+
+        calls = dict(candidates)
+        queue = self.order([name for name, _ in candidates])
+        deadline = time.monotonic() + self.deadline_seconds
+        in_flight = {}          # future -> (name, cancel_event)
+
+        def launch_next():
+            # Skip providers whose breaker is open; returns the hedge time or None
+            while queue:
+                name = queue.pop(0)
+                if breakers.get(name).allow_request():
+                    return launch(name)
+                errors[name] = 'circuit_open'
+            return None
+
+        def launch(name):
+            cancel = threading.Event()
+            started = time.monotonic()
+            timeout = max(0.5, deadline - started)
+            future = self._executor.submit(calls[name], timeout, cancel)
+            future.add_done_callback(lambda f, n=name, c=cancel, s=started: self._on_done(n, c, s, f))
+            in_flight[future] = (name, cancel)
+            return started + self.hedge_delay(name)
+
+        next_hedge_at = launch_next()
+
+        while in_flight:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                for name, cancel in in_flight.values():
+                    cancel.set()
+                    errors[name] = 'deadline_exceeded'
+                metrics.incr('orchestrator.deadline_exceeded')
+                logger.warning("Provider chain exceeded %.1fs deadline", self.deadline_seconds)
+                return None, None, errors
+
+            can_hedge = queue and len(in_flight) < self.max_in_flight
+            wait_for = min(remaining, max(0.0, next_hedge_at - now)) if can_hedge else remaining
+            done, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name, _cancel = in_flight.pop(future)
+                try:
+                    answer, error = future.result()
+                except Exception as exc:
+                    logger.error("Provider %s raised: %s", name, exc, exc_info=True)
+                    answer, error = None, 'unexpected_error'
+                if answer:
+                    for loser, cancel in in_flight.values():
+                        cancel.set()
+                        metrics.incr('orchestrator.cancelled')
+                        logger.debug("Cancelled slower provider %s after %s answered", loser, name)
+                    return name, answer, errors
+                errors[name] = error or 'empty_text'
+
+            if not in_flight and queue:
+                # Primary failed outright: fall through immediately
+                next_hedge_at = launch_next()
+            elif not done and queue and len(in_flight) < self.max_in_flight \
+                    and time.monotonic() >= next_hedge_at:
+                slow = ", ".join(n for n, _ in in_flight.values())
+                hedge_at = launch_next()
+                if hedge_at is not None:
+                    next_hedge_at = hedge_at
+                    metrics.incr('orchestrator.hedges')
+                    logger.info("Hedged past %s (slower than its p95)", slow)
+
+        return None, None, errors
+
+    def _on_done(self, name, cancel, started, future):
+        # Outcomes of cancelled losers say nothing reliable about provider health
+        if cancel.is_set():
+            return
+        try:
+            answer, error = future.result()
+        except Exception:
+            answer, error = None, 'unexpected_error'
+        self.record(name, time.monotonic() - started, bool(answer))
+        if answer:
+            breakers.get(name).record_success()
+        else:
+            breakers.get(name).record_failure(error)
+
+    def stats(self):
+        with self._lock:
+            names = list(self._stats)
+        report = {}
+        for name in names:
+            entry = self._stats_for(name).as_dict()
+            entry['hedge_after_ms'] = round(self.hedge_delay(name) * 1000, 1)
+            entry['expected_cost_ms'] = round(self.expected_cost(name) * 1000, 1)
+            report[name] = entry
+        return {
+            'deadline_seconds': self.deadline_seconds,
+            'providers': report,
+            'hedges': metrics.counter('orchestrator.hedges'),
+            'cancelled': metrics.counter('orchestrator.cancelled'),
+            'deadline_exceeded': metrics.counter('orchestrator.deadline_exceeded'),
+        }
+
+
+# Shared per-worker orchestrator
+provider_orchestrator = ProviderOrchestrator.from_env()
@@ -0,0 +1,228 @@
+"""
+Speculative context prefetch for the chat page.
+
+When the chat page opens, the browser calls ``POST /chatbot/api/prefetch``.
+While the user is still reading the suggestions, a background thread builds
+that user's personal context blocks and keeps them in a short-TTL per-user
+cache. Those are the logged-in student card, eligible opportunities and
+recent applications. The first question then skips that database work.
+
+The same call can also warm the provider connections. The configured
+providers' health probes run on the shared pooled clients, so the TCP/TLS
+handshake is already done when the first question goes out. Warm-ups run
+at most once per CHATBOT_PREFETCH_WARM_INTERVAL per worker.
+
+Cached blocks are dropped on any committed change to opportunities,
+applications or student profiles (``model_events``), so a prefetched
+context is never older than the database.
+
+Configuration:
+    CHATBOT_PREFETCH                 1/0 to enable or disable prefetching (default 1)
+    CHATBOT_PREFETCH_TTL             seconds prefetched blocks stay usable (default 120)
+    CHATBOT_PREFETCH_MAX_USERS       users kept per worker (default 1000)
+    CHATBOT_PREFETCH_WARM            1/0 to warm provider connections too (default 1)
+    CHATBOT_PREFETCH_WARM_INTERVAL   min seconds between warm-ups (default 20)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.chatbot_cache import INVALIDATING_MODELS
+from app.chatbot_metrics import metrics
+from app.model_events import on_models_changed
+
+logger = logging.getLogger(__name__)
+
+
+class UserContextCache:
+    """Per-user personal context blocks ({key: text}) with a TTL and LRU bound."""
+
+    def __init__(self, ttl_seconds=120, max_users=1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        # Bumped on every invalidation, so a build that raced a commit is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            blocks, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return blocks
+
+    def fresh(self, user_id):
+        return self.get(user_id) is not None
+
+    def set(self, user_id, blocks, generation):
+        """Store blocks built at ``generation``; False if the data changed since."""
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[user_id] = (dict(blocks), time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def on_models_changed(self, changed):
+        if changed & INVALIDATING_MODELS:
+            self.clear()
+            metrics.incr('prefetch.invalidations')
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ContextPrefetcher:
+    """Runs prefetches on a small background pool, one at a time per user."""
+
+    def __init__(self, enabled=True, ttl_seconds=120, max_users=1000, warm=True, warm_interval=20.0):
+        self.enabled = enabled
+        self.warm = warm
+        self.warm_interval = warm_interval
+        self.cache = UserContextCache(ttl_seconds, max_users)
+        self._pending = set()
+        self._last_warm = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('CHATBOT_PREFETCH', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            ttl_seconds=float(os.getenv('CHATBOT_PREFETCH_TTL', '120')),
+            max_users=int(os.getenv('CHATBOT_PREFETCH_MAX_USERS', '1000')),
+            warm=os.getenv('CHATBOT_PREFETCH_WARM', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            warm_interval=float(os.getenv('CHATBOT_PREFETCH_WARM_INTERVAL', '20')),
+        )
+
+    def _get_executor(self):
+        # Threads do not survive a fork, so build the pool lazily per process
+        if self._executor is None or self._pid != os.getpid():
+            self._pending.clear()
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-prefetch')
+            self._pid = os.getpid()
+        return self._executor
+
+    def blocks(self, user_id):
+        """Prefetched {key: text} blocks for ``user_id``, or None."""
+        if not self.enabled or not user_id:
+            return None
+        blocks = self.cache.get(user_id)
+        metrics.incr('prefetch.hits' if blocks is not None else 'prefetch.misses')
+        return blocks
+
+    def prefetch(self, app, user_id):
+        """
+        Start building ``user_id``'s context (and warming providers) in the
+        background. Returns 'queued', 'fresh' (already cached), 'pending'
+        (a build is running) or 'disabled'.
+        """
+        if not self.enabled:
+            return 'disabled'
+        warm = self.warm and self._claim_warm_up()
+        build = bool(user_id) and not self.cache.fresh(user_id)
+        with self._lock:
+            if build and user_id in self._pending:
+                build = False
+                status = 'pending'
+            else:
+                status = 'queued' if build else 'fresh'
+            if build:
+                self._pending.add(user_id)
+            executor = self._get_executor() if (build or warm) else None
+        if executor is not None:
+            executor.submit(self._run, app, user_id if build else None, warm)
+            metrics.incr('prefetch.requests')
+        return status
+
+    def _claim_warm_up(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_warm is not None and now - self._last_warm < self.warm_interval:
+                return False
+            self._last_warm = now
+            return True
+
+    def _run(self, app, user_id, warm):
+        try:
+            # The database work first: it is what the first question needs most
+            if user_id:
+                self._build(app, user_id)
+            if warm:
+                self._warm_providers()
+        except Exception as exc:
+            logger.warning("Context prefetch failed for user_id=%s: %s", user_id, exc)
+            metrics.incr('prefetch.failed')
+        finally:
+            if user_id:
+                with self._lock:
+                    self._pending.discard(user_id)
+
+    def _build(self, app, user_id):
+        from app.chatbot_engine import ChatbotEngine
+
+        started = time.monotonic()
+        generation = self.cache.generation
+        with app.app_context():
+            blocks = ChatbotEngine().user_context_blocks(user_id)
+        stored = self.cache.set(user_id, blocks, generation)
+        metrics.incr('prefetch.built' if stored else 'prefetch.discarded')
+        metrics.observe('prefetch.build', (time.monotonic() - started) * 1000)
+
+    @staticmethod
+    def _warm_providers():
+        """Run the configured providers' probes, opening pooled connections."""
+        from app.chatbot_health import breakers, configured_probes
+
+        for name, probe in configured_probes().items():
+            try:
+                ok, detail = probe()
+            except Exception as exc:
+                ok, detail = False, type(exc).__name__
+            breakers.get(name).record_probe(ok, None if ok else detail)
+            metrics.incr('prefetch.warm.{}'.format('ok' if ok else 'failed'))
+
+    def stats(self):
+        p95 = metrics.percentile('prefetch.build', 95)
+        return {
+            'enabled': self.enabled,
+            'warm': self.warm,
+            'ttl_seconds': self.cache.ttl_seconds,
+            'users': len(self.cache),
+            'requests': metrics.counter('prefetch.requests'),
+            'built': metrics.counter('prefetch.built'),
+            'discarded': metrics.counter('prefetch.discarded'),
+            'hits': metrics.counter('prefetch.hits'),
+            'misses': metrics.counter('prefetch.misses'),
+            'invalidations': metrics.counter('prefetch.invalidations'),
+            'failed': metrics.counter('prefetch.failed'),
+            'warm_ups': metrics.counter('prefetch.warm.ok'),
+            'build_p95_ms': round(p95, 2) if p95 is not None else None,
+        }
+
+
+# Shared per-worker prefetcher
+context_prefetcher = ContextPrefetcher.from_env()
+on_models_changed(context_prefetcher.cache.on_models_changed)
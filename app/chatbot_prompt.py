@@ -0,0 +1,373 @@
+"""
+Token-budgeted prompt assembly for the chatbot's LLM calls.
+
+Every provider request is built from a PromptPlan:
+    * the database context blocks are ranked by relevance to the detected
+      intent and packed into a per-request token budget; a block that does
+      not fit whole keeps its header and as many lines as fit
+    * older history turns are dropped before they crowd out the context; a
+      running summary of earlier turns (see chatbot_memory) is appended to
+      the system prompt
+    * the system prompt is the richest variant in the intent's preference
+      list (short TPC prompt, then compact built-in prompt) that still
+      leaves room for the context
+    * the completion limit (maxOutputTokens / max_tokens / num_predict)
+      depends on the intent
+
+Token counts are estimated locally (about four characters per token), so
+assembling a plan needs no tokenizer or network round trip. The counts the
+provider reports afterwards are recorded next to the estimates.
+
+The full TPC prompt ('long', about 2500 estimated tokens on its own) is in
+no preference list: with the question and MIN_CONTEXT_TOKENS of context it
+only fits a budget of about 2850 or more, well above the default. To use it,
+raise CHATBOT_PROMPT_TOKEN_BUDGET accordingly and put 'long' first in
+SYSTEM_PROMPT_PREFERENCE['general'].
+
+Configuration:
+    CHATBOT_PROMPT_TOKEN_BUDGET   input tokens per request (default 2000)
+    CHATBOT_MAX_OUTPUT_TOKENS     upper bound on completion tokens (default 900)
+"""
+
+import logging
+import math
+import os
+
+from app.chatbot_classifier import intent_classifier
+from app.chatbot_metrics import metrics
+from app.chatbot_tools import TOOL_RULES
+from app.tpc_system_prompt import get_system_prompt
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4.0
+# History may use at most this share of the budget
+HISTORY_SHARE = 0.25
+MAX_HISTORY_TURNS = 6
+# Blocks smaller than this after trimming are dropped instead
+MIN_BLOCK_TOKENS = 40
+# The system prompt must leave at least this much room for context
+MIN_CONTEXT_TOKENS = 200
+
+CONTEXT_RULES = (
+    "HOW TO USE THE DATABASE CONTEXT:\n"
+    "- You will receive a DATABASE CONTEXT section with real, live data from the portal.\n"
+    "- Always prioritise this data over your general knowledge.\n"
+    "- If the context contains relevant information, use it directly and specifically.\n"
+    "- If the context is empty or irrelevant, say so honestly and offer general placement guidance.\n"
+)
+
+COMPACT_SYSTEM_PROMPT = (
+    "You are TPC Ask, an intelligent assistant for a college Training & Placement Cell (TPC).\n\n"
+    "YOUR ROLE:\n"
+    "- Help students find job/internship opportunities, check eligibility, track applications,\n"
+    "  understand deadlines, and get placement advice.\n"
+    "- Help admins get analytics, student lists, and placement statistics.\n\n"
+    + CONTEXT_RULES + "\n"
+    "RESPONSE STYLE:\n"
+    "- Be concise, friendly, and specific. Use bullet points for lists.\n"
+    "- Always mention real company names, CTCs, deadlines from the context when available.\n"
+    "- If the student asks a follow-up, use the conversation history to answer coherently.\n"
+    "- Never make up data. If something is not in the context, say you do not have that info.\n"
+    "- Keep answers under 400 words unless the user asks for a detailed breakdown.\n"
+)
+
+SUMMARY_HEADER = "\n\nEARLIER IN THIS CONVERSATION (summary, oldest first):\n"
+
+SYSTEM_PROMPTS = {
+    'long': get_system_prompt(short=False) + "\n\n" + CONTEXT_RULES,
+    'short': get_system_prompt(short=True) + "\n\n" + CONTEXT_RULES,
+    'compact': COMPACT_SYSTEM_PROMPT,
+}
+
+# Richest system prompt first; data lookups are answered from the context,
+# open-ended questions benefit from the schema and behaviour rules. 'long'
+# needs a budget of about 2850 (see the module docstring), so it is not listed.
+SYSTEM_PROMPT_PREFERENCE = {
+    'general': ['short', 'compact'],
+    'placement_stats': ['short', 'compact'],
+    'branch_analytics': ['short', 'compact'],
+}
+DEFAULT_SYSTEM_PREFERENCE = ['compact']
+
+# Context block keys in the order they matter for each intent; blocks not
+# listed follow in collection order
+BLOCK_PRIORITY = {
+    'check_eligibility': ['eligible_opportunities', 'package_opportunities', 'student_profile', 'opportunities',
+                          'upcoming_drives'],
+    'application_status': ['applications', 'student_profile', 'opportunities'],
+    'upcoming_drives': ['upcoming_drives', 'opportunities', 'student_profile', 'eligible_opportunities'],
+    'placement_stats': ['placement_stats', 'branch_analytics', 'portal_summary'],
+    'branch_analytics': ['branch_analytics', 'placement_stats', 'portal_summary'],
+    'search_company': ['package_opportunities', 'opportunities', 'upcoming_drives', 'eligible_opportunities',
+                       'student_profile'],
+    'browse_opportunities': ['package_opportunities', 'opportunities', 'upcoming_drives', 'eligible_opportunities',
+                             'student_profile'],
+    'general': ['student_profile', 'portal_summary', 'opportunities', 'upcoming_drives'],
+}
+
+MAX_OUTPUT_TOKENS = {
+    'application_status': 400,
+    'placement_stats': 350,
+    'branch_analytics': 450,
+    'check_eligibility': 500,
+    'upcoming_drives': 500,
+    'search_company': 600,
+    'browse_opportunities': 600,
+    'general': 900,
+}
+
+def estimate_tokens(text):
+    """Rough local token count (about four characters per token)."""
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def detect_intent(message):
+    """What the question is about (local intent classifier), used for ranking."""
+    return intent_classifier.predict(message).intent
+
+
+def build_user_turn(user_message, db_context, tools=False):
+    sep = "=" * 60
+    if tools and not db_context:
+        return (
+            "STUDENT/USER QUESTION: {msg}\n\n"
+            "Look up the portal data you need with the provided tools, then answer. "
+            "If the tools do not return enough information, say so and give general guidance."
+        ).format(msg=user_message)
+    ctx = db_context.strip() if db_context else "No specific database records found for this query."
+    if tools:
+        return (
+            "DATABASE CONTEXT (live data from the placement portal):\n"
+            "{sep}\n"
+            "{ctx}\n"
+            "{sep}\n\n"
+            "STUDENT/USER QUESTION: {msg}\n\n"
+            "Answer using the database context above, and call the provided tools for any other portal data. "
+            "If there is not enough information, say so and give general guidance."
+        ).format(sep=sep, ctx=ctx, msg=user_message)
+    return (
+        "DATABASE CONTEXT (live data from the placement portal):\n"
+        "{sep}\n"
+        "{ctx}\n"
+        "{sep}\n\n"
+        "STUDENT/USER QUESTION: {msg}\n\n"
+        "Please answer using the database context above. "
+        "If the context does not contain enough information, say so and give general guidance."
+    ).format(sep=sep, ctx=ctx, msg=user_message)
+
+
+def trim_block(text, max_tokens):
+    """Keep the block header and as many lines as fit in ``max_tokens``."""
+    lines = text.split("\n")
+    kept = [lines[0]]
+    used = estimate_tokens(lines[0])
+    for index, line in enumerate(lines[1:], start=1):
+        remaining = len(lines) - index
+        note = "  ... ({} more not shown)".format(remaining)
+        cost = estimate_tokens(line) + 1
+        if used + cost + estimate_tokens(note) > max_tokens:
+            kept.append(note)
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+class PromptPlan:
+    """Everything a provider call needs, plus the token accounting for it."""
+
+    def __init__(self, user_message, intent, system_variant, system_prompt, context,
+                 history, max_output_tokens, blocks_used, blocks_trimmed, blocks_dropped, tools=None):
+        self.user_message = user_message
+        self.intent = intent
+        self.system_variant = system_variant
+        self.system_prompt = system_prompt
+        self.context = context
+        self.history = history
+        self.max_output_tokens = max_output_tokens
+        self.blocks_used = blocks_used
+        self.blocks_trimmed = blocks_trimmed
+        self.blocks_dropped = blocks_dropped
+        # Tool names offered to the provider (function-calling mode), and the
+        # ToolRunner the engine attaches to execute them
+        self.tools = list(tools or [])
+        self.tool_runner = None
+        # Set by the model router: 'light' or 'full' model tier and the complexity score
+        self.model_tier = 'full'
+        self.complexity = None
+        self.user_turn = build_user_turn(user_message, context, bool(self.tools))
+        self.estimated_prompt_tokens = (
+            estimate_tokens(system_prompt)
+            + sum(estimate_tokens(turn.get("content")) for turn in history)
+            + estimate_tokens(self.user_turn)
+        )
+        # provider -> {'prompt_tokens': n, 'completion_tokens': n} as reported by the provider
+        self.usage = {}
+        # Usage of the provider's earlier tool-calling rounds, added to the current one
+        self._usage_before = {}
+
+    def record_usage(self, provider, prompt_tokens=None, completion_tokens=None):
+        before = self._usage_before.get(provider)
+        if before:
+            prompt_tokens = (before['prompt_tokens'] or 0) + (prompt_tokens or 0)
+            completion_tokens = (before['completion_tokens'] or 0) + (completion_tokens or 0)
+        self.usage[provider] = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+        }
+
+    def next_round(self, provider):
+        """Start another tool-calling round; usage recorded from now on adds to the earlier rounds."""
+        if provider in self.usage:
+            self._usage_before[provider] = dict(self.usage[provider])
+
+    def usage_for(self, provider):
+        reported = self.usage.get(provider) or {}
+        return {
+            'estimated_prompt_tokens': self.estimated_prompt_tokens,
+            'prompt_tokens': reported.get('prompt_tokens'),
+            'completion_tokens': reported.get('completion_tokens'),
+            'max_output_tokens': self.max_output_tokens,
+            'system_prompt': self.system_variant,
+            'model_tier': self.model_tier,
+        }
+
+
+class PromptAssembler:
+    """Builds PromptPlans within a token budget and records prompt sizes."""
+
+    def __init__(self, token_budget=2000, max_output_tokens=900):
+        self.token_budget = token_budget
+        self.max_output_tokens = max_output_tokens
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            token_budget=int(os.getenv('CHATBOT_PROMPT_TOKEN_BUDGET', '2000')),
+            max_output_tokens=int(os.getenv('CHATBOT_MAX_OUTPUT_TOKENS', '900')),
+        )
+
+    @staticmethod
+    def rank_blocks(blocks, intent):
+        priority = BLOCK_PRIORITY.get(intent, BLOCK_PRIORITY['general'])
+        rank = {key: index for index, key in enumerate(priority)}
+        ordered = sorted(enumerate(blocks), key=lambda item: (rank.get(item[1][0], len(rank)), item[0]))
+        return [block for _, block in ordered]
+
+    def _trim_summary(self, history):
+        """Summary lines from the history within half the history share, oldest dropped first."""
+        lines = [
+            line for t in (history or []) if t.get("role") == "summary"
+            for line in (t.get("content") or "").split("\n") if line.strip()
+        ]
+        limit = int(self.token_budget * HISTORY_SHARE / 2)
+        while len(lines) > 1 and sum(estimate_tokens(line) + 1 for line in lines) > limit:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _trim_history(self, history, summary=None):
+        turns = [t for t in (history or []) if t.get("content") and t.get("role") != "summary"]
+        turns = turns[-MAX_HISTORY_TURNS:]
+        limit = int(self.token_budget * HISTORY_SHARE) - estimate_tokens(summary)
+        while turns and sum(estimate_tokens(t["content"]) for t in turns) > limit:
+            turns.pop(0)
+        return turns
+
+    def build(self, user_message, blocks, history=None, intent=None, tools=None):
+        """
+        Args:
+            user_message: the question
+            blocks: list of (key, text) database context blocks
+            history: prior turns as {'role', 'content'} dicts; a turn with
+                role 'summary' summarizes the conversation before them
+            intent: detected intent; guessed from the message when omitted
+            tools: tool names offered to the provider (function-calling mode)
+        """
+        intent = intent or detect_intent(user_message)
+        blocks = [(key, text) for key, text in blocks if text]
+        ranked = self.rank_blocks(blocks, intent)
+        summary = self._trim_summary(history)
+        turns = self._trim_history(history, summary)
+        summary_text = SUMMARY_HEADER + summary if summary else ""
+        if tools:
+            summary_text += TOOL_RULES
+
+        fixed = estimate_tokens(build_user_turn(user_message, "", bool(tools))) + sum(
+            estimate_tokens(t["content"]) for t in turns
+        ) + estimate_tokens(summary_text)
+        needed = min(MIN_CONTEXT_TOKENS, estimate_tokens(ranked[0][1])) if ranked else 0
+        variant = 'compact'
+        for candidate in SYSTEM_PROMPT_PREFERENCE.get(intent, DEFAULT_SYSTEM_PREFERENCE):
+            if estimate_tokens(SYSTEM_PROMPTS[candidate]) + fixed + needed <= self.token_budget:
+                variant = candidate
+                break
+        system_prompt = SYSTEM_PROMPTS[variant] + summary_text
+
+        remaining = self.token_budget - estimate_tokens(system_prompt) - fixed
+        used, trimmed, dropped, texts = [], [], [], []
+        for key, text in ranked:
+            cost = estimate_tokens(text) + 1
+            if cost <= remaining:
+                texts.append(text)
+                used.append(key)
+                remaining -= cost
+            elif remaining >= MIN_BLOCK_TOKENS:
+                texts.append(trim_block(text, remaining - 1))
+                used.append(key)
+                trimmed.append(key)
+                remaining = 0
+            else:
+                dropped.append(key)
+
+        max_output = min(self.max_output_tokens, MAX_OUTPUT_TOKENS.get(intent, self.max_output_tokens))
+        plan = PromptPlan(
+            user_message, intent, variant, system_prompt, "\n\n".join(texts), turns,
+            max_output, used, trimmed, dropped, tools,
+        )
+        metrics.observe('prompt.estimated_tokens', plan.estimated_prompt_tokens)
+        metrics.incr('prompt.system.{}'.format(variant))
+        if trimmed:
+            metrics.incr('prompt.blocks_trimmed', len(trimmed))
+        if dropped:
+            metrics.incr('prompt.blocks_dropped', len(dropped))
+        return plan
+
+    def record(self, plan, provider):
+        """Log and record the prompt/completion sizes of the call that answered."""
+        usage = plan.usage_for(provider)
+        if usage['prompt_tokens'] is not None:
+            metrics.observe('prompt.tokens.{}.prompt'.format(provider), usage['prompt_tokens'])
+            metrics.incr('prompt.tokens.{}.prompt_total'.format(provider), usage['prompt_tokens'])
+        if usage['completion_tokens'] is not None:
+            metrics.observe('prompt.tokens.{}.completion'.format(provider), usage['completion_tokens'])
+            metrics.incr('prompt.tokens.{}.completion_total'.format(provider), usage['completion_tokens'])
+        logger.info(
+            "Prompt | provider=%s intent=%s system=%s est_prompt=%s prompt=%s completion=%s "
+            "max_output=%s blocks=%s trimmed=%s dropped=%s",
+            provider, plan.intent, plan.system_variant, plan.estimated_prompt_tokens,
+            usage['prompt_tokens'], usage['completion_tokens'], plan.max_output_tokens,
+            ",".join(plan.blocks_used) or "-", ",".join(plan.blocks_trimmed) or "-",
+            ",".join(plan.blocks_dropped) or "-",
+        )
+        return usage
+
+    def stats(self):
+        snap = metrics.snapshot('prompt.')
+        # The registry labels its sample summaries in ms; these are token counts
+        tokens = {
+            name: {key[:-3] if key.endswith('_ms') else key: value for key, value in summary.items()}
+            for name, summary in snap['latency'].items()
+        }
+        return {
+            'token_budget': self.token_budget,
+            'max_output_tokens': self.max_output_tokens,
+            'counters': snap['counters'],
+            'tokens': tokens,
+        }
+
+
+# Shared assembler
+prompt_assembler = PromptAssembler.from_env()
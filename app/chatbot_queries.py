@@ -0,0 +1,180 @@
+"""
+Set-based read queries shared by the chatbot's intent router, handlers and
+context builder.
+
+Each function answers its question in a fixed number of SQL statements,
+however many students or applications there are: aggregates are single
+GROUP BY queries, and rows that need their related opportunity, job, user
+or profile fetch them in the same statement through joins or joined eager
+loads instead of one lookup per row. ``benchmarks/query_budget.py`` checks
+the statement counts on a seeded database of 10k students.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Application, Job, Opportunity, StudentProfile, User
+
+STATUSES = ('Applied', 'Shortlisted', 'Selected', 'Rejected')
+# Orderings the chatbot may ask for: highest package first, or soonest deadline
+SORTS = ('package', 'deadline')
+
+
+def student_applications(student_id, limit=None):
+    """
+    A student's applications, newest first, with their opportunity and job
+    loaded in the same statement.
+    """
+    query = Application.query.options(
+        joinedload(Application.opportunity), joinedload(Application.job)
+    ).filter(Application.student_id == student_id).order_by(Application.applied_at.desc())
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def application_target(app):
+    """(company, title, ctc) of an application's opportunity or job."""
+    if app.opportunity_id:
+        opp = app.opportunity
+        return (opp.company_name if opp else 'Unknown', opp.title if opp else 'Unknown',
+                opp.ctc if opp else None)
+    if app.job_id:
+        job = app.job
+        return job.company_name if job else 'Unknown', 'Job Opening', job.ctc if job else None
+    return None, None, None
+
+
+def sort_opportunities(query, sort):
+    """Order an Opportunity query by one of SORTS (unchanged for anything else)."""
+    if sort == 'package':
+        return query.order_by(Opportunity.package_order(), Opportunity.deadline)
+    if sort == 'deadline':
+        return query.order_by(Opportunity.deadline)
+    return query
+
+
+def open_opportunities(profile=None, min_lpa=None, max_lpa=None, sort=None, limit=None):
+    """
+    Opportunities whose deadline is still ahead, optionally only those
+    ``profile`` qualifies for by CGPA and branch, within a package range
+    (lakhs per annum) and ordered by ``sort`` (see SORTS). Filters and
+    ordering run in SQL on the indexed ctc_min_lpa/ctc_max_lpa and
+    opportunity_branches, not by parsing rows in Python.
+    """
+    query = Opportunity.query.filter(
+        Opportunity.deadline > datetime.utcnow(),
+        *Opportunity.package_filter(min_lpa, max_lpa)
+    )
+    if profile is not None:
+        query = query.filter(
+            or_(Opportunity.min_cgpa <= profile.cgpa, Opportunity.min_cgpa.is_(None)),
+            Opportunity.open_to_branch(profile.branch),
+        )
+    query = sort_opportunities(query, sort)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def eligible_opportunities(profile, limit=None, min_lpa=None, max_lpa=None, sort=None):
+    """
+    Open opportunities whose CGPA and branch requirements ``profile`` meets.
+    The branch test is an index seek on opportunity_branches, not a LIKE
+    scan of the comma-separated text.
+    """
+    return open_opportunities(profile, min_lpa=min_lpa, max_lpa=max_lpa, sort=sort, limit=limit)
+
+
+def status_counts(student_id=None):
+    """{status: count} over all applications, or one student's, in one GROUP BY."""
+    query = db.session.query(Application.status, func.count(Application.id))
+    if student_id is not None:
+        query = query.filter(Application.student_id == student_id)
+    return dict(query.group_by(Application.status).all())
+
+
+def placed_students_count():
+    """Number of distinct students with at least one Selected application."""
+    return db.session.query(func.count(func.distinct(Application.student_id))).filter(
+        Application.status == 'Selected'
+    ).scalar() or 0
+
+
+def recent_applicants(limit=50):
+    """
+    Latest applications with the applicant, their profile and the company,
+    as rows of (application, user, profile or None, company or None).
+    """
+    return (
+        db.session.query(
+            Application, User, StudentProfile,
+            func.coalesce(Opportunity.company_name, Job.company_name),
+        )
+        .join(User, Application.student_id == User.id)
+        .outerjoin(StudentProfile, StudentProfile.user_id == User.id)
+        .outerjoin(Opportunity, Application.opportunity_id == Opportunity.id)
+        .outerjoin(Job, Application.job_id == Job.id)
+        .order_by(Application.applied_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _per_student_applications():
+    """Subquery: applications and a placed flag (0/1) per student."""
+    return (
+        db.session.query(
+            Application.student_id.label('student_id'),
+            func.count(Application.id).label('applications'),
+            func.max(case((Application.status == 'Selected', 1), else_=0)).label('placed'),
+        )
+        .group_by(Application.student_id)
+        .subquery()
+    )
+
+
+def _branch_aggregate(branch, *group_by):
+    per_student = _per_student_applications()
+    query = (
+        db.session.query(
+            *group_by,
+            func.count(StudentProfile.id),
+            func.avg(StudentProfile.cgpa),
+            func.coalesce(func.sum(per_student.c.applications), 0),
+            func.coalesce(func.sum(per_student.c.placed), 0),
+        )
+        .select_from(StudentProfile)
+        .outerjoin(per_student, per_student.c.student_id == StudentProfile.user_id)
+    )
+    if branch:
+        query = query.filter(StudentProfile.branch == branch)
+    if group_by:
+        query = query.group_by(*group_by)
+    return query
+
+
+def branch_statistics(branch=None):
+    """
+    {branch: {students, avg_cgpa, applications, placed}} for every branch
+    (or just ``branch``), in one statement.
+    """
+    rows = _branch_aggregate(branch, StudentProfile.branch).all()
+    return {
+        name: {
+            'students': students,
+            'avg_cgpa': round(avg_cgpa or 0, 2),
+            'applications': int(applications),
+            'placed': int(placed),
+        }
+        for name, students, avg_cgpa, applications, placed in rows
+    }
+
+
+def branch_totals(branch=None):
+    """(students, avg_cgpa, applications, placed) across one branch or all, in one statement."""
+    students, avg_cgpa, applications, placed = _branch_aggregate(branch).one()
+    return students, avg_cgpa or 0, int(applications), int(placed)
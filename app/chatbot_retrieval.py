@@ -0,0 +1,307 @@
+"""
+BM25 retrieval over opportunities for the chatbot's database context.
+
+The snapshot's opportunities block lists the most recent postings whatever
+the question is, so "data science internships" can miss an older data
+science posting while paying for a dozen unrelated lines. This index ranks
+every opportunity against the question instead, and the engine sends only
+the top-k matches.
+
+Each opportunity is indexed from its title, company name, type,
+requirements and description. Title and company count three times and type
+twice, so a match there outranks a passing mention in the description.
+Scores are standard BM25 (k1=1.2, b=0.75) over an in-memory inverted
+index; matches scoring under 40% of the best one are left out.
+
+The index is built when the app starts (or on first use) and then kept in
+step with the database. ``after_insert``/``after_update``/``after_delete``
+mapper events queue changes on the session, and they are applied only when
+that session commits; a rollback discards them. ``Query.update()`` and
+``Query.delete()`` skip mapper events, so they mark the index for a full
+rebuild on the next search.
+
+Configuration:
+    CHATBOT_RETRIEVAL          1/0 to enable or disable relevance ranking (default 1)
+    CHATBOT_RETRIEVAL_TOP_K    opportunities sent per question (default 8)
+"""
+
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+# Matches scoring below this share of the best one are left out of the context
+MIN_RELATIVE_SCORE = 0.4
+# field -> times its tokens are counted
+FIELD_WEIGHTS = (('title', 3), ('company_name', 3), ('type', 2), ('requirements', 1), ('description', 1))
+
+# Question words that say nothing about which posting is meant
+STOPWORDS = frozenset("""
+    a an the is are was were be been am i me my we our you your it its this that these those do does
+    did can could should would will to of for in on at by with about from and or as what which who how
+    when where why any some all please tell show give list find get want need looking there here
+    available open opening openings opportunity opportunities more other
+""".split())
+
+_PENDING_KEY = '_opportunity_index_pending'
+_REBUILD_KEY = '_opportunity_index_rebuild'
+
+# What the context line needs, detached from the session
+IndexedOpportunity = namedtuple('IndexedOpportunity', [
+    'id', 'type', 'title', 'company_name', 'organizer', 'ctc', 'deadline',
+    'min_cgpa', 'allowed_branches', 'created_at', 'ctc_min_lpa', 'ctc_max_lpa', 'stipend_unit',
+])
+
+
+def tokenize(text):
+    """Lowercased words without stopwords, plural "s" stripped."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9+#]+", (text or "").lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _document(opp):
+    """(record, term frequencies, length) for one Opportunity row."""
+    tokens = []
+    for field, weight in FIELD_WEIGHTS:
+        tokens.extend(tokenize(getattr(opp, field, None)) * weight)
+    record = IndexedOpportunity(
+        opp.id, opp.type, opp.title, opp.company_name, opp.organizer, opp.ctc, opp.deadline,
+        opp.min_cgpa, opp.allowed_branches, opp.created_at, opp.ctc_min_lpa, opp.ctc_max_lpa, opp.stipend_unit,
+    )
+    return record, Counter(tokens), len(tokens)
+
+
+class OpportunityIndex:
+    """Inverted index term -> {opportunity id: term frequency} with BM25 ranking."""
+
+    def __init__(self, enabled=True, top_k=8):
+        self.enabled = enabled
+        self.top_k = top_k
+        self._postings = {}
+        self._records = {}
+        self._lengths = {}
+        self._terms = {}
+        self._total_length = 0
+        self._built = False
+        self._stale = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('CHATBOT_RETRIEVAL', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            top_k=int(os.getenv('CHATBOT_RETRIEVAL_TOP_K', '8')),
+        )
+
+    # ==================== Maintenance ====================
+
+    def build(self):
+        """(Re)index every opportunity. Must be called inside an application context."""
+        from app.models import Opportunity
+
+        started = time.monotonic()
+        documents = [_document(opp) for opp in Opportunity.query.all()]
+        with self._lock:
+            self._postings, self._records, self._lengths, self._terms = {}, {}, {}, {}
+            self._total_length = 0
+            for document in documents:
+                self._add(*document)
+            self._built, self._stale = True, False
+        metrics.incr('retrieval.rebuilds')
+        metrics.observe('retrieval.build', (time.monotonic() - started) * 1000)
+        logger.info("Opportunity index built: %d opportunities, %d terms", len(documents), len(self._postings))
+
+    def _add(self, record, frequencies, length):
+        self._remove(record.id)
+        self._records[record.id] = record
+        self._lengths[record.id] = length
+        self._terms[record.id] = tuple(frequencies)
+        self._total_length += length
+        for term, count in frequencies.items():
+            self._postings.setdefault(term, {})[record.id] = count
+
+    def _remove(self, opp_id):
+        if opp_id not in self._records:
+            return
+        del self._records[opp_id]
+        self._total_length -= self._lengths.pop(opp_id)
+        for term in self._terms.pop(opp_id):
+            postings = self._postings[term]
+            del postings[opp_id]
+            if not postings:
+                del self._postings[term]
+
+    def apply(self, changes):
+        """Apply committed {id: document or None (deleted)} changes."""
+        with self._lock:
+            if not self._built:
+                return
+            for opp_id, document in changes.items():
+                if document is None:
+                    self._remove(opp_id)
+                else:
+                    self._add(*document)
+        metrics.incr('retrieval.updates', len(changes))
+
+    def mark_stale(self):
+        self._stale = True
+
+    def _ensure_built(self):
+        if self._built and not self._stale:
+            return
+        with self._lock:
+            if not self._built or self._stale:
+                self.build()
+
+    # ==================== Search ====================
+
+    def search(self, query, k=None):
+        """
+        Up to ``k`` (record, score) pairs for ``query``, best first, without
+        matches far weaker than the best one; empty when no term matches.
+        """
+        self._ensure_built()
+        terms = set(tokenize(query))
+        started = time.monotonic()
+        with self._lock:
+            count = len(self._records)
+            if not terms or not count:
+                return []
+            average = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for opp_id, tf in postings.items():
+                    norm = K1 * (1.0 - B + B * self._lengths[opp_id] / average)
+                    scores[opp_id] = scores.get(opp_id, 0.0) + idf * tf * (K1 + 1.0) / (tf + norm)
+            # Equal scores: newer postings (higher ids) first
+            ranked = heapq.nlargest(k or self.top_k, scores.items(), key=lambda item: (item[1], item[0]))
+            floor = ranked[0][1] * MIN_RELATIVE_SCORE if ranked else 0.0
+            results = [(self._records[opp_id], score) for opp_id, score in ranked if score >= floor]
+        metrics.observe('retrieval.search', (time.monotonic() - started) * 1000)
+        return results
+
+    def context_block(self, query, k=None):
+        """
+        Formatted opportunities block with the postings most relevant to
+        ``query``, or None when nothing matches (callers then fall back to
+        the most recent postings).
+        """
+        from app.chatbot_snapshot import opportunity_line
+
+        if not self.enabled:
+            return None
+        results = self.search(query, k)
+        if not results:
+            metrics.incr('retrieval.no_match')
+            return None
+        metrics.incr('retrieval.hits')
+        now = datetime.utcnow()
+        lines = ["[OPPORTUNITIES - {} most relevant to the question]".format(len(results))]
+        lines.extend(opportunity_line(record, now) for record, _ in results)
+        return "\n".join(lines)
+
+    def stats(self):
+        with self._lock:
+            documents, terms = len(self._records), len(self._postings)
+        p95 = metrics.percentile('retrieval.search', 95)
+        return {
+            'enabled': self.enabled,
+            'top_k': self.top_k,
+            'documents': documents,
+            'terms': terms,
+            'hits': metrics.counter('retrieval.hits'),
+            'no_match': metrics.counter('retrieval.no_match'),
+            'updates': metrics.counter('retrieval.updates'),
+            'rebuilds': metrics.counter('retrieval.rebuilds'),
+            'search_p95_ms': round(p95, 3) if p95 is not None else None,
+        }
+
+
+# Shared per-worker index
+opportunity_index = OpportunityIndex.from_env()
+
+
+# ==================== Change tracking ====================
+
+def _queue(target, document):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, {})[target.id] = document
+
+
+def _after_upsert(mapper, connection, target):
+    _queue(target, _document(target))
+
+
+def _after_delete(mapper, connection, target):
+    _queue(target, None)
+
+
+def _after_bulk(update_context):
+    mapper = getattr(update_context, 'mapper', None)
+    if mapper is not None and mapper.class_.__name__ == 'Opportunity':
+        update_context.session.info[_REBUILD_KEY] = True
+
+
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if session.info.pop(_REBUILD_KEY, False):
+        opportunity_index.mark_stale()
+    elif changes:
+        opportunity_index.apply(changes)
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_REBUILD_KEY, None)
+
+
+_installed = False
+
+
+def init_opportunity_index(app):
+    """Install the change listeners and build the index for ``app``."""
+    global _installed
+    from app.models import Opportunity
+
+    if not _installed:
+        event.listen(Opportunity, 'after_insert', _after_upsert)
+        event.listen(Opportunity, 'after_update', _after_upsert)
+        event.listen(Opportunity, 'after_delete', _after_delete)
+        event.listen(Session, 'after_bulk_update', _after_bulk)
+        event.listen(Session, 'after_bulk_delete', _after_bulk)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        _installed = True
+    if not opportunity_index.enabled:
+        return
+    try:
+        with app.app_context():
+            opportunity_index.build()
+    except Exception as e:
+        # Built on first search instead
+        logger.warning(f"Could not build the opportunity index at startup: {e}")
@@ -0,0 +1,161 @@
+"""
+Complexity-based model routing for the chatbot's LLM calls.
+
+Most questions that reach the providers are lookups phrased in a sentence
+("when is the Google deadline?") that a lightweight model answers as well
+as the full one, faster and for less. The router scores each PromptPlan
+from local features only, with no extra provider call:
+
+    * length of the question
+    * detected intent (lookups score low, open-ended questions higher)
+    * reasoning cues ("compare", "why", "explain", "roadmap", ...)
+    * multi-turn: earlier turns in the conversation, and follow-ups that
+      refer back to them ("and what about them?")
+    * number of context blocks the answer has to combine, and tool mode
+
+Questions scoring under CHATBOT_ROUTER_THRESHOLD go to the light tier: the
+provider's light model (when one is configured) with a smaller output
+budget. The rest go to the full model with the usual budget. Each decision
+is logged with its score and reasons. Answer latency per tier is recorded,
+so the metrics endpoint shows the effect.
+
+A provider without a light model configured serves both tiers with its
+full model; only the output budget changes.
+
+Configuration:
+    CHATBOT_MODEL_ROUTING               1/0 to enable or disable routing (default 1)
+    CHATBOT_ROUTER_THRESHOLD            score from which a question goes to the full model (default 2)
+    CHATBOT_LIGHT_MAX_OUTPUT_TOKENS     output budget of light-tier answers (default 400)
+    GEMINI_LIGHT_MODEL                  e.g. gemini-2.0-flash-lite (default none)
+    MISTRAL_LIGHT_MODEL                 e.g. open-mistral-nemo (default none)
+    OLLAMA_LIGHT_MODEL                  a smaller local model (default none)
+"""
+
+import logging
+import os
+import re
+
+from app.chatbot_memory import is_follow_up
+from app.chatbot_metrics import metrics
+from app.chatbot_prompt import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+LIGHT = 'light'
+FULL = 'full'
+
+# Intents answered by reading one or two context blocks back
+LOOKUP_INTENTS = frozenset({
+    'search_company', 'browse_opportunities', 'check_eligibility', 'application_status',
+    'upcoming_drives', 'placement_stats', 'list_applicants',
+})
+
+_REASONING = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|differen(?:ce|t)|better|best|why|explain|how (?:do|can|should) i|"
+    r"should i|strateg(?:y|ies)|plan|roadmap|prepare|preparation|improve|advice|suggest|recommend|"
+    r"pros|cons|trade-?offs?|analy[sz]e|step by step|in detail)\b",
+    re.IGNORECASE,
+)
+
+
+def complexity(plan):
+    """(score, reasons) for a PromptPlan; higher means harder."""
+    score, reasons = 0, []
+    tokens = estimate_tokens(plan.user_message)
+    if tokens > 40:
+        score += 2
+        reasons.append('long')
+    elif tokens > 18:
+        score += 1
+        reasons.append('medium_length')
+    if plan.intent not in LOOKUP_INTENTS:
+        score += 1
+        reasons.append('open_intent')
+    cues = {match.lower() for match in _REASONING.findall(plan.user_message)}
+    if cues:
+        score += 2 if len(cues) > 1 else 1
+        reasons.append('reasoning')
+    if plan.history:
+        score += 1
+        reasons.append('multi_turn')
+        if is_follow_up(plan.user_message):
+            score += 1
+            reasons.append('follow_up')
+    if len(plan.blocks_used) >= 3 or plan.blocks_trimmed:
+        score += 1
+        reasons.append('many_blocks')
+    if plan.tools:
+        score += 1
+        reasons.append('tools')
+    return score, reasons
+
+
+class ModelRouter:
+    """Picks the light or full tier for each plan and records per-tier latency."""
+
+    def __init__(self, enabled=True, threshold=2, light_max_output_tokens=400, light_models=None):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.light_max_output_tokens = light_max_output_tokens
+        # provider -> light model name
+        self.light_models = {name: model for name, model in (light_models or {}).items() if model}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('CHATBOT_MODEL_ROUTING', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            threshold=int(os.getenv('CHATBOT_ROUTER_THRESHOLD', '2')),
+            light_max_output_tokens=int(os.getenv('CHATBOT_LIGHT_MAX_OUTPUT_TOKENS', '400')),
+            light_models={
+                'gemini': os.getenv('GEMINI_LIGHT_MODEL', '').strip(),
+                'mistral': os.getenv('MISTRAL_LIGHT_MODEL', '').strip(),
+                'ollama': os.getenv('OLLAMA_LIGHT_MODEL', '').strip(),
+            },
+        )
+
+    def route(self, plan):
+        """Set ``plan.model_tier`` (and the light output budget) for ``plan``."""
+        if not self.enabled:
+            return plan
+        score, reasons = complexity(plan)
+        plan.model_tier = LIGHT if score < self.threshold else FULL
+        plan.complexity = score
+        if plan.model_tier == LIGHT:
+            plan.max_output_tokens = min(plan.max_output_tokens, self.light_max_output_tokens)
+        metrics.incr('router.{}'.format(plan.model_tier))
+        logger.info(
+            "Route | tier=%s score=%s reasons=%s intent=%s max_output=%s",
+            plan.model_tier, score, ",".join(reasons) or "-", plan.intent, plan.max_output_tokens,
+        )
+        return plan
+
+    def model_for(self, plan, provider, full_model):
+        """Model ``provider`` should use for ``plan``."""
+        if plan.model_tier == LIGHT:
+            return self.light_models.get(provider) or full_model
+        return full_model
+
+    def record(self, plan, provider, model, elapsed_seconds):
+        """Record the latency of an answer served on the plan's tier."""
+        metrics.observe('router.latency.{}'.format(plan.model_tier), elapsed_seconds * 1000)
+        logger.info(
+            "Route result | tier=%s provider=%s model=%s latency_ms=%.0f",
+            plan.model_tier, provider, model, elapsed_seconds * 1000,
+        )
+
+    def stats(self):
+        snap = metrics.snapshot('router.')
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'light_max_output_tokens': self.light_max_output_tokens,
+            'light_models': dict(self.light_models),
+            'routed': {tier: snap['counters'].get('router.{}'.format(tier), 0) for tier in (LIGHT, FULL)},
+            'latency': {
+                tier: snap['latency'].get('router.latency.{}'.format(tier)) for tier in (LIGHT, FULL)
+            },
+        }
+
+
+# Shared router
+model_router = ModelRouter.from_env()
@@ -7,6 +7,7 @@ import re
 from functools import wraps
 from flask import session, jsonify, current_app
 from app.models import User
+from app.chatbot_queries import SORTS
 
 
 # Allowed intents in the system
@@ -163,6 +164,14 @@ def sanitize_intent_params(intent: str, params: dict, user_id: int = None) -> di
     if 'company' in params and isinstance(params['company'], str):
         sanitized['company'] = params['company'][:100]
     
+    # Package range in lakhs per annum, and the result ordering
+    for key in ('min_lpa', 'max_lpa'):
+        value = params.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 1000:
+            sanitized[key] = float(value)
+    if params.get('sort') in SORTS:
+        sanitized['sort'] = params['sort']
+    
     if 'limit' in params and isinstance(params['limit'], int):
         sanitized['limit'] = min(params['limit'], 100)  # Cap at 100
     else:
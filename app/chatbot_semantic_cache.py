@@ -0,0 +1,251 @@
+"""
+Paraphrase-tolerant answer cache for the chatbot.
+
+The exact answer cache (``chatbot_cache``) only matches questions that
+normalize to the same text. This tier sits behind it and also matches
+rewordings such as "tips to prepare for interviews" and "how should I
+prepare for interviews".
+
+Each cached question is stored as a TF-IDF vector from the local intent
+classifier, with stopwords removed, a few synonyms folded together ("coming
+up" -> "upcoming", "preparation" -> "prepare") and the company name masked.
+The vectors live in one fixed-size NumPy matrix, so a lookup is a single
+matrix-vector product. A cached answer is only reused when all of these hold:
+
+    * the cosine similarity reaches the threshold
+    * the asker's role matches
+    * the database context hash matches
+    * the classified intent matches
+    * the extracted parameters (company, branch, CGPA) match
+
+So "prepare for Google" never answers "prepare for Amazon". Entries expire
+after a TTL and the least recently used one is replaced when the matrix is
+full. The cache is emptied whenever opportunities, applications or student
+profiles change.
+
+Matching is lexical, so not every paraphrase is served. At the default
+threshold, evaluate_semantic_cache.py hits 15 of 18 paraphrases with no false
+hits. Rewordings that share few content words ("what should I write in my
+resume" / "what should my resume contain") or that classify to a different
+intent miss and go to the providers. Lookups such as "which drives are
+coming up soon" rarely get here at all: the fast path answers them from
+the database first.
+
+Configuration:
+    CHATBOT_SEMANTIC_CACHE_SIZE        max entries per worker (default 512, 0 disables)
+    CHATBOT_SEMANTIC_CACHE_THRESHOLD   min cosine similarity for a hit (default 0.85)
+    CHATBOT_SEMANTIC_CACHE_TTL         seconds an answer stays valid (default CHATBOT_CACHE_TTL or 300)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from app.chatbot_cache import INVALIDATING_MODELS, normalize_message
+from app.chatbot_classifier import intent_classifier, mask_company
+from app.chatbot_metrics import metrics
+from app.model_events import on_models_changed
+
+logger = logging.getLogger(__name__)
+
+# 2048 dimensions keep 512 entries in 4 MB; folding barely changes similarities
+VECTOR_BITS = 11
+
+# Words that carry no meaning for matching a question to a cached answer
+STOPWORDS = frozenset("""
+    a an the is are was were be been am i me my mine we our us you your it its this that these
+    those do does did can could should would will shall may might must to of for in on at by with
+    about from and or so as s what which who whom how when where why there here any some all
+    please tell show give let know want need get like just also kindly soon
+""".split())
+
+# Wordings of the same thing folded to one word before vectorizing
+SYNONYMS = {
+    'coming up': 'upcoming',
+    'preparation': 'prepare',
+    'prep': 'prepare',
+}
+_SYNONYM_PATTERN = re.compile(r"\b(?:{})\b".format("|".join(map(re.escape, SYNONYMS))))
+
+
+def _stem(word):
+    """Strip a plural "s" so "interviews" and "interview" match."""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def semantic_text(message, company=None):
+    """Normalized message without stopwords or plurals, with synonyms folded and the company name masked."""
+    text = normalize_message(mask_company(message or "", company))
+    text = _SYNONYM_PATTERN.sub(lambda match: SYNONYMS[match.group(0)], text)
+    words = [_stem(word) for word in text.split() if word not in STOPWORDS]
+    return " ".join(words) or text
+
+
+class _Entry:
+    __slots__ = ('key', 'role', 'context', 'intent', 'params', 'expires_at', 'response')
+
+    def __init__(self, key, intent, params, expires_at, response):
+        self.key = key
+        _, self.role, self.context = key
+        self.intent = intent
+        self.params = params
+        self.expires_at = expires_at
+        self.response = response
+
+
+class SemanticCache:
+    """Thread-safe similarity cache over a bounded matrix of question vectors."""
+
+    def __init__(self, max_entries=512, ttl_seconds=300, threshold=0.85, bits=VECTOR_BITS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.bits = bits
+        self._vectors = None
+        self._entries = [None] * max(max_entries, 0)
+        self._last_used = np.zeros(max(max_entries, 0), dtype=np.int64)
+        self._slots = {}
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        default_ttl = os.getenv("CHATBOT_CACHE_TTL", "300")
+        return cls(
+            max_entries=int(os.getenv("CHATBOT_SEMANTIC_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("CHATBOT_SEMANTIC_CACHE_TTL", default_ttl)),
+            threshold=float(os.getenv("CHATBOT_SEMANTIC_CACHE_THRESHOLD", "0.85")),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def describe(self, message):
+        """(vector, intent, params) used to match ``message`` against cached questions."""
+        from app.chatbot_snapshot import portal_snapshot, COMPANY_NAMES
+
+        try:
+            company_names = portal_snapshot.get(COMPANY_NAMES) or ()
+        except Exception:
+            company_names = ()
+        prediction = intent_classifier.predict(message, company_names)
+        params = tuple(sorted((name, str(value).lower()) for name, value in prediction.params.items()))
+        text = semantic_text(message, prediction.params.get('company'))
+        return intent_classifier.embed(text, self.bits), prediction.intent, params
+
+    def get(self, key, message):
+        """
+        Cached response for a paraphrase of ``message``, or None.
+
+        ``key`` is the exact answer-cache key (normalized message, role,
+        context hash); only entries with the same role and context qualify.
+        """
+        if not self.enabled:
+            return None
+        vector, intent, params = self.describe(message)
+        if vector is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or not self._slots:
+                metrics.incr("semantic_cache.misses")
+                return None
+            similarities = self._vectors @ vector
+            best, best_similarity = None, self.threshold
+            for slot in np.flatnonzero(similarities >= self.threshold):
+                entry = self._entries[slot]
+                if entry is None or entry.role != key[1] or entry.context != key[2]:
+                    continue
+                if entry.intent != intent or entry.params != params:
+                    continue
+                if entry.expires_at <= now:
+                    self._drop(slot)
+                    metrics.incr("semantic_cache.expired")
+                    continue
+                if similarities[slot] >= best_similarity:
+                    best, best_similarity = slot, float(similarities[slot])
+            if best is None:
+                metrics.incr("semantic_cache.misses")
+                return None
+            self._tick += 1
+            self._last_used[best] = self._tick
+            response = dict(self._entries[best].response)
+        metrics.incr("semantic_cache.hits")
+        response["semantic_similarity"] = round(best_similarity, 3)
+        return response
+
+    def set(self, key, message, response):
+        if not self.enabled:
+            return
+        vector, intent, params = self.describe(message)
+        if vector is None:
+            return
+        entry = _Entry(key, intent, params, time.monotonic() + self.ttl_seconds, dict(response))
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._slots.get(key)
+            if slot is None:
+                if len(self._slots) < self.max_entries:
+                    slot = next(i for i, existing in enumerate(self._entries) if existing is None)
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self._drop(slot)
+                    metrics.incr("semantic_cache.evictions")
+            self._tick += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+            self._last_used[slot] = self._tick
+            self._slots[key] = slot
+
+    def _drop(self, slot):
+        entry = self._entries[slot]
+        if entry is not None:
+            self._slots.pop(entry.key, None)
+        self._entries[slot] = None
+        self._vectors[slot] = 0.0
+        self._last_used[slot] = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * len(self._entries)
+            self._last_used[:] = 0
+            self._slots.clear()
+            if self._vectors is not None:
+                self._vectors[:] = 0.0
+
+    def on_models_changed(self, changed):
+        if changed & INVALIDATING_MODELS:
+            self.clear()
+            metrics.incr("semantic_cache.invalidations")
+            logger.debug("Semantic cache cleared after changes to %s", ", ".join(sorted(changed)))
+
+    def stats(self):
+        hits = metrics.counter("semantic_cache.hits")
+        misses = metrics.counter("semantic_cache.misses")
+        with self._lock:
+            size = len(self._slots)
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "threshold": self.threshold,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "evictions": metrics.counter("semantic_cache.evictions"),
+            "invalidations": metrics.counter("semantic_cache.invalidations"),
+        }
+
+
+# Shared per-worker cache
+semantic_cache = SemanticCache.from_env()
+on_models_changed(semantic_cache.on_models_changed)
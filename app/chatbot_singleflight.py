@@ -0,0 +1,158 @@
+"""
+Single-flight coalescing of identical concurrent chat queries.
+
+When a drive is announced many students ask the same thing within the same
+second. Requests whose answer-cache key matches (normalized message, role
+and hash of the database context) are collapsed onto one in-flight provider
+call: the first request (the leader) calls the providers, the others
+(followers) wait for it and share its outcome, including a failure. Once
+the leader finishes, later requests are served by the answer cache.
+
+A follower waits at most the provider deadline plus a grace period. If the
+leader has not finished by then, the follower stops waiting and calls the
+providers itself. If the leader raises an exception, that exception is
+re-raised in every follower.
+
+Configuration:
+    CHATBOT_SINGLEFLIGHT           1/0 to enable or disable coalescing (default 1)
+    CHATBOT_SINGLEFLIGHT_TIMEOUT   max seconds a follower waits (default: provider deadline + 5)
+"""
+
+import logging
+import os
+import threading
+import time
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """The leader did not finish within the follower's wait limit."""
+
+
+class _Call:
+    """One in-flight computation and the requests waiting on it."""
+
+    __slots__ = ('done', 'result', 'error', 'followers', 'started')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.started = time.monotonic()
+
+    def wait(self, timeout):
+        if not self.done.wait(timeout):
+            raise SingleFlightTimeout()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Key -> in-flight call registry shared by the request threads of a worker."""
+
+    def __init__(self, enabled=True, timeout_seconds=None):
+        self.enabled = enabled
+        self.timeout_seconds = timeout_seconds
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        raw_timeout = os.getenv('CHATBOT_SINGLEFLIGHT_TIMEOUT', '').strip()
+        return cls(
+            enabled=os.getenv('CHATBOT_SINGLEFLIGHT', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            timeout_seconds=float(raw_timeout) if raw_timeout else None,
+        )
+
+    def wait_limit(self):
+        if self.timeout_seconds is not None:
+            return self.timeout_seconds
+        from app.chatbot_orchestrator import provider_orchestrator
+        return provider_orchestrator.deadline_seconds + 5.0
+
+    def join(self, key):
+        """
+        Return (call, is_leader). The leader must call finish() exactly once;
+        followers call wait() on the returned call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                return call, False
+            call = self._calls[key] = _Call()
+        metrics.incr('singleflight.leaders')
+        return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """Publish the leader's outcome and release the key."""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result, call.error = result, error
+        call.done.set()
+        if call.followers:
+            metrics.incr('singleflight.coalesced', call.followers)
+            if error is not None:
+                metrics.incr('singleflight.errors_shared', call.followers)
+            logger.info("Coalesced %d identical chat request(s) onto one provider call", call.followers)
+
+    def wait(self, call):
+        """Follower side: the leader's result (re-raising its error)."""
+        started = time.monotonic()
+        try:
+            return call.wait(self.wait_limit())
+        except SingleFlightTimeout:
+            metrics.incr('singleflight.timeouts')
+            raise
+        finally:
+            metrics.observe('singleflight.wait', (time.monotonic() - started) * 1000)
+
+    def do(self, key, fn):
+        """
+        Run ``fn()`` once per key among concurrent callers.
+
+        Returns (result, shared) where shared is True for followers. A
+        follower whose wait times out runs ``fn()`` itself.
+        """
+        if not self.enabled or key is None:
+            return fn(), False
+        call, leader = self.join(key)
+        if not leader:
+            try:
+                return self.wait(call), True
+            except SingleFlightTimeout:
+                logger.warning("Single-flight leader still running after %.1fs; calling providers directly",
+                               self.wait_limit())
+                return fn(), False
+        try:
+            result = fn()
+        except BaseException as exc:
+            self.finish(key, call, error=exc)
+            raise
+        self.finish(key, call, result=result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(call.followers for call in self._calls.values())
+        return {
+            'enabled': self.enabled,
+            'in_flight': in_flight,
+            'waiting': waiting,
+            'leaders': metrics.counter('singleflight.leaders'),
+            'coalesced': metrics.counter('singleflight.coalesced'),
+            'errors_shared': metrics.counter('singleflight.errors_shared'),
+            'timeouts': metrics.counter('singleflight.timeouts'),
+            'wait_p95_ms': metrics.percentile('singleflight.wait', 95),
+        }
+
+
+# Shared per-worker coalescer
+single_flight = SingleFlight.from_env()
@@ -0,0 +1,275 @@
+"""
+Materialized portal snapshot for the chatbot's database context.
+
+The portal-wide parts of the context sent to the LLM (recent opportunities,
+upcoming drives, placement statistics, branch analytics and the portal
+summary) are identical for every user, so they are built once, kept as
+pre-formatted text blocks and shared across requests. Building a context is
+then a dictionary lookup plus the per-student blocks (profile, eligibility,
+applications), which are still queried live. The snapshot also keeps the
+list of company names used to recognise company searches.
+
+A block is rebuilt when its TTL expires or after a commit touches one of the
+models it depends on. Rebuilds happen lazily on the next read. While one
+request rebuilds a block, concurrent readers keep getting the previous text
+instead of piling onto the database.
+
+Configuration:
+    CHATBOT_SNAPSHOT_TTL   seconds a block stays fresh without writes (default 60, 0 disables)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from app import db
+from app.chatbot_metrics import metrics
+from app.ctc import package_label
+from app.model_events import on_models_changed
+from app.models import Opportunity
+from app.placement_counters import placement_counters
+
+logger = logging.getLogger(__name__)
+
+OPPORTUNITIES = 'opportunities'
+UPCOMING_DRIVES = 'upcoming_drives'
+PLACEMENT_STATS = 'placement_stats'
+BRANCH_ANALYTICS = 'branch_analytics'
+PORTAL_SUMMARY = 'portal_summary'
+COMPANY_NAMES = 'company_names'
+
+
+def company_label(opp):
+    if not opp:
+        return "Unknown Company"
+    return opp.company_name or getattr(opp, "organizer", None) or "Unknown Company"
+
+
+def opportunity_line(o, now):
+    """One context line for an opportunity (or any object with the same attributes)."""
+    dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
+    days_left = ""
+    if o.deadline:
+        days_left = "{}d left".format((o.deadline - now).days)
+    # The parsed package reads the same for every posting; raw text when unparsed
+    ctc = package_label(o.ctc_min_lpa, o.ctc_max_lpa, o.stipend_unit)
+    if not ctc:
+        ctc = "{} {}".format(chr(8377), o.ctc) if o.ctc else "Not disclosed"
+    return "  * [{}] {} @ {} | CTC: {} | Deadline: {} {} | Min CGPA: {} | Branches: {}".format(
+        o.type,
+        o.title,
+        company_label(o),
+        ctc,
+        dl,
+        days_left,
+        o.min_cgpa or "None",
+        o.allowed_branches or "All",
+    )
+
+
+# ==================== Block builders ====================
+
+def _build_opportunities():
+    opps = Opportunity.query.order_by(Opportunity.created_at.desc()).limit(20).all()
+    if not opps:
+        return None
+    now = datetime.utcnow()
+    lines = ["[OPPORTUNITIES - {} most recent]".format(len(opps))]
+    for o in opps[:12]:
+        lines.append(opportunity_line(o, now))
+    if len(opps) > 12:
+        lines.append("  ... and {} more in the portal.".format(len(opps) - 12))
+    return "\n".join(lines)
+
+
+def _build_upcoming_drives():
+    now = datetime.utcnow()
+    upcoming = (
+        Opportunity.query.filter(Opportunity.deadline > now)
+        .order_by(Opportunity.deadline)
+        .limit(10)
+        .all()
+    )
+    if not upcoming:
+        return None
+    lines = ["[UPCOMING DRIVES - next {}]".format(len(upcoming))]
+    for o in upcoming:
+        dl = o.deadline.strftime("%Y-%m-%d") if o.deadline else "N/A"
+        days = (o.deadline - now).days if o.deadline else "?"
+        lines.append("  * {} @ {} | {} ({} days left)".format(
+            o.title, company_label(o), dl, days
+        ))
+    return "\n".join(lines)
+
+
+def _build_placement_stats():
+    counts = placement_counters.totals()
+    total_students = counts['profiles']
+    placed = counts['placed']
+    total_apps = counts['applications']
+    pending = counts['by_status'].get("Applied", 0)
+    rate = (placed / total_students * 100) if total_students else 0
+    total_opps = counts['opportunities']
+    return (
+        "[PLACEMENT STATISTICS]\n"
+        "  Total students     : {}\n"
+        "  Placed students    : {}\n"
+        "  Placement rate     : {:.1f}%\n"
+        "  Total opportunities: {}\n"
+        "  Total applications : {}\n"
+        "  Pending (Applied)  : {}".format(
+            total_students, placed, rate, total_opps, total_apps, pending
+        )
+    )
+
+
+def _build_branch_analytics():
+    stats = placement_counters.branch_statistics()
+    if not stats:
+        return None
+    lines = ["[BRANCH ANALYTICS]"]
+    for branch in sorted(stats):
+        cnt, avg_cgpa = stats[branch]['students'], stats[branch]['avg_cgpa']
+        lines.append("  * {}: {} students, avg CGPA {:.2f}".format(
+            branch, cnt, avg_cgpa
+        ))
+    return "\n".join(lines)
+
+
+def _build_portal_summary():
+    counts = placement_counters.totals()
+    total_opps = counts['opportunities']
+    active_opps = Opportunity.query.filter(
+        Opportunity.deadline > datetime.utcnow()
+    ).count()
+    total_students = counts['profiles']
+    return (
+        "[PORTAL SNAPSHOT]\n"
+        "  Total opportunities: {} ({} still open)\n"
+        "  Total students: {}\n"
+        "  Placement cell is active.".format(
+            total_opps, active_opps, total_students
+        )
+    )
+
+
+def _build_company_names():
+    """Lowercased company names (used for matching, not sent to the LLM)."""
+    rows = db.session.query(Opportunity.company_name).distinct().all()
+    return tuple(sorted({name.strip().lower() for (name,) in rows if name and name.strip()}))
+
+
+# block name -> (builder, models whose changes make it stale)
+BLOCKS = {
+    OPPORTUNITIES: (_build_opportunities, {'Opportunity'}),
+    UPCOMING_DRIVES: (_build_upcoming_drives, {'Opportunity'}),
+    PLACEMENT_STATS: (_build_placement_stats, {'Opportunity', 'Application', 'StudentProfile'}),
+    BRANCH_ANALYTICS: (_build_branch_analytics, {'StudentProfile'}),
+    PORTAL_SUMMARY: (_build_portal_summary, {'Opportunity', 'StudentProfile'}),
+    COMPANY_NAMES: (_build_company_names, {'Opportunity'}),
+}
+
+
+class _Block:
+    __slots__ = ('text', 'built_at', 'version', 'lock')
+
+    def __init__(self):
+        self.text = None
+        self.built_at = None
+        self.version = -1
+        self.lock = threading.Lock()
+
+
+class PortalSnapshot:
+    """Shared, lazily rebuilt, pre-formatted context blocks."""
+
+    def __init__(self, ttl_seconds=60, blocks=None):
+        self.ttl_seconds = ttl_seconds
+        self._builders = dict(blocks or BLOCKS)
+        self._blocks = {name: _Block() for name in self._builders}
+        # Bumped by commits; a block built at an older version is stale
+        self._versions = {name: 0 for name in self._builders}
+
+    @classmethod
+    def from_env(cls):
+        return cls(ttl_seconds=float(os.getenv('CHATBOT_SNAPSHOT_TTL', '60')))
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0
+
+    def _is_fresh(self, name, block, now):
+        return (
+            block.built_at is not None
+            and block.version == self._versions[name]
+            and now - block.built_at < self.ttl_seconds
+        )
+
+    def get(self, name):
+        """
+        Return the formatted block ``name`` (None when it has no content).
+        Must be called inside an application context.
+        """
+        builder, _ = self._builders[name]
+        if not self.enabled:
+            return builder()
+
+        block = self._blocks[name]
+        if self._is_fresh(name, block, time.monotonic()):
+            metrics.incr('snapshot.hits')
+            return block.text
+
+        # Someone else is rebuilding: serve the previous text if there is one
+        if not block.lock.acquire(blocking=block.built_at is None):
+            metrics.incr('snapshot.stale_served')
+            return block.text
+        try:
+            if self._is_fresh(name, block, time.monotonic()):
+                metrics.incr('snapshot.hits')
+                return block.text
+            version = self._versions[name]
+            started = time.monotonic()
+            text = builder()
+            metrics.observe('snapshot.build', (time.monotonic() - started) * 1000)
+            metrics.incr('snapshot.rebuilds')
+            block.text, block.version, block.built_at = text, version, time.monotonic()
+            return text
+        finally:
+            block.lock.release()
+
+    def invalidate(self, names=None):
+        for name in names or list(self._versions):
+            self._versions[name] += 1
+
+    def on_models_changed(self, changed):
+        stale = [name for name, (_, models) in self._builders.items() if changed & models]
+        if stale:
+            self.invalidate(stale)
+            metrics.incr('snapshot.invalidations')
+            logger.debug("Portal snapshot blocks %s marked stale", ", ".join(stale))
+
+    def stats(self):
+        now = time.monotonic()
+        blocks = {}
+        for name, block in self._blocks.items():
+            blocks[name] = {
+                'fresh': self._is_fresh(name, block, now) if self.enabled else False,
+                'age_seconds': round(now - block.built_at, 1) if block.built_at is not None else None,
+            }
+        return {
+            'enabled': self.enabled,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': metrics.counter('snapshot.hits'),
+            'stale_served': metrics.counter('snapshot.stale_served'),
+            'rebuilds': metrics.counter('snapshot.rebuilds'),
+            'invalidations': metrics.counter('snapshot.invalidations'),
+            'build_p95_ms': metrics.percentile('snapshot.build', 95),
+            'blocks': blocks,
+        }
+
+
+# Shared per-worker snapshot
+portal_snapshot = PortalSnapshot.from_env()
+on_models_changed(portal_snapshot.on_models_changed)
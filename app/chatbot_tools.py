@@ -0,0 +1,273 @@
+"""
+Function-calling mode for the chatbot's LLM providers.
+
+Instead of guessing up front which database blocks a question needs and
+pasting all of them into the prompt, the provider is given the
+SecureIntentRouter handlers as tools and asks for the data it wants:
+
+    search_company, check_eligibility, application_status, upcoming_drives,
+    placement_stats, list_applicants, branch_analytics
+
+Only the tools the asker's role may use are declared. Every call the model
+makes still goes through ``SecureIntentRouter.route_intent``, so
+``check_intent_permission`` and ``sanitize_intent_params`` apply exactly as
+they do for the fast path. A model that names a tool the user may not use,
+or invents one, gets an error result back. The model gets at most
+CHATBOT_TOOL_MAX_ROUNDS rounds of tool calls; after that it must answer with
+the data it already has.
+
+Gemini (functionDeclarations) and Mistral (OpenAI-style tools) take part.
+Ollama models are not offered tools, so in this mode the chain skips Ollama
+and falls back to the database-only answer instead.
+
+Configuration:
+    CHATBOT_TOOL_CALLING       1/0 to enable function-calling mode (default 0)
+    CHATBOT_TOOL_MAX_ROUNDS    max rounds of tool calls per answer (default 3)
+"""
+
+import json
+import logging
+import os
+import time
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TOOL_PROVIDERS = ('gemini', 'mistral')
+# Longest tool result handed back to the model (characters of JSON)
+MAX_RESULT_CHARS = 4000
+
+_LIMIT = {'type': 'integer', 'description': 'Maximum number of rows to return (default 10).'}
+# Package range and ordering, applied in SQL by the handlers
+_PACKAGE = {
+    'min_lpa': {'type': 'number', 'description': 'Only packages reaching at least this many lakhs per annum '
+                                                 '(stipends are annualised: 20k/month is 2.4).'},
+    'max_lpa': {'type': 'number', 'description': 'Only packages starting at or below this many lakhs per annum.'},
+    'sort': {'type': 'string', 'enum': ['package', 'deadline'],
+             'description': '"package" for highest paying first, "deadline" for soonest deadline first.'},
+}
+
+# intent -> (description, JSON schema properties, required properties)
+TOOL_SPECS = {
+    'search_company': (
+        "Find job and internship opportunities posted by a company.",
+        {'company': {'type': 'string', 'description': 'Company name, e.g. Google.'}, 'limit': _LIMIT, **_PACKAGE},
+        ['company'],
+    ),
+    'check_eligibility': (
+        "List open opportunities the logged-in student is eligible for (CGPA and branch criteria).",
+        {'limit': _LIMIT, **_PACKAGE},
+        [],
+    ),
+    'application_status': (
+        "List the logged-in student's applications with company, role and status.",
+        {},
+        [],
+    ),
+    'upcoming_drives': (
+        "List job and internship drives with application deadlines in the next 30 days.",
+        {'limit': _LIMIT},
+        [],
+    ),
+    'placement_stats': (
+        "Portal-wide placement statistics: students, placed students, placement rate, applications by status.",
+        {},
+        [],
+    ),
+    'list_applicants': (
+        "Most recent applicants with name, email, CGPA and application status.",
+        {'limit': _LIMIT},
+        [],
+    ),
+    'branch_analytics': (
+        "Per-branch student counts, average CGPA, applications and placed students.",
+        {'branch': {'type': 'string', 'description': 'Branch code such as CSE or ECE; omit for all branches.'}},
+        [],
+    ),
+}
+
+TOOL_RULES = (
+    "\n\nTOOLS:\n"
+    "- Portal data is not included in the message; call the provided tools to look up what you need.\n"
+    "- Only call tools whose data the question needs, and never invent data a tool did not return.\n"
+)
+
+
+def _schema(name):
+    description, properties, required = TOOL_SPECS[name]
+    schema = {'type': 'object', 'properties': properties}
+    if required:
+        schema['required'] = required
+    return description, schema
+
+
+def gemini_tools(names):
+    """``tools`` payload for Gemini generateContent."""
+    declarations = []
+    for name in names:
+        description, schema = _schema(name)
+        declaration = {'name': name, 'description': description}
+        if schema['properties']:
+            declaration['parameters'] = schema
+        declarations.append(declaration)
+    return [{'functionDeclarations': declarations}]
+
+
+def mistral_tools(names):
+    """OpenAI-style ``tools`` payload for Mistral chat completions."""
+    tools = []
+    for name in names:
+        description, schema = _schema(name)
+        tools.append({'type': 'function', 'function': {
+            'name': name, 'description': description, 'parameters': schema,
+        }})
+    return tools
+
+
+def gemini_parts(data):
+    """Parts of the first candidate of a Gemini response (or stream chunk)."""
+    candidates = data.get('candidates') or []
+    if not candidates:
+        return []
+    return [part for part in (candidates[0].get('content') or {}).get('parts') or [] if isinstance(part, dict)]
+
+
+def has_function_call(parts):
+    return any(part.get('functionCall') for part in parts)
+
+
+def merge_tool_call_deltas(calls, deltas):
+    """Fold streamed OpenAI-style ``delta.tool_calls`` fragments into ``calls`` (index -> call)."""
+    for position, delta in enumerate(deltas or ()):
+        call = calls.setdefault(delta.get('index', position), {
+            'id': None, 'type': 'function', 'function': {'name': '', 'arguments': ''},
+        })
+        if delta.get('id'):
+            call['id'] = delta['id']
+        function = delta.get('function') or {}
+        call['function']['name'] += function.get('name') or ''
+        arguments = function.get('arguments') or ''
+        call['function']['arguments'] += arguments if isinstance(arguments, str) else json.dumps(arguments)
+    return calls
+
+
+def _coerce(args):
+    """Whole-number floats from JSON become ints (the router only accepts int limits/ids)."""
+    if not isinstance(args, dict):
+        return {}
+    return {key: int(value) if isinstance(value, float) and value.is_integer() else value
+            for key, value in args.items()}
+
+
+class ToolRunner:
+    """Executes the model's tool calls for one question through SecureIntentRouter."""
+
+    def __init__(self, app, user_id, names, max_rounds=3):
+        self.app = app
+        self.user_id = user_id
+        self.names = list(names)
+        self.max_rounds = max_rounds
+        self.calls = 0
+
+    @staticmethod
+    def available(user_id):
+        """Tool names the user's role may call. Must be called inside an application context."""
+        from app.chatbot_security import check_intent_permission
+
+        return [name for name in TOOL_SPECS if check_intent_permission(name, user_id)]
+
+    def run(self, name, args):
+        """Result dict for one tool call (``{'error': ...}`` on refusal or failure)."""
+        from app import db
+        from app.chatbot_intent_router import SecureIntentRouter
+
+        self.calls += 1
+        if name not in self.names:
+            metrics.incr('tools.refused')
+            logger.warning("Model requested unavailable tool %r (user_id=%s)", name, self.user_id)
+            return {'error': 'Tool {} is not available to this user.'.format(name)}
+        started = time.monotonic()
+        # Provider calls run on orchestrator threads, which have no app context
+        with self.app.app_context():
+            result = SecureIntentRouter(db).route_intent(name, _coerce(args), self.user_id)
+        metrics.incr('tools.calls')
+        metrics.incr('tools.calls.{}'.format(name))
+        metrics.observe('tools.latency', (time.monotonic() - started) * 1000)
+        if not result.get('success'):
+            return {'error': result.get('error') or 'Tool failed.'}
+        payload = json.dumps(result.get('data') or {}, default=str)
+        if len(payload) > MAX_RESULT_CHARS:
+            metrics.incr('tools.truncated')
+            return {'result_truncated': payload[:MAX_RESULT_CHARS]}
+        return {'result': result.get('data') or {}}
+
+    def exhausted(self, round_number):
+        """True once ``round_number`` rounds of tool calls have run."""
+        return round_number >= self.max_rounds
+
+    # ==================== Gemini ====================
+
+    def extend_gemini(self, payload, model_parts, round_number):
+        """
+        Run the functionCall parts of one Gemini model turn and append that
+        turn (verbatim, as the API expects) and the functionResponse turn to
+        ``payload['contents']``. After the last allowed round, further
+        function calling is switched off.
+        """
+        metrics.incr('tools.rounds')
+        payload['contents'].append({'role': 'model', 'parts': model_parts})
+        payload['contents'].append({'role': 'user', 'parts': [
+            {'functionResponse': {
+                'name': part['functionCall'].get('name'),
+                'response': self.run(part['functionCall'].get('name'), part['functionCall'].get('args') or {}),
+            }} for part in model_parts if isinstance(part, dict) and part.get('functionCall')
+        ]})
+        if self.exhausted(round_number + 1):
+            payload['toolConfig'] = {'functionCallingConfig': {'mode': 'NONE'}}
+
+    # ==================== Mistral ====================
+
+    def extend_chat(self, payload, tool_calls, round_number):
+        """Run one round of OpenAI-style tool calls and append the assistant and tool messages."""
+        metrics.incr('tools.rounds')
+        payload['messages'].append({'role': 'assistant', 'content': '', 'tool_calls': tool_calls})
+        for call in tool_calls:
+            function = call.get('function') or {}
+            try:
+                args = json.loads(function.get('arguments') or '{}')
+            except ValueError:
+                args = {}
+            payload['messages'].append({
+                'role': 'tool',
+                'name': function.get('name'),
+                'tool_call_id': call.get('id'),
+                'content': json.dumps(self.run(function.get('name'), args), default=str),
+            })
+        if self.exhausted(round_number + 1):
+            payload['tool_choice'] = 'none'
+
+
+def tool_settings():
+    """(enabled, max_rounds) from the environment."""
+    enabled = os.getenv('CHATBOT_TOOL_CALLING', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+    return enabled, max(1, int(os.getenv('CHATBOT_TOOL_MAX_ROUNDS', '3')))
+
+
+def tool_stats():
+    snap = metrics.snapshot('tools.')
+    latency = snap['latency'].get('tools.latency') or {}
+    enabled, max_rounds = tool_settings()
+    return {
+        'enabled': enabled,
+        'max_rounds': max_rounds,
+        'calls': snap['counters'].get('tools.calls', 0),
+        'rounds': snap['counters'].get('tools.rounds', 0),
+        'refused': snap['counters'].get('tools.refused', 0),
+        'truncated': snap['counters'].get('tools.truncated', 0),
+        'by_tool': {
+            name[len('tools.calls.'):]: count
+            for name, count in snap['counters'].items() if name.startswith('tools.calls.')
+        },
+        'latency': latency,
+    }
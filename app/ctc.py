@@ -0,0 +1,128 @@
+"""
+CTC / stipend parsing for jobs and opportunities.
+
+Admins type packages as free text ("12 LPA", "8-10 LPA", "Rs. 12,00,000 per
+annum", "20k/month", "Rs. 500/day"). ``parse_ctc`` turns that into a
+numeric range in lakhs per annum plus the stipend period, which the models
+store in ``ctc_min_lpa``/``ctc_max_lpa``/``stipend_unit`` (see
+``PackageMixin`` in app.models) so packages can be filtered and sorted in
+SQL. Stipends are annualised (a month is 12 per year, a week 52, a day
+365) so that internships and jobs sort on the same scale; the period is
+kept so pages can still show "per month".
+
+Text without a recognisable amount ("Not disclosed", "Competitive", a
+foreign currency) parses to ``Package(None, None, None)``.
+"""
+
+import re
+from collections import namedtuple
+
+Package = namedtuple('Package', 'min_lpa max_lpa stipend_unit')
+
+NO_PACKAGE = Package(None, None, None)
+
+# Stipend period -> payments per year
+PERIODS = {'month': 12, 'week': 52, 'day': 365}
+
+_PERIOD_PATTERNS = (
+    ('month', re.compile(r"/\s*(?:month|mon|mo|m)\b|per\s+month|\bp\.?\s?m\b\.?|\bmonthly\b|\ba\s+month\b")),
+    ('week', re.compile(r"/\s*(?:week|wk|w)\b|per\s+week|\bweekly\b|\ba\s+week\b")),
+    ('day', re.compile(r"/\s*(?:day|d)\b|per\s+day|\bdaily\b|\ba\s+day\b")),
+)
+_FOREIGN = re.compile(r"\$|\busd\b|\beur\b|€|£")
+_LPA = re.compile(r"(?<![a-z])lpa\b|\bl\.p\.a\b|\blakhs?\s+per\s+annum\b")
+# Amount with an optional multiplier suffix, e.g. 12, 12.5, 20k, 1.2 cr, 8 lakh
+_AMOUNT = r"(\d+(?:\.\d+)?)\s*(?:(k|thousand|lakhs?|lacs?|l|crores?|cr)(?![a-z]))?"
+# Unit written after an amount: LPA, per annum or a stipend period
+_UNIT = (r"(lpa\b|l\.p\.a\b\.?|per\s+annum\b|p\.?\s?a\b\.?|per\s+(?:month|week|day)\b|p\.?\s?m\b\.?"
+         r"|/\s*(?:month|mon|mo|m|week|wk|w|day|d)\b|monthly\b|weekly\b|daily\b)")
+# One bound: optional currency sign, the amount, optional unit ("₹ 4 lpa", "20k/month")
+_BOUND = r"(₹\s*)?" + _AMOUNT + r"(?:\s*" + _UNIT + r")?"
+_RANGE = re.compile(_BOUND + r"\s*(?:-|–|to)\s*" + _BOUND)
+_SINGLE = re.compile(_BOUND)
+_SCALE = {'k': 1e3, 'thousand': 1e3, 'l': 1e5, 'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5,
+          'cr': 1e7, 'crore': 1e7, 'crores': 1e7}
+
+
+def _anchored(currency, number, suffix, unit):
+    """Whether a bound is marked as money (currency sign, multiplier or unit) rather than a bare number."""
+    return bool(currency or suffix or unit)
+
+
+def _amounts(text):
+    """
+    (number, suffix) pairs of the package in ``text``: one for a single
+    amount, two for a range. Amounts marked as money win over bare numbers,
+    so "2024 batch: 8 LPA" reads 8, not 2024; a range wins over a single
+    amount of the same kind.
+    """
+    ranges = list(_RANGE.finditer(text))
+    singles = list(_SINGLE.finditer(text))
+    for match in ranges:
+        groups = match.groups()
+        if _anchored(*groups[:4]) or _anchored(*groups[4:]):
+            return [groups[1:3], groups[5:7]]
+    for match in singles:
+        if _anchored(*match.groups()):
+            return [match.groups()[1:3]]
+    if ranges:
+        groups = ranges[0].groups()
+        return [groups[1:3], groups[5:7]]
+    if singles:
+        return [singles[0].groups()[1:3]]
+    return []
+
+
+def _rupees(number, suffix, lpa, period):
+    """An amount in rupees (per period, or per annum when there is no period)."""
+    value = float(number)
+    if suffix:
+        return value * _SCALE[suffix]
+    if lpa or (period is None and value < 1000):
+        # "12 LPA", or a bare "12" in a CTC field: lakhs
+        return value * 1e5
+    return value
+
+
+def parse_ctc(text):
+    """Package(min_lpa, max_lpa, stipend_unit) parsed from free-text CTC; NO_PACKAGE when unparseable."""
+    if not text:
+        return NO_PACKAGE
+    lowered = text.lower()
+    if _FOREIGN.search(lowered):
+        return NO_PACKAGE
+    # Indian digit grouping: 12,00,000 -> 1200000
+    cleaned = re.sub(r"(?<=\d),(?=\d)", "", lowered)
+    cleaned = re.sub(r"\binr\b|\brs\b\.?", "₹", cleaned)
+
+    period = next((name for name, pattern in _PERIOD_PATTERNS if pattern.search(cleaned)), None)
+    lpa = bool(_LPA.search(cleaned))
+
+    bounds = _amounts(cleaned)
+    if not bounds:
+        return NO_PACKAGE
+    if len(bounds) == 2:
+        # "8-10 lakh" / "20-25k": a suffix on the upper bound applies to both
+        (low_number, low_suffix), (high_number, high_suffix) = bounds
+        bounds = [(low_number, low_suffix or high_suffix), (high_number, high_suffix)]
+    amounts = [_rupees(number, suffix, lpa, period) for number, suffix in bounds]
+
+    per_year = PERIODS.get(period, 1)
+    # Four decimals keep stipends exact to the rupee after annualising
+    lakhs = sorted(round(amount * per_year / 1e5, 4) for amount in amounts)
+    if lakhs[-1] <= 0:
+        return NO_PACKAGE
+    return Package(lakhs[0], lakhs[-1], period)
+
+
+def package_label(min_lpa, max_lpa, stipend_unit=None):
+    """Short normalized label, e.g. "8-10 LPA" or "₹20,000/month"; None when there is no package."""
+    if max_lpa is None:
+        return None
+    if stipend_unit:
+        per_period = [round(value * 1e5 / PERIODS[stipend_unit]) for value in (min_lpa, max_lpa)]
+        amounts = "-".join("{:,}".format(v) for v in sorted(set(per_period)))
+        return "{}{}/{}".format(chr(8377), amounts, stipend_unit)
+    if min_lpa == max_lpa:
+        return "{:g} LPA".format(max_lpa)
+    return "{:g}-{:g} LPA".format(min_lpa, max_lpa)
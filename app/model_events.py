@@ -0,0 +1,72 @@
+"""
+Commit-time change notifications for the portal models.
+
+Subsystems that keep data derived from the database (chatbot answer caches,
+snapshots, counters) register a callback with ``on_models_changed``. After
+every successful commit the callback receives the set of model class names
+that were inserted, updated or deleted in that transaction. Changes that are
+rolled back are discarded and never reported.
+"""
+
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_INFO_KEY = '_changed_models'
+_subscribers = []
+_installed = False
+
+
+def on_models_changed(callback):
+    """Register ``callback(changed_model_names)`` to run after each commit."""
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    return callback
+
+
+def _pending(session):
+    return session.info.setdefault(_INFO_KEY, set())
+
+
+def _after_flush(session, flush_context):
+    names = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        names.add(type(obj).__name__)
+
+
+def _after_bulk(update_context):
+    # Query.update()/Query.delete() bypass the unit of work, so session.dirty misses them
+    mapper = getattr(update_context, 'mapper', None)
+    if mapper is not None:
+        _pending(update_context.session).add(mapper.class_.__name__)
+
+
+def _after_commit(session):
+    names = session.info.pop(_INFO_KEY, None)
+    if not names:
+        return
+    for callback in list(_subscribers):
+        try:
+            callback(frozenset(names))
+        except Exception as e:
+            logger.error(f"Model change subscriber {callback!r} failed: {e}", exc_info=True)
+
+
+def _after_rollback(session):
+    session.info.pop(_INFO_KEY, None)
+
+
+def init_model_events():
+    """Install the session listeners once per process."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_bulk_update', _after_bulk)
+    event.listen(Session, 'after_bulk_delete', _after_bulk)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _installed = True
@@ -1,9 +1,64 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import or_, select
+from sqlalchemy.orm import validates
 
 # Explicitly import db from the app package
 # This is safe because models are imported AFTER db.init_app()
 from app import db
+from app.ctc import package_label, parse_ctc
+
+
+def normalize_branch(branch):
+    """Branch codes are compared trimmed and upper-cased (e.g. ' cse' -> 'CSE')."""
+    return (branch or '').strip().upper()
+
+
+def parse_branches(text):
+    """Distinct branch codes of a comma-separated allowed_branches value, in order."""
+    branches = []
+    for part in (text or '').split(','):
+        branch = normalize_branch(part)
+        if branch and branch not in branches:
+            branches.append(branch)
+    return branches
+
+
+class BranchRestricted:
+    """
+    Branch eligibility of a Job or Opportunity.
+
+    ``allowed_branches`` stays the text shown on the forms and pages; every
+    assignment to it rewrites the row's ``branches`` collection of indexed
+    OpportunityBranch rows, which the eligibility checks read. No rows means
+    open to all branches.
+    """
+    _branch_key = None  # OpportunityBranch column pointing back at this table
+
+    @validates('allowed_branches')
+    def _sync_branches(self, key, value):
+        wanted = parse_branches(value)
+        # Keep the rows that stay: re-inserting one before the flush deletes
+        # the old row would trip the (owner, branch) unique constraint
+        for row in list(self.branches):
+            if row.branch not in wanted:
+                self.branches.remove(row)
+        have = {row.branch for row in self.branches}
+        self.branches.extend(OpportunityBranch(branch=b) for b in wanted if b not in have)
+        return value
+
+    def allows_branch(self, branch):
+        allowed = {row.branch for row in self.branches}
+        return not allowed or normalize_branch(branch) in allowed
+
+    @classmethod
+    def open_to_branch(cls, branch):
+        """SQL filter: open to all branches, or lists ``branch`` (an index seek on opportunity_branches)."""
+        owner = getattr(OpportunityBranch, cls._branch_key)
+        return or_(
+            cls.id.in_(select(owner).where(OpportunityBranch.branch == normalize_branch(branch))),
+            ~cls.branches.any(),
+        )
 
 
 class User(db.Model):
@@ -43,30 +98,79 @@ class StudentProfile(db.Model):
     # Relationship back to User
     user = db.relationship('User', back_populates='student_profile')
 
+    __table_args__ = (
+        # Branch filters and per-branch CGPA aggregates/orderings
+        db.Index('ix_student_profiles_branch_cgpa', 'branch', 'cgpa'),
+    )
+
     def __repr__(self):
         return f'<StudentProfile user_id={self.user_id} CGPA={self.cgpa}>'
 
 
-class Job(db.Model):
+class PackageMixin:
+    """
+    Numeric package of a Job or Opportunity.
+
+    ``ctc`` stays the text admins typed; every assignment to it re-parses it
+    (app.ctc.parse_ctc) into ``ctc_min_lpa``/``ctc_max_lpa`` (lakhs per
+    annum, stipends annualised) and ``stipend_unit``, which package filters
+    and sorts use. Unparseable text leaves them NULL.
+    """
+
+    @validates('ctc')
+    def _sync_package(self, key, value):
+        self.ctc_min_lpa, self.ctc_max_lpa, self.stipend_unit = parse_ctc(value)
+        return value
+
+    @property
+    def package_label(self):
+        """Normalized package, e.g. "8-10 LPA" or "₹20,000/month" (None if unparsed)."""
+        return package_label(self.ctc_min_lpa, self.ctc_max_lpa, self.stipend_unit)
+
+    @classmethod
+    def package_filter(cls, min_lpa=None, max_lpa=None):
+        """SQL filters: the package range reaches ``min_lpa`` and starts at or below ``max_lpa``."""
+        filters = []
+        if min_lpa is not None:
+            filters.append(cls.ctc_max_lpa >= min_lpa)
+        if max_lpa is not None:
+            filters.append(cls.ctc_min_lpa <= max_lpa)
+        return filters
+
+    @classmethod
+    def package_order(cls, descending=True):
+        """ORDER BY package, highest (or lowest) first; undisclosed packages last."""
+        if descending:
+            return cls.ctc_max_lpa.desc().nullslast()
+        return cls.ctc_min_lpa.asc().nullslast()
+
+
+class Job(BranchRestricted, PackageMixin, db.Model):
     __tablename__ = 'jobs'
 
     id = db.Column(db.Integer, primary_key=True)
     company_name = db.Column(db.String(100), nullable=False)
     job_description = db.Column(db.Text, nullable=False)
     ctc = db.Column(db.String(50), nullable=False)             # e.g. "12 LPA", "8-10 LPA"
+    ctc_min_lpa = db.Column(db.Float, index=True)              # parsed from ctc (PackageMixin)
+    ctc_max_lpa = db.Column(db.Float, index=True)
+    stipend_unit = db.Column(db.String(10))                    # month/week/day for stipends
     min_cgpa = db.Column(db.Float, nullable=False)
     allowed_branches = db.Column(db.Text, nullable=False)      # comma separated e.g. "CSE,ECE,IT"
     deadline = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Relationship
+    # Relationships
     applications = db.relationship('Application', back_populates='job', lazy='dynamic')
+    branches = db.relationship('OpportunityBranch', back_populates='job', cascade='all, delete-orphan')
+
+    _branch_key = 'job_id'
 
     def __repr__(self):
         return f'<Job {self.company_name} - {self.ctc}>'
 
 
-class Opportunity(db.Model):
+class Opportunity(BranchRestricted, PackageMixin, db.Model):
     __tablename__ = 'opportunities'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -80,10 +184,22 @@ class Opportunity(db.Model):
     mode = db.Column(db.String(50))
     # Job/Internship specific fields
     ctc = db.Column(db.String(50))  # e.g. "12 LPA", "500/month"
+    ctc_min_lpa = db.Column(db.Float, index=True)  # parsed from ctc (PackageMixin)
+    ctc_max_lpa = db.Column(db.Float, index=True)
+    stipend_unit = db.Column(db.String(10))  # month/week/day for stipends
     min_cgpa = db.Column(db.Float)  # Minimum CGPA required
     allowed_branches = db.Column(db.Text)  # comma-separated
-    deadline = db.Column(db.DateTime)  # Application deadline
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deadline = db.Column(db.DateTime, index=True)  # Application deadline
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    branches = db.relationship('OpportunityBranch', back_populates='opportunity', cascade='all, delete-orphan')
+
+    _branch_key = 'opportunity_id'
+
+    __table_args__ = (
+        # Upcoming drives: type IN (...) AND deadline range ORDER BY deadline
+        db.Index('ix_opportunities_type_deadline', 'type', 'deadline'),
+    )
 
     def get_requirements_list(self):
         """Return requirements as a list if stored as JSON or newline-separated text."""
@@ -105,6 +221,31 @@ class Opportunity(db.Model):
         return f'<Opportunity {self.title} ({self.type})>'
 
 
+class OpportunityBranch(db.Model):
+    """One eligible branch of an opportunity or job (see BranchRestricted)."""
+    __tablename__ = 'opportunity_branches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    opportunity_id = db.Column(db.Integer, db.ForeignKey('opportunities.id'), nullable=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=True)
+    branch = db.Column(db.String(50), nullable=False)  # normalized, e.g. CSE
+
+    opportunity = db.relationship('Opportunity', back_populates='branches')
+    job = db.relationship('Job', back_populates='branches')
+
+    __table_args__ = (
+        db.UniqueConstraint('opportunity_id', 'branch', name='unique_opportunity_branch'),
+        db.UniqueConstraint('job_id', 'branch', name='unique_job_branch'),
+        # Eligibility: the opportunities/jobs that admit a branch
+        db.Index('ix_opportunity_branches_branch_opportunity', 'branch', 'opportunity_id'),
+        db.Index('ix_opportunity_branches_branch_job', 'branch', 'job_id'),
+    )
+
+    def __repr__(self):
+        owner = f'job={self.job_id}' if self.job_id else f'opportunity={self.opportunity_id}'
+        return f'<OpportunityBranch {owner} {self.branch}>'
+
+
 class Application(db.Model):
     __tablename__ = 'applications'
 
@@ -113,7 +254,7 @@ class Application(db.Model):
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=True)
     opportunity_id = db.Column(db.Integer, db.ForeignKey('opportunities.id'), nullable=True)
     status = db.Column(db.String(30), default='Applied', nullable=False)  # Applied, Shortlisted, Selected, Rejected
-    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -125,9 +266,14 @@ class Application(db.Model):
     __table_args__ = (
         db.UniqueConstraint('student_id', 'job_id', name='unique_student_job_application'),
         db.UniqueConstraint('student_id', 'opportunity_id', name='unique_student_opportunity_application'),
+        # A student's applications newest first (the unique constraints already lead with student_id)
+        db.Index('ix_applications_student_applied', 'student_id', 'applied_at'),
+        # Applicants of one opportunity/job, optionally by status
+        db.Index('ix_applications_opportunity_status', 'opportunity_id', 'status'),
+        db.Index('ix_applications_job_status', 'job_id', 'status'),
     )
 
     def __repr__(self):
         if self.job_id:
             return f'<Application student={self.student_id} job={self.job_id} status={self.status}>'
-        return f'<Application student={self.student_id} opportunity={self.opportunity_id} status={self.status}>'
\ No newline at end of file
+        return f'<Application student={self.student_id} opportunity={self.opportunity_id} status={self.status}>'
@@ -0,0 +1,514 @@
+"""
+Incrementally maintained placement counters.
+
+The admin dashboard, the chatbot's placement and branch statistics and the
+intent router all report the same figures: students, opportunities, jobs,
+applications per status, placed students, per-branch totals and
+applicants per opportunity. Instead of re-counting them with COUNT(*)
+queries on every page load and chat message, this module keeps them in
+memory and reads are O(1) whatever the table sizes.
+
+The counters are maintained from the unit of work. ``after_flush`` records
+the before/after values of every inserted, updated or deleted Application,
+StudentProfile, User, Opportunity and Job in the session, and the deltas
+are applied on ``after_commit`` (and dropped on rollback), so only
+committed changes are counted. Bulk ``Query.update()``/``delete()`` calls
+carry no per-row history; they mark the counters stale and the next read
+reloads them.
+
+A background thread fully reconciles the counters with the database every
+PLACEMENT_COUNTERS_RECONCILE_INTERVAL seconds (a handful of GROUP BY
+queries) and corrects any drift. Drift comes from raw SQL, migrations, and
+commits made by other worker processes, since each process keeps its own
+counters. Corrections are logged and counted in the chatbot metrics.
+
+Configuration:
+    PLACEMENT_COUNTERS                      1/0 to enable the in-memory counters; 0 reads
+                                            every figure from the database (default 1)
+    PLACEMENT_COUNTERS_RECONCILE_INTERVAL   seconds between full reconciliations, 0 to
+                                            disable the thread (default 60)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+
+from app.chatbot_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_OPS_KEY = '_placement_counter_ops'
+_STALE_KEY = '_placement_counters_stale'
+
+# model name -> attributes whose before/after values drive the counters
+TRACKED = {
+    'Application': ('student_id', 'opportunity_id', 'status'),
+    'StudentProfile': ('user_id', 'branch', 'cgpa'),
+    'User': ('role',),
+    'Opportunity': (),
+    'Job': (),
+}
+
+
+class _Student:
+    """One student's share of the per-branch and placed figures."""
+
+    __slots__ = ('branch', 'cgpa', 'applications', 'selected')
+
+    def __init__(self):
+        self.branch = None
+        self.cgpa = None
+        self.applications = 0
+        self.selected = 0
+
+
+class _State:
+    """The counters themselves; only touched under PlacementCounters._lock."""
+
+    def __init__(self):
+        self.students = 0        # users with role Student
+        self.profiles = 0
+        self.opportunities = 0
+        self.jobs = 0
+        self.applications = 0
+        self.placed = 0          # distinct students with a Selected application
+        self.by_status = {}
+        self.by_opportunity = {}  # opportunity id -> {status: count}
+        self.branches = {}       # branch -> {students, cgpa_sum, applications, placed}
+        self.per_student = {}    # user id -> _Student
+
+    # ---- per-student bookkeeping ----
+
+    def _student(self, user_id):
+        student = self.per_student.get(user_id)
+        if student is None:
+            student = self.per_student[user_id] = _Student()
+        return student
+
+    def _count(self, student, sign):
+        """Add (sign=1) or remove (sign=-1) ``student``'s share of the aggregates."""
+        placed = 1 if student.selected > 0 else 0
+        self.placed += sign * placed
+        if student.branch is None:
+            return
+        branch = self.branches.get(student.branch)
+        if branch is None:
+            branch = self.branches[student.branch] = {
+                'students': 0, 'cgpa_sum': 0.0, 'applications': 0, 'placed': 0,
+            }
+        branch['students'] += sign
+        branch['cgpa_sum'] += sign * (student.cgpa or 0.0)
+        branch['applications'] += sign * student.applications
+        branch['placed'] += sign * placed
+        if branch['students'] <= 0:
+            del self.branches[student.branch]
+
+    # ---- deltas ----
+
+    def application(self, values, sign):
+        student_id, opportunity_id, status = values
+        self.applications += sign
+        self.by_status[status] = self.by_status.get(status, 0) + sign
+        if opportunity_id is not None:
+            counts = self.by_opportunity.setdefault(opportunity_id, {})
+            counts[status] = counts.get(status, 0) + sign
+        student = self._student(student_id)
+        self._count(student, -1)
+        student.applications += sign
+        if status == 'Selected':
+            student.selected += sign
+        self._count(student, 1)
+
+    def profile(self, values, sign):
+        user_id, branch, cgpa = values
+        self.profiles += sign
+        student = self._student(user_id)
+        self._count(student, -1)
+        student.branch, student.cgpa = (branch, cgpa) if sign > 0 else (None, None)
+        self._count(student, 1)
+
+    def apply(self, name, before, after):
+        for values, sign in ((before, -1), (after, 1)):
+            if values is None:
+                continue
+            if name == 'Application':
+                self.application(values, sign)
+            elif name == 'StudentProfile':
+                self.profile(values, sign)
+            elif name == 'User':
+                if values[0] == 'Student':
+                    self.students += sign
+            elif name == 'Opportunity':
+                self.opportunities += sign
+            elif name == 'Job':
+                self.jobs += sign
+
+    def totals(self):
+        return {
+            'students': self.students,
+            'profiles': self.profiles,
+            'opportunities': self.opportunities,
+            'jobs': self.jobs,
+            'applications': self.applications,
+            'placed': self.placed,
+            'by_status': {status: count for status, count in self.by_status.items() if count},
+        }
+
+    def branch_statistics(self):
+        return {
+            name: {
+                'students': branch['students'],
+                'avg_cgpa': round(branch['cgpa_sum'] / branch['students'], 2),
+                'applications': branch['applications'],
+                'placed': branch['placed'],
+            }
+            for name, branch in self.branches.items()
+        }
+
+
+def _load_state():
+    """A full _State from the database (7 statements). Needs an application context."""
+    from app import db
+    from app.models import Application, Job, Opportunity, StudentProfile, User
+
+    state = _State()
+    state.students = User.query.filter_by(role='Student').count()
+    state.opportunities = Opportunity.query.count()
+    state.jobs = Job.query.count()
+    for user_id, branch, cgpa in db.session.query(
+        StudentProfile.user_id, StudentProfile.branch, StudentProfile.cgpa
+    ):
+        student = state._student(user_id)
+        student.branch, student.cgpa = branch, cgpa
+        state.profiles += 1
+    for student_id, applications, selected in db.session.query(
+        Application.student_id,
+        func.count(Application.id),
+        func.sum(case((Application.status == 'Selected', 1), else_=0)),
+    ).group_by(Application.student_id):
+        student = state._student(student_id)
+        student.applications, student.selected = applications, int(selected or 0)
+    for status, count in db.session.query(Application.status, func.count(Application.id)).group_by(
+        Application.status
+    ):
+        state.by_status[status] = count
+        state.applications += count
+    for opportunity_id, status, count in db.session.query(
+        Application.opportunity_id, Application.status, func.count(Application.id)
+    ).filter(Application.opportunity_id.isnot(None)).group_by(Application.opportunity_id, Application.status):
+        state.by_opportunity.setdefault(opportunity_id, {})[status] = count
+    for student in state.per_student.values():
+        state._count(student, 1)
+    return state
+
+
+class PlacementCounters:
+    """Per-worker counters, kept current from commits and reconciled periodically."""
+
+    def __init__(self, enabled=True, reconcile_interval=60.0):
+        self.enabled = enabled
+        self.reconcile_interval = reconcile_interval
+        self.app = None
+        self.last_reconciled = None
+        self._state = None
+        self._stale = True
+        # Bumped whenever committed deltas are applied, to detect reconciles that raced a commit
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('PLACEMENT_COUNTERS', '1').strip().lower() not in ('0', 'false', 'no', 'off'),
+            reconcile_interval=float(os.getenv('PLACEMENT_COUNTERS_RECONCILE_INTERVAL', '60')),
+        )
+
+    # ---- reads ----
+
+    def _current(self):
+        """The state, (re)loading it first when missing or stale. Needs an application context."""
+        self.ensure_running()
+        if self._stale or self._state is None:
+            # Retry a load that raced a commit, then take the last one regardless
+            if not self.reconcile() and not self.reconcile():
+                self.reconcile(force=True)
+        return self._state
+
+    def totals(self):
+        """
+        {students, profiles, opportunities, jobs, applications, placed, by_status}.
+        ``students`` counts users with the Student role, ``profiles`` student
+        profiles, and ``placed`` distinct students with a Selected application.
+        """
+        if not self.enabled:
+            return self._totals_from_database()
+        state = self._current()
+        with self._lock:
+            return state.totals()
+
+    def branch_statistics(self, branch=None):
+        """{branch: {students, avg_cgpa, applications, placed}}, like chatbot_queries.branch_statistics."""
+        if not self.enabled:
+            from app import chatbot_queries as queries
+            return queries.branch_statistics(branch)
+        state = self._current()
+        with self._lock:
+            stats = state.branch_statistics()
+        if branch:
+            return {branch: stats[branch]} if branch in stats else {}
+        return stats
+
+    def branch_totals(self, branch=None):
+        """(students, avg_cgpa, applications, placed) across one branch or all."""
+        if not self.enabled:
+            from app import chatbot_queries as queries
+            return queries.branch_totals(branch)
+        state = self._current()
+        with self._lock:
+            if branch:
+                branches = [state.branches[branch]] if branch in state.branches else []
+            else:
+                branches = list(state.branches.values())
+            students = sum(b['students'] for b in branches)
+            cgpa_sum = sum(b['cgpa_sum'] for b in branches)
+            return (students, cgpa_sum / students if students else 0,
+                    sum(b['applications'] for b in branches), sum(b['placed'] for b in branches))
+
+    def applicants_by_opportunity(self):
+        """{opportunity id: number of applications}."""
+        if not self.enabled:
+            from app import db
+            from app.models import Application
+            return dict(db.session.query(Application.opportunity_id, func.count(Application.id)).filter(
+                Application.opportunity_id.isnot(None)).group_by(Application.opportunity_id).all())
+        state = self._current()
+        with self._lock:
+            totals = {opp_id: sum(counts.values()) for opp_id, counts in state.by_opportunity.items()}
+        return {opp_id: total for opp_id, total in totals.items() if total}
+
+    @staticmethod
+    def _totals_from_database():
+        from app import chatbot_queries as queries
+        from app.models import Job, Opportunity, StudentProfile, User
+
+        by_status = queries.status_counts()
+        return {
+            'students': User.query.filter_by(role='Student').count(),
+            'profiles': StudentProfile.query.count(),
+            'opportunities': Opportunity.query.count(),
+            'jobs': Job.query.count(),
+            'applications': sum(by_status.values()),
+            'placed': queries.placed_students_count(),
+            'by_status': by_status,
+        }
+
+    # ---- writes ----
+
+    def apply(self, ops):
+        """Apply committed (model name, before, after) deltas."""
+        with self._lock:
+            self._sequence += 1
+            if self._state is None:
+                # Nothing loaded yet; the first load reads these rows from the database
+                return
+            for name, before, after in ops:
+                self._state.apply(name, before, after)
+        metrics.incr('counters.deltas', len(ops))
+
+    def mark_stale(self):
+        self._stale = True
+
+    def reconcile(self, force=False):
+        """
+        Reload every counter from the database and swap it in, logging any
+        drift from the incremental values. Returns False (and keeps the
+        current counters) when a commit was applied while loading, unless
+        ``force``, in which case the load is used and left marked stale.
+        Needs an application context.
+        """
+        started = time.monotonic()
+        with self._lock:
+            sequence = self._sequence
+            # A reload of counters known to be stale (bulk update, fork) is not drift
+            known_stale, self._stale = self._stale, False
+        fresh = _load_state()
+        with self._lock:
+            if sequence != self._sequence:
+                self._stale = True
+                metrics.incr('counters.reconcile_raced')
+                if not force:
+                    return False
+            previous, self._state = self._state, fresh
+        if previous is not None and not known_stale:
+            drift = self._drift(previous, fresh)
+            if drift:
+                metrics.incr('counters.drift')
+                logger.warning("Placement counters drifted; corrected: %s", ", ".join(drift))
+        self.last_reconciled = datetime.utcnow().isoformat() + 'Z'
+        metrics.incr('counters.reconciles')
+        metrics.observe('counters.reconcile', (time.monotonic() - started) * 1000)
+        return True
+
+    @staticmethod
+    def _drift(old, new):
+        drift = [
+            '{} {}->{}'.format(key, value, getattr(new, key))
+            for key, value in ((k, getattr(old, k)) for k in (
+                'students', 'profiles', 'opportunities', 'jobs', 'applications', 'placed'))
+            if value != getattr(new, key)
+        ]
+        if old.totals()['by_status'] != new.totals()['by_status']:
+            drift.append('by_status')
+        if old.branch_statistics() != new.branch_statistics():
+            drift.append('branches')
+        return drift
+
+    # ---- reconciliation thread ----
+
+    def ensure_running(self):
+        """Start the reconcile thread if this process does not have one yet (safe after fork)."""
+        if self.reconcile_interval <= 0 or self.app is None:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Counters inherited from the parent process miss its later commits
+                self._stale = True
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='placement-counters', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                with self.app.app_context():
+                    self.reconcile()
+            except Exception as exc:
+                logger.error("Placement counter reconciliation failed: %s", exc, exc_info=True)
+
+    def stats(self):
+        p95 = metrics.percentile('counters.reconcile', 95)
+        return {
+            'enabled': self.enabled,
+            'loaded': self._state is not None,
+            'stale': self._stale,
+            'reconcile_interval_seconds': self.reconcile_interval,
+            'last_reconciled': self.last_reconciled,
+            'deltas': metrics.counter('counters.deltas'),
+            'reconciles': metrics.counter('counters.reconciles'),
+            'raced': metrics.counter('counters.reconcile_raced'),
+            'drift_corrections': metrics.counter('counters.drift'),
+            'reconcile_p95_ms': round(p95, 2) if p95 is not None else None,
+        }
+
+
+# Shared per-worker counters
+placement_counters = PlacementCounters.from_env()
+
+
+# ==================== Change tracking ====================
+
+def _values(state, fields, before):
+    """Attribute values before (or after) this flush; None when one is not loaded."""
+    values = []
+    for field in fields:
+        history = state.attrs[field].history
+        if before and history.deleted:
+            value = history.deleted[0]
+        elif before and history.unchanged:
+            value = history.unchanged[0]
+        elif before and history.added:
+            # Changed in this flush but not loaded before it: the old value is unknown
+            return None
+        else:
+            value = state.dict.get(field, NO_VALUE)
+        if value is NO_VALUE:
+            return None
+        values.append(value)
+    return tuple(values)
+
+
+def _after_flush(session, flush_context):
+    ops = session.info.setdefault(_OPS_KEY, [])
+    changes = [(obj, 'new') for obj in session.new] + [(obj, 'dirty') for obj in session.dirty] + \
+        [(obj, 'deleted') for obj in session.deleted]
+    for obj, kind in changes:
+        name = type(obj).__name__
+        fields = TRACKED.get(name)
+        if fields is None:
+            continue
+        state = inspect(obj)
+        before = None if kind == 'new' else _values(state, fields, before=True)
+        after = None if kind == 'deleted' else _values(state, fields, before=False)
+        if (kind != 'new' and before is None) or (kind != 'deleted' and after is None):
+            session.info[_STALE_KEY] = True
+            continue
+        if before != after:
+            ops.append((name, before, after))
+
+
+def _after_bulk(update_context):
+    mapper = getattr(update_context, 'mapper', None)
+    if mapper is not None and mapper.class_.__name__ in TRACKED:
+        update_context.session.info[_STALE_KEY] = True
+
+
+def _after_commit(session):
+    ops = session.info.pop(_OPS_KEY, None)
+    if session.info.pop(_STALE_KEY, False):
+        placement_counters.mark_stale()
+    elif ops:
+        placement_counters.apply(ops)
+
+
+def _after_rollback(session):
+    session.info.pop(_OPS_KEY, None)
+    session.info.pop(_STALE_KEY, None)
+
+
+def _on_set(target, value, oldvalue, initiator):
+    # Registered with active_history: only there so the old value gets loaded
+    return value
+
+
+_installed = False
+
+
+def init_placement_counters(app):
+    """Install the session listeners and bind the reconcile thread to ``app``."""
+    global _installed
+    import app.models as models
+
+    if not _installed:
+        # Load the old value when a tracked attribute of an expired row is assigned,
+        # so its delta is known instead of forcing a reload
+        for name, fields in TRACKED.items():
+            for field in fields:
+                event.listen(getattr(getattr(models, name), field), 'set', _on_set,
+                             retval=True, active_history=True)
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_bulk_update', _after_bulk)
+        event.listen(Session, 'after_bulk_delete', _after_bulk)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        _installed = True
+    placement_counters.app = app
+    # Loaded from this app's database on first read
+    placement_counters.mark_stale()
@@ -0,0 +1,64 @@
+"""
+Schema upgrades on deploy.
+
+The app calls ``db.create_all()`` at startup, and for a long time that was
+the only way the schema was built, so most databases have no
+``alembic_version`` and ``flask db upgrade`` alone cannot migrate them: the
+first revision adds a column such a database already has. ``create_all()``
+only creates missing tables; it never adds columns or indexes to tables
+that exist, so new columns on ``jobs``/``opportunities`` reach an existing
+database only through the migrations.
+
+``flask schema upgrade`` makes that one step the deploy can run before
+starting the server:
+
+    * a database already tracked by Alembic is simply upgraded
+    * an untracked one is first stamped at the newest revision its existing
+      tables already match, judged by the columns and indexes
+      ``create_all()`` cannot add, then upgraded
+
+So an empty database (built whole by ``create_all()``) is stamped at head,
+and an old one gets exactly the revisions it is missing, with their
+backfills.
+"""
+
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+from flask_migrate import stamp, upgrade
+
+from app import db
+
+# Newest revision whose changes a database shows, newest first: (revision, table, column or index)
+REVISION_MARKERS = (
+    ('c7e2f4a9b813', 'opportunities', 'ctc_max_lpa'),
+    ('6f1c2d8e4b7a', 'applications', 'ix_applications_student_applied'),
+    ('2a2390615e09', 'applications', 'opportunity_id'),
+)
+
+
+def untracked_revision(inspector):
+    """Revision an untracked database's existing tables match, or None for a pre-migration schema."""
+    for revision, table, name in REVISION_MARKERS:
+        if not inspector.has_table(table):
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        indexes = {index['name'] for index in inspector.get_indexes(table)}
+        if name in columns or name in indexes:
+            return revision
+    return None
+
+
+schema_cli = AppGroup('schema', help='Database schema commands.')
+
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    """Stamp a database created by db.create_all() at the revision it matches, then upgrade to head."""
+    inspector = sa.inspect(db.engine)
+    if not inspector.has_table('alembic_version'):
+        revision = untracked_revision(inspector)
+        if revision:
+            click.echo('Untracked database matches revision {}; stamping it'.format(revision))
+            stamp(revision=revision)
+    upgrade()
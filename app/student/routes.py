@@ -281,13 +281,11 @@ def apply():
         return redirect(url_for('student.profile'))
     
     # Check eligibility
-    allowed_branches = [b.strip().upper() for b in (job.allowed_branches or '').split(',') if b.strip()]
-    
     if profile.cgpa < job.min_cgpa:
         flash(f'You do not meet the minimum CGPA requirement of {job.min_cgpa}.', 'danger')
         return redirect(request.referrer or url_for('student.applications'))
     
-    if allowed_branches and profile.branch not in allowed_branches:
+    if not job.allows_branch(profile.branch):
         flash(f'Your branch ({profile.branch}) is not eligible for this job.', 'danger')
         return redirect(request.referrer or url_for('student.applications'))
     
@@ -318,19 +316,54 @@ def apply():
     return redirect(url_for('student.applications'))
 
 
+# Orderings offered on the browse page: value -> label
+BROWSE_SORTS = {
+    'newest': 'Newest first',
+    'package_desc': 'Highest package',
+    'package_asc': 'Lowest package',
+    'deadline': 'Deadline soonest',
+}
+
+
+def _browse_order(sort):
+    if sort == 'package_desc':
+        return [Opportunity.package_order(), Opportunity.created_at.desc()]
+    if sort == 'package_asc':
+        return [Opportunity.package_order(descending=False), Opportunity.created_at.desc()]
+    if sort == 'deadline':
+        return [Opportunity.deadline.asc().nullslast()]
+    return [Opportunity.created_at.desc()]
+
+
 @bp.route('/opportunities')
 @student_required
 def browse_opportunities():
-    """Browse all opportunities grouped by type"""
+    """Browse all opportunities grouped by type, filtered and sorted by package"""
     page = request.args.get('page', 1, type=int)
     user_id = session['user_id']
+    min_lpa = request.args.get('min_lpa', type=float)
+    max_lpa = request.args.get('max_lpa', type=float)
+    sort = request.args.get('sort', 'newest')
+    if sort not in BROWSE_SORTS:
+        sort = 'newest'
     
     profile = StudentProfile.query.filter_by(user_id=user_id).first()
     if not profile:
         flash('Please complete your profile before browsing opportunities.', 'warning')
         return redirect(url_for('student.profile'))
 
-    opportunities = Opportunity.query.order_by(Opportunity.created_at.desc()).all()
+    # Package range and order run in SQL on the indexed ctc_min_lpa/ctc_max_lpa
+    opportunities = Opportunity.query.filter(
+        *Opportunity.package_filter(min_lpa, max_lpa)
+    ).order_by(*_browse_order(sort)).all()
+    # Ids open to the student's branch, from one indexed lookup instead of parsing each row
+    branch_open = {opp_id for (opp_id,) in db.session.query(Opportunity.id).filter(
+        Opportunity.open_to_branch(profile.branch)
+    )}
+    # The student's applications in one query instead of one lookup per opportunity
+    applied_ids = {opp_id for (opp_id,) in db.session.query(Application.opportunity_id).filter(
+        Application.student_id == user_id, Application.opportunity_id.isnot(None)
+    )}
     
     # Add eligibility and application status info
     opp_list = []
@@ -340,20 +373,15 @@ def browse_opportunities():
         
         # Check eligibility for Job/Internship types
         if opp.type in ['Job', 'Internship']:
-            allowed = [b.strip().upper() for b in (opp.allowed_branches or '').split(',') if b.strip()]
             is_deadline_valid = not opp.deadline or datetime.utcnow() < opp.deadline
             
             if opp.min_cgpa:
                 eligible = (profile.cgpa >= opp.min_cgpa and 
-                           (not allowed or profile.branch in allowed) and
+                           opp.id in branch_open and
                            not profile.has_backlog and
                            is_deadline_valid)
             
-            # Check if already applied
-            already_applied = Application.query.filter_by(
-                student_id=user_id,
-                opportunity_id=opp.id
-            ).first() is not None
+            already_applied = opp.id in applied_ids
         
         opp_list.append({
             'opportunity': opp,
@@ -365,6 +393,9 @@ def browse_opportunities():
                           opportunities=opportunities,
                           opp_list=opp_list,
                           profile=profile,
+                          sort=sort,
+                          sort_options=BROWSE_SORTS,
+                          filtered=min_lpa is not None or max_lpa is not None,
                           now=datetime.utcnow())
 
 
@@ -379,13 +410,12 @@ def view_opportunity(opp_id):
     # Check eligibility for Job/Internship
     eligible = True
     if opp.type in ['Job', 'Internship']:
-        allowed = [b.strip().upper() for b in (opp.allowed_branches or '').split(',') if b.strip()]
         is_deadline_valid = not opp.deadline or datetime.utcnow() < opp.deadline
         
         if opp.min_cgpa:
             eligible = (profile and 
                        profile.cgpa >= opp.min_cgpa and 
-                       (not allowed or profile.branch in allowed) and
+                       opp.allows_branch(profile.branch) and
                        not profile.has_backlog and
                        is_deadline_valid)
     
@@ -419,8 +449,6 @@ def apply_for_opportunity(opp_id):
     
     # Check eligibility for Job/Internship types
     if opp.type in ['Job', 'Internship']:
-        allowed_branches = [b.strip().upper() for b in (opp.allowed_branches or '').split(',') if b.strip()]
-        
         if opp.deadline and datetime.utcnow() >= opp.deadline:
             flash('Application deadline has passed.', 'danger')
             return redirect(url_for('student.view_opportunity', opp_id=opp_id))
@@ -429,7 +457,7 @@ def apply_for_opportunity(opp_id):
             flash(f'You do not meet the minimum CGPA requirement of {opp.min_cgpa}.', 'danger')
             return redirect(url_for('student.view_opportunity', opp_id=opp_id))
         
-        if allowed_branches and profile.branch not in allowed_branches:
+        if not opp.allows_branch(profile.branch):
             flash(f'Your branch is not eligible for this opportunity.', 'danger')
             return redirect(url_for('student.view_opportunity', opp_id=opp_id))
         
@@ -55,8 +55,11 @@ Stores full-time job listings posted by companies via the TPO.
 | company_name | VARCHAR(100) | Name of the hiring company |
 | job_description | TEXT | Full job description |
 | ctc | VARCHAR(50) | CTC offered (e.g., "12 LPA") |
+| ctc_min_lpa | FLOAT | Lower end of the package parsed from `ctc`, in LPA (NULL if not parseable) |
+| ctc_max_lpa | FLOAT | Upper end of the package parsed from `ctc`, in LPA (NULL if not parseable) |
+| stipend_unit | VARCHAR(10) | `month`, `week` or `day` for stipends (annualised in the LPA columns), NULL for CTC |
 | min_cgpa | FLOAT | Minimum CGPA required to apply |
-| allowed_branches | TEXT | Comma-separated list of eligible branches |
+| allowed_branches | TEXT | Comma-separated list of eligible branches (as entered; see `opportunity_branches`) |
 | deadline | DATETIME | Last date to apply |
 | created_at | DATETIME | Date job was posted |
 
@@ -77,8 +80,11 @@ Stores broader opportunities: Jobs, Internships, Hackathons, Workshops, etc.
 | date | DATETIME | Event or joining date |
 | mode | VARCHAR(50) | `Online` or `Offline` |
 | ctc | VARCHAR(50) | CTC or stipend (if applicable) |
+| ctc_min_lpa | FLOAT | Lower end of the package parsed from `ctc`, in LPA (stipends annualised) |
+| ctc_max_lpa | FLOAT | Upper end of the package parsed from `ctc`, in LPA (stipends annualised) |
+| stipend_unit | VARCHAR(10) | `month`, `week` or `day` for stipends, NULL for CTC |
 | min_cgpa | FLOAT | Minimum CGPA required |
-| allowed_branches | TEXT | Eligible branches (comma-separated) |
+| allowed_branches | TEXT | Eligible branches (comma-separated, as entered; see `opportunity_branches`) |
 | deadline | DATETIME | Application deadline |
 | created_at | DATETIME | Date posted |
 
@@ -99,6 +105,18 @@ Tracks which student applied to which job or opportunity.
 
 ---
 
+### TABLE: `opportunity_branches`
+One row per eligible branch of an opportunity or job. An opportunity or job with no rows is open to all branches.
+
+| Column | Type | Description |
+|---|---|---|
+| id | INTEGER (PK) | Row ID |
+| opportunity_id | INTEGER (FK → opportunities.id) | Opportunity (nullable) |
+| job_id | INTEGER (FK → jobs.id) | Job (nullable) |
+| branch | VARCHAR(50) | Upper-cased branch code (e.g., CSE) |
+
+---
+
 ## HOW TO JOIN TABLES
 
 To get a full student profile with their name:
@@ -125,10 +143,18 @@ To find eligible opportunities for a student:
 SELECT o.* FROM opportunities o
 JOIN student_profiles sp ON sp.user_id = <user_id>
 WHERE o.min_cgpa <= sp.cgpa
-AND (o.allowed_branches LIKE '%' || sp.branch || '%')
+AND (o.id IN (SELECT ob.opportunity_id FROM opportunity_branches ob WHERE ob.branch = UPPER(sp.branch))
+     OR NOT EXISTS (SELECT 1 FROM opportunity_branches ob WHERE ob.opportunity_id = o.id))
 AND o.deadline > datetime('now');
 ```
 
+To filter or sort by package, use the numeric columns, never the `ctc` text:
+```sql
+SELECT o.title, o.company_name, o.ctc FROM opportunities o
+WHERE o.ctc_max_lpa >= 10 AND o.deadline > datetime('now')
+ORDER BY o.ctc_max_lpa DESC;
+```
+
 ---
 
 ## WHAT YOU CAN ANSWER
@@ -176,7 +202,7 @@ You can answer all of the following:
 
 3. **Data not found:** If the queried student, job, or opportunity does not exist in the database, say: *"No record found for [query]. Please check the name or roll number and try again."*
 
-4. **CGPA eligibility:** When checking job eligibility, always compare the student's CGPA against `min_cgpa` AND check if their branch is in `allowed_branches`. Both conditions must be satisfied.
+4. **CGPA eligibility:** When checking job eligibility, always compare the student's CGPA against `min_cgpa` AND check that their branch is listed in `opportunity_branches` (or that no branches are listed). Both conditions must be satisfied.
 
 5. **Deadline awareness:** For opportunity queries, always mention if a deadline has passed. Flag expired opportunities clearly.
 
@@ -253,9 +279,10 @@ TPC_ASSISTANT_SYSTEM_PROMPT_SHORT = """You are **TPC Assistant**, an intelligent
 ## TABLE REFERENCES
 - `users` (id, username, email, role, created_at)
 - `student_profiles` (id, user_id, tenth_percentage, twelfth_percentage, cgpa, branch, skills, has_backlog, resume_link)
-- `opportunities` (id, title, type, company_name, description, ctc, min_cgpa, allowed_branches, deadline, mode)
+- `opportunities` (id, title, type, company_name, description, ctc, ctc_min_lpa, ctc_max_lpa, stipend_unit, min_cgpa, allowed_branches, deadline, mode)
 - `applications` (id, student_id, opportunity_id, status, applied_at)
-- `jobs` (id, company_name, ctc, min_cgpa, allowed_branches, deadline)
+- `jobs` (id, company_name, ctc, ctc_min_lpa, ctc_max_lpa, stipend_unit, min_cgpa, allowed_branches, deadline)
+- `opportunity_branches` (id, opportunity_id, job_id, branch)
 
 ## ANSWERABLE QUESTIONS
 - Student profiles and academics
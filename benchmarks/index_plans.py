@@ -0,0 +1,314 @@
+"""
+Query plans and timings of the hot query paths without and with the
+indexes added in migration 6f1c2d8e4b7a.
+
+Bulk-loads a synthetic dataset (1M applications by default) into SQLite
+or PostgreSQL, drops the hot-path indexes, and records the EXPLAIN plan
+and median time of each query. It then creates the indexes (timing the
+build), ANALYZEs, and records the plans and timings again. The queries
+mirror student.applications, admin.opportunity_applicants/job_applicants,
+the chatbot's upcoming drives, eligibility and recent applicants,
+browse_opportunities, view_students and the placement-counter
+reconciliation.
+
+Usage (from the repository root):
+    python -m benchmarks.index_plans [--database-url postgresql://user:pw@host/scratch]
+        [--applications 1000000] [--students 50000] [--opportunities 2000] [--jobs 100]
+        [--repeat 5] [--output plans.json]
+
+Without --database-url a throwaway SQLite file is used. A PostgreSQL URL
+must point at a scratch database: the portal tables in it are dropped and
+recreated. On PostgreSQL the plans come from EXPLAIN (ANALYZE, BUFFERS).
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+
+# Added by migration 6f1c2d8e4b7a_add_indexes_for_hot_query_paths
+HOT_INDEXES = (
+    'ix_applications_student_applied',
+    'ix_applications_opportunity_status',
+    'ix_applications_job_status',
+    'ix_applications_applied_at',
+    'ix_opportunities_deadline',
+    'ix_opportunities_type_deadline',
+    'ix_opportunities_created_at',
+    'ix_student_profiles_branch_cgpa',
+)
+
+BRANCHES = ['CSE', 'IT', 'ECE', 'EEE', 'MECH', 'CIVIL']
+TYPES = ['Job', 'Internship', 'Session', 'Hackathon', 'Bootcamp', 'Seminar']
+STATUSES = ['Applied', 'Applied', 'Shortlisted', 'Selected', 'Rejected']
+CHUNK = 20000
+
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def load_dataset(engine, args):
+    """Create the tables and bulk-load the synthetic rows; returns ids used by the queries."""
+    from app import db
+    from app.models import Application, Job, Opportunity, OpportunityBranch, StudentProfile, User
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+
+    started = time.monotonic()
+    with engine.begin() as conn:
+        _insert(conn, User.__table__, [
+            {'id': i, 'username': 'student{}'.format(i), 'email': 'student{}@example.com'.format(i),
+             'password': 'x', 'role': 'Student', 'created_at': now}
+            for i in range(1, args.students + 1)
+        ])
+        _insert(conn, StudentProfile.__table__, [
+            {'user_id': i, 'tenth_percentage': 80.0, 'twelfth_percentage': 80.0,
+             'cgpa': round(rng.uniform(5.5, 9.9), 2), 'branch': rng.choice(BRANCHES),
+             'has_backlog': False, 'updated_at': now}
+            for i in range(1, args.students + 1)
+        ])
+        opportunity_branches = {i: rng.sample(BRANCHES, 3) for i in range(1, args.opportunities + 1)}
+        _insert(conn, Opportunity.__table__, [
+            {'id': i, 'title': 'Role {}'.format(i), 'type': rng.choice(TYPES),
+             'company_name': 'Company {}'.format(i % 300), 'ctc': '{} LPA'.format(rng.randint(4, 30)),
+             'min_cgpa': rng.choice([None, 6.0, 7.0, 8.0]),
+             'allowed_branches': ','.join(branches),
+             'deadline': now + timedelta(days=rng.randint(-120, 60)),
+             'created_at': now - timedelta(days=rng.randint(0, 365))}
+            for i, branches in opportunity_branches.items()
+        ])
+        # Core inserts skip the model's allowed_branches validator; add the rows it would
+        _insert(conn, OpportunityBranch.__table__, [
+            {'opportunity_id': i, 'job_id': None, 'branch': branch}
+            for i, branches in opportunity_branches.items() for branch in branches
+        ])
+        _insert(conn, Job.__table__, [
+            {'id': i, 'company_name': 'Company {}'.format(i), 'job_description': 'x', 'ctc': '10 LPA',
+             'min_cgpa': 6.0, 'allowed_branches': 'CSE,IT', 'deadline': now + timedelta(days=30),
+             'created_at': now}
+            for i in range(1, args.jobs + 1)
+        ])
+
+        per_student = max(1, args.applications // args.students)
+        opportunity_ids = range(1, args.opportunities + 1)
+        rows = []
+        total = 0
+        for student_id in range(1, args.students + 1):
+            # One in twenty students also applied to a job opening
+            job_id = rng.randint(1, args.jobs) if args.jobs and student_id % 20 == 0 else None
+            for opp_id in rng.sample(opportunity_ids, min(per_student, args.opportunities)):
+                applied = now - timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+                if job_id is not None:
+                    target = {'job_id': job_id, 'opportunity_id': None}
+                    job_id = None
+                else:
+                    target = {'job_id': None, 'opportunity_id': opp_id}
+                rows.append(dict(target, student_id=student_id, status=rng.choice(STATUSES),
+                                 applied_at=applied, updated_at=applied))
+            if len(rows) >= CHUNK:
+                _insert(conn, Application.__table__, rows)
+                total += len(rows)
+                rows = []
+        _insert(conn, Application.__table__, rows)
+        total += len(rows)
+
+    if engine.dialect.name == 'postgresql':
+        # Explicit ids were inserted; move the sequences past them
+        with engine.begin() as conn:
+            for table in ('users', 'opportunities', 'jobs', 'opportunity_branches'):
+                conn.exec_driver_sql(
+                    "SELECT setval(pg_get_serial_sequence('{0}', 'id'), (SELECT MAX(id) FROM {0}))".format(table))
+
+    with engine.connect() as conn:
+        busiest = conn.execute(
+            select(Application.opportunity_id).where(Application.opportunity_id.isnot(None))
+            .group_by(Application.opportunity_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+    return {
+        'applications': total,
+        'load_seconds': round(time.monotonic() - started, 1),
+        'student_id': args.students // 2,
+        'opportunity_id': busiest,
+        'job_id': 1,
+    }
+
+
+def build_queries(ids):
+    from app.models import Application, Job, Opportunity, StudentProfile, User
+
+    now = datetime.utcnow()
+    return {
+        'student.applications': (
+            select(Application).where(Application.student_id == ids['student_id'])
+            .order_by(Application.applied_at.desc())
+        ),
+        'admin.opportunity_applicants': (
+            select(Application).join(User, Application.student_id == User.id)
+            .where(Application.opportunity_id == ids['opportunity_id'])
+            .order_by(Application.applied_at.desc()).limit(15)
+        ),
+        'admin.opportunity_applicants[status]': (
+            select(Application).join(User, Application.student_id == User.id)
+            .where(Application.opportunity_id == ids['opportunity_id'], Application.status == 'Selected')
+            .order_by(Application.applied_at.desc()).limit(15)
+        ),
+        'admin.opportunity_applicants[count]': (
+            select(func.count()).select_from(Application)
+            .where(Application.opportunity_id == ids['opportunity_id'])
+        ),
+        'admin.job_applicants[status]': (
+            select(Application).join(User, Application.student_id == User.id)
+            .where(Application.job_id == ids['job_id'], Application.status == 'Shortlisted')
+            .order_by(Application.applied_at.desc()).limit(15)
+        ),
+        'chatbot.upcoming_drives': (
+            select(Opportunity).where(
+                Opportunity.deadline > now, Opportunity.deadline <= now + timedelta(days=30),
+                Opportunity.type.in_(['Job', 'Internship']),
+            ).order_by(Opportunity.deadline).limit(20)
+        ),
+        'chatbot.check_eligibility': (
+            select(Opportunity).where(
+                (Opportunity.min_cgpa <= 7.5) | Opportunity.min_cgpa.is_(None),
+                Opportunity.open_to_branch('CSE'),
+                Opportunity.deadline > now,
+            ).limit(10)
+        ),
+        'student.browse_opportunities': select(Opportunity).order_by(Opportunity.created_at.desc()),
+        'chatbot.recent_applicants': (
+            select(Application, User, StudentProfile, func.coalesce(Opportunity.company_name, Job.company_name))
+            .join(User, Application.student_id == User.id)
+            .outerjoin(StudentProfile, StudentProfile.user_id == User.id)
+            .outerjoin(Opportunity, Application.opportunity_id == Opportunity.id)
+            .outerjoin(Job, Application.job_id == Job.id)
+            .order_by(Application.applied_at.desc()).limit(50)
+        ),
+        'admin.view_students[branch]': (
+            select(StudentProfile).join(User).where(User.role == 'Student', StudentProfile.branch.ilike('%CSE%'))
+            .order_by(StudentProfile.cgpa.desc()).limit(15)
+        ),
+        'chatbot.branch_statistics[CSE]': (
+            select(func.count(StudentProfile.id), func.avg(StudentProfile.cgpa))
+            .where(StudentProfile.branch == 'CSE')
+        ),
+        'counters.per_opportunity_status': (
+            select(Application.opportunity_id, Application.status, func.count(Application.id))
+            .where(Application.opportunity_id.isnot(None))
+            .group_by(Application.opportunity_id, Application.status)
+        ),
+    }
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    args = tuple(params[name] for name in compiled.positiontup) if compiled.positional else params
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + compiled.string, args).all()
+        return [row[-1] for row in rows]
+    if conn.dialect.name == 'postgresql':
+        rows = conn.exec_driver_sql('EXPLAIN (ANALYZE, BUFFERS) ' + compiled.string, args).all()
+        return [row[0] for row in rows]
+    return ['(no EXPLAIN support for {})'.format(conn.dialect.name)]
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        conn.exec_driver_sql('ANALYZE')
+        for name, stmt in queries.items():
+            conn.execute(stmt).all()  # warm the cache
+            timings = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                conn.execute(stmt).all()
+                timings.append((time.perf_counter() - began) * 1000)
+            results[name] = {'ms': round(statistics.median(timings), 3), 'plan': explain(conn, stmt)}
+        conn.rollback()
+    return results
+
+
+def set_indexes(engine, create):
+    """Create (timed) or drop the hot-path indexes; returns build seconds per index."""
+    from app import db
+
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    build = {}
+    for name in HOT_INDEXES:
+        began = time.monotonic()
+        if create:
+            indexes[name].create(engine, checkfirst=True)
+        else:
+            indexes[name].drop(engine, checkfirst=True)
+        build[name] = round(time.monotonic() - began, 3)
+    return build
+
+
+def print_report(dataset, before, after, build):
+    print("\n{} applications loaded in {}s".format(dataset['applications'], dataset['load_seconds']))
+    print("Index build: {:.2f}s total ({})".format(
+        sum(build.values()), ", ".join("{} {:.2f}s".format(n, s) for n, s in build.items())))
+    print("\n{:<42}{:>12}{:>12}{:>10}".format('query', 'before ms', 'after ms', 'speedup'))
+    for name in before:
+        b, a = before[name]['ms'], after[name]['ms']
+        print("{:<42}{:>12.2f}{:>12.2f}{:>9.1f}x".format(name, b, a, b / a if a else float('inf')))
+    print("\nPlans (before -> after):")
+    for name in before:
+        print("\n  {}".format(name))
+        for line in before[name]['plan']:
+            print("    - {}".format(line))
+        for line in after[name]['plan']:
+            print("    + {}".format(line))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN plans and timings of the hot queries before/after indexing")
+    parser.add_argument('--database-url', help='scratch database (default: a temporary SQLite file)')
+    parser.add_argument('--applications', type=int, default=1000000)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--opportunities', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write plans and timings as JSON here')
+    args = parser.parse_args(argv)
+
+    url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='chatbot-indexes-'), 'plans.db')
+    engine = create_engine(url)
+    print("Loading {} applications into {} ...".format(args.applications, engine.dialect.name))
+    dataset = load_dataset(engine, args)
+    queries = build_queries(dataset)
+
+    set_indexes(engine, create=False)
+    before = measure(engine, queries, args.repeat)
+    build = set_indexes(engine, create=True)
+    after = measure(engine, queries, args.repeat)
+
+    print_report(dataset, before, after, build)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({
+                'dialect': engine.dialect.name, 'dataset': dataset, 'index_build_seconds': build,
+                'before': before, 'after': after,
+            }, fh, indent=2, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+SQL statement budgets for the chatbot's data handlers.
+
+Seeds a throwaway SQLite database (10k students by default, with their
+profiles and applications) and runs every SecureIntentRouter intent, the
+chatbot_handlers helpers, the engine's personal context blocks and the
+placement counters once each, counting the SQL statements they issue. The
+counters' full reconciliation runs first, so the cases after it read the
+loaded counters as a running server would. Each case has a fixed
+budget: set-based handlers issue the same handful of statements whether
+there are ten students or ten thousand, so a handler that slips back into
+one query per row blows its budget by orders of magnitude.
+
+Usage (from the repository root):
+    python -m benchmarks.query_budget [--students 10000] [--opportunities 40] [--seed 7]
+
+Exits with status 1 when any case goes over its budget.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.replay import QueryCounter, build_app, seed_database
+
+# case -> statements allowed per call. Router budgets include the
+# permission and audit lookups of the asking user.
+BUDGETS = {
+    'counters.reconcile': 7,
+    'counters.totals': 0,
+    'router.search_company': 4,
+    'router.check_eligibility': 6,
+    'router.application_status': 5,
+    'router.upcoming_drives': 4,
+    'router.placement_stats': 3,
+    'router.list_applicants': 5,
+    'router.branch_analytics': 3,
+    'router.branch_analytics[CSE]': 3,
+    'handlers.count_applications_by_status': 1,
+    'handlers.get_branch_statistics': 0,
+    'handlers.get_branch_statistics[CSE]': 0,
+    'handlers.get_recent_applications': 1,
+    'handlers.get_admin_dashboard_stats': 1,
+    'engine.user_context_blocks': 5,
+}
+
+
+def build_cases(admin_id, student_id):
+    """(label, callable) pairs; called inside an application context."""
+    from app import db
+    from app import chatbot_handlers as handlers
+    from app.chatbot_engine import ChatbotEngine
+    from app.chatbot_intent_router import SecureIntentRouter
+    from app.placement_counters import placement_counters
+
+    router = SecureIntentRouter(db)
+
+    def route(intent, params, user_id):
+        def run():
+            result = router.route_intent(intent, params, user_id)
+            if not result.get('success'):
+                raise RuntimeError('{} failed: {}'.format(intent, result.get('error')))
+            return result
+        return run
+
+    return [
+        ('counters.reconcile', lambda: placement_counters.reconcile(force=True)),
+        ('counters.totals', placement_counters.totals),
+        ('router.search_company', route('search_company', {'company': 'Google'}, student_id)),
+        ('router.check_eligibility', route('check_eligibility', {}, student_id)),
+        ('router.application_status', route('application_status', {}, student_id)),
+        ('router.upcoming_drives', route('upcoming_drives', {}, student_id)),
+        ('router.placement_stats', route('placement_stats', {}, admin_id)),
+        ('router.list_applicants', route('list_applicants', {'limit': 50}, admin_id)),
+        ('router.branch_analytics', route('branch_analytics', {}, admin_id)),
+        ('router.branch_analytics[CSE]', route('branch_analytics', {'branch': 'CSE'}, admin_id)),
+        ('handlers.count_applications_by_status', lambda: handlers.count_applications_by_status(student_id)),
+        ('handlers.get_branch_statistics', lambda: handlers.get_branch_statistics()),
+        ('handlers.get_branch_statistics[CSE]', lambda: handlers.get_branch_statistics('CSE')),
+        ('handlers.get_recent_applications', lambda: handlers.get_recent_applications(50)),
+        ('handlers.get_admin_dashboard_stats', lambda: handlers.get_admin_dashboard_stats()),
+        ('engine.user_context_blocks', lambda: ChatbotEngine().user_context_blocks(student_id)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check SQL statement budgets of the chatbot handlers")
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--opportunities', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    # No provider traffic is needed; keep .env keys and the health prober out of it
+    for key in ('GEMINI_API_KEY', 'GOOGLE_API_KEY', 'MISTRAL_API_KEY', 'OLLAMA_CHAT_MODEL'):
+        os.environ[key] = ''
+    os.environ.setdefault('CHATBOT_HEALTH_PROBE_INTERVAL', '0')
+
+    workdir = tempfile.mkdtemp(prefix='chatbot-queries-')
+    app = build_app(os.path.join(workdir, 'queries.db'))
+    counter = QueryCounter()
+    started = time.monotonic()
+    with app.app_context():
+        from app import db
+        users = seed_database(args.students, args.opportunities, args.seed)
+        counter.attach(db.engine)
+    print("Seeded {} students in {:.1f}s".format(args.students, time.monotonic() - started))
+
+    over = []
+    print("\n{:<42}{:>11}{:>8}{:>11}".format('case', 'statements', 'budget', 'ms'))
+    with app.app_context():
+        from app import db
+        for label, run in build_cases(users['admin'][0], users['student'][0]):
+            # A fresh session per case, so no case is served from another's identity map
+            db.session.remove()
+            counter.reset()
+            began = time.monotonic()
+            run()
+            elapsed_ms = (time.monotonic() - began) * 1000
+            statements = counter.count
+            budget = BUDGETS[label]
+            flag = '' if statements <= budget else '  OVER'
+            if flag:
+                over.append(label)
+            print("{:<42}{:>11}{:>8}{:>11.1f}{}".format(label, statements, budget, elapsed_ms, flag))
+
+    if over:
+        print("\n{} case(s) over budget: {}".format(len(over), ", ".join(over)))
+        return 1
+    print("\nAll cases within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Offline replay benchmark for the chatbot.
+
+Replays a JSONL corpus of chat messages against a throwaway SQLite database
+and the local provider stub (benchmarks/stub_providers.py), so latency
+numbers can be reproduced without a running server or real Gemini, Mistral
+or Ollama. Reports p50/p95/p99 latency (overall and per answer tier), DB
+queries per message and provider calls per message.
+
+Usage (from the repository root):
+    python -m benchmarks.replay [--corpus benchmarks/corpus.jsonl] [--mode engine|client]
+        [--concurrency 4] [--repeat 2] [--providers gemini,mistral]
+        [--profile gemini:median_ms=1200,error_rate=0.1] [--students 200]
+        [--output results.json] [--baseline previous.json] [--tolerance 0.2]
+
+Corpus lines look like {"message": "...", "role": "student", "user": 3}.
+role is student, admin or anonymous; user picks the n-th seeded account of
+that role (wrapping around).
+
+--mode engine calls ChatbotEngine.process_query directly; --mode client
+posts to /chatbot/api/chat through the Flask test client with a logged-in
+session. Chatbot settings (CHATBOT_CACHE_TTL, CHATBOT_FAST_PATH, ...) are
+read from the environment as usual; the health prober is off unless
+CHATBOT_HEALTH_PROBE_INTERVAL is set.
+
+With --baseline the run exits with status 1 when p95 latency, DB queries
+per message or provider calls per message regress by more than the
+tolerance compared with an earlier --output file.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from benchmarks.stub_providers import StubProviderServer, parse_profiles, PROVIDERS
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus.jsonl')
+
+COMPANIES = ['Google', 'Amazon', 'Microsoft', 'TCS', 'Infosys', 'Wipro', 'Accenture', 'Deloitte', 'Zoho', 'Adobe']
+BRANCHES = ['CSE', 'IT', 'ECE', 'EEE', 'MECH', 'CIVIL']
+STATUSES = ['Applied', 'Applied', 'Shortlisted', 'Selected', 'Rejected']
+SKILLS = ['Python', 'Java', 'SQL', 'React', 'C++', 'Machine Learning', 'AWS']
+
+# Regression checks: (label, path into the summary, absolute slack)
+REGRESSION_CHECKS = [
+    ('p95 latency (ms)', ('latency_ms', 'p95'), 5.0),
+    ('DB queries per message', ('db_queries', 'mean'), 0.5),
+    ('provider calls per message', ('provider_calls', 'per_message'), 0.05),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def load_corpus(path):
+    items = []
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                items.append(json.loads(line))
+    return items
+
+
+def configure_environment(stub, providers):
+    """Point the app at the stub; must run before the app package is imported."""
+    os.environ.update(stub.env())
+    # Explicit values also stop .env from supplying real keys
+    os.environ['GEMINI_API_KEY'] = 'benchmark' if 'gemini' in providers else ''
+    os.environ['GOOGLE_API_KEY'] = ''
+    os.environ['MISTRAL_API_KEY'] = 'benchmark' if 'mistral' in providers else ''
+    os.environ['OLLAMA_CHAT_MODEL'] = 'benchmark' if 'ollama' in providers else ''
+    os.environ.setdefault('CHATBOT_HEALTH_PROBE_INTERVAL', '0')
+
+
+def build_app(db_path):
+    from config import config, TestingConfig
+
+    class BenchmarkConfig(TestingConfig):
+        # A file database, so every worker thread sees the same data
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    config['benchmark'] = BenchmarkConfig
+    from app import create_app
+    return create_app('benchmark')
+
+
+def seed_database(students, opportunities, seed):
+    """Create admins, students, opportunities and applications; returns user ids by role."""
+    from app import db
+    from app.models import User, StudentProfile, Opportunity, Application
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    admins = [User(username='bench_admin', email='bench_admin@example.com', password='x', role='Admin')]
+    db.session.add_all(admins)
+
+    student_users = []
+    for i in range(students):
+        user = User(username='student{}'.format(i), email='student{}@example.com'.format(i),
+                    password='x', role='Student')
+        student_users.append(user)
+    db.session.add_all(student_users)
+    db.session.flush()
+    for user in student_users:
+        db.session.add(StudentProfile(
+            user_id=user.id,
+            tenth_percentage=round(rng.uniform(60, 98), 1),
+            twelfth_percentage=round(rng.uniform(60, 98), 1),
+            cgpa=round(rng.uniform(5.5, 9.9), 2),
+            branch=rng.choice(BRANCHES),
+            skills=', '.join(rng.sample(SKILLS, 3)),
+            resume_link='resume.pdf' if rng.random() < 0.7 else None,
+        ))
+
+    opps = []
+    for i in range(opportunities):
+        company = COMPANIES[i % len(COMPANIES)]
+        opps.append(Opportunity(
+            title=rng.choice(['SDE', 'Data Analyst', 'Backend Intern', 'ML Engineer', 'QA Engineer']),
+            type=rng.choice(['Job', 'Internship']),
+            company_name=company,
+            ctc='{} LPA'.format(rng.randint(4, 30)),
+            min_cgpa=rng.choice([None, 6.0, 7.0, 7.5, 8.0]),
+            allowed_branches=','.join(rng.sample(BRANCHES, rng.randint(2, 4))),
+            deadline=now + timedelta(days=rng.randint(-20, 45)),
+            created_at=now - timedelta(days=rng.randint(0, 60)),
+        ))
+    db.session.add_all(opps)
+    db.session.flush()
+
+    for user in student_users:
+        for opp in rng.sample(opps, min(len(opps), rng.randint(0, 4))):
+            db.session.add(Application(student_id=user.id, opportunity_id=opp.id, status=rng.choice(STATUSES)))
+    db.session.commit()
+    return {'admin': [u.id for u in admins], 'student': [u.id for u in student_users]}
+
+
+class QueryCounter:
+    """Counts SQL statements per thread (chat messages are answered on the calling thread)."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def attach(self, engine):
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def make_runner(app, mode, counter):
+    from app.chatbot_engine import ChatbotEngine
+
+    def run(item, user_id):
+        role = item.get('role', 'anonymous')
+        client = None
+        if mode == 'client':
+            client = app.test_client()
+            if user_id:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user_id
+                    sess['role'] = role.title()
+        counter.reset()
+        started = time.perf_counter()
+        if mode == 'client':
+            response = client.post('/chatbot/api/chat', json={'message': item['message']}).get_json() or {}
+        else:
+            with app.app_context():
+                response = ChatbotEngine().process_query(item['message'], user_id=user_id)
+        return {
+            'message': item['message'],
+            'role': role,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'queries': counter.count,
+            'tier': response.get('tier') or 'none',
+            'method': response.get('extraction_method'),
+            'success': bool(response.get('success')),
+        }
+
+    return run
+
+
+def summarize(results, wall_seconds, stub_counts, config):
+    latencies = [r['latency_ms'] for r in results]
+    queries = [r['queries'] for r in results]
+    total_calls = sum(c['calls'] for c in stub_counts.values())
+    llm_answers = sum(1 for r in results if r['tier'] == 'llm')
+
+    tiers = {}
+    for r in results:
+        tiers.setdefault(r['tier'], []).append(r)
+    tier_report = {}
+    for tier, rows in sorted(tiers.items()):
+        values = [r['latency_ms'] for r in rows]
+        tier_report[tier] = {
+            'count': len(rows),
+            'share': round(len(rows) / len(results), 3),
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'queries_mean': round(sum(r['queries'] for r in rows) / len(rows), 2),
+        }
+
+    return {
+        'config': config,
+        'messages': len(results),
+        'failed': sum(1 for r in results if not r['success']),
+        'wall_seconds': round(wall_seconds, 2),
+        'throughput_per_second': round(len(results) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+        },
+        'db_queries': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'p95': percentile(queries, 95),
+            'max': max(queries),
+        },
+        'provider_calls': {
+            'total': total_calls,
+            'per_message': round(total_calls / len(results), 3),
+            'per_llm_answer': round(total_calls / llm_answers, 3) if llm_answers else None,
+            'by_provider': stub_counts,
+        },
+        'tiers': tier_report,
+    }
+
+
+def print_report(summary):
+    cfg = summary['config']
+    print("=" * 70)
+    print("CHATBOT REPLAY BENCHMARK")
+    print("=" * 70)
+    print("Mode: {mode} | concurrency {concurrency} | providers {providers} | {students} students, "
+          "{opportunities} opportunities".format(**cfg))
+    print("Messages: {} ({} unsuccessful) in {:.2f}s ({} msg/s)".format(
+        summary['messages'], summary['failed'], summary['wall_seconds'], summary['throughput_per_second']))
+
+    lat = summary['latency_ms']
+    print("\nLatency (ms): p50 {p50} | p95 {p95} | p99 {p99} | max {max}".format(**lat))
+    print("\n{:<16}{:>7}{:>8}{:>11}{:>11}{:>10}".format('tier', 'count', 'share', 'p50 ms', 'p95 ms', 'queries'))
+    for tier, row in summary['tiers'].items():
+        print("{:<16}{:>7}{:>7.0f}%{:>11}{:>11}{:>10}".format(
+            tier, row['count'], row['share'] * 100, row['p50'], row['p95'], row['queries_mean']))
+
+    dbq = summary['db_queries']
+    print("\nDB queries per message: mean {mean} | p95 {p95} | max {max}".format(**dbq))
+    calls = summary['provider_calls']
+    print("Provider calls: {total} total | {per_message} per message | {per_llm_answer} per LLM answer".format(**calls))
+    for name, counts in sorted(calls['by_provider'].items()):
+        print("  {:<8} calls {calls} | ok {ok} | error {error} | timeout {timeout}".format(name, **counts))
+
+
+def compare_with_baseline(summary, baseline, tolerance):
+    """Return a list of regression descriptions (empty when within tolerance)."""
+    regressions = []
+    print("\nBaseline comparison (tolerance {:.0f}%):".format(tolerance * 100))
+    for label, (section, key), slack in REGRESSION_CHECKS:
+        current = summary[section][key]
+        previous = (baseline.get(section) or {}).get(key)
+        if current is None or previous is None:
+            continue
+        regressed = current > previous * (1 + tolerance) and current - previous > slack
+        print("  {:<30}{:>10} -> {:<10}{}".format(label, previous, current, "REGRESSION" if regressed else "ok"))
+        if regressed:
+            regressions.append("{}: {} -> {}".format(label, previous, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a chat corpus against stubbed LLM providers")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--mode', choices=('engine', 'client'), default='engine')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=1, help='replay the corpus this many times')
+    parser.add_argument('--providers', default='gemini', help='comma-separated subset of gemini,mistral,ollama')
+    parser.add_argument('--profile', action='append', default=[],
+                        help='stub profile "[provider:]key=value,...", e.g. gemini:median_ms=1200,error_rate=0.1')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--opportunities', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON summary here')
+    parser.add_argument('--baseline', help='JSON summary of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    providers = [p.strip() for p in args.providers.split(',') if p.strip()]
+    unknown = set(providers) - set(PROVIDERS)
+    if unknown:
+        parser.error("unknown providers: {}".format(", ".join(sorted(unknown))))
+
+    stub = StubProviderServer(parse_profiles(args.profile), seed=args.seed).start()
+    configure_environment(stub, providers)
+
+    workdir = tempfile.mkdtemp(prefix='chatbot-bench-')
+    app = build_app(os.path.join(workdir, 'bench.db'))
+    counter = QueryCounter()
+    with app.app_context():
+        from app import db
+        users = seed_database(args.students, args.opportunities, args.seed)
+        counter.attach(db.engine)
+
+    # Train the intent classifier up front so it does not land in the first message
+    from app.chatbot_classifier import intent_classifier
+    intent_classifier.predict("warm up")
+
+    corpus = load_corpus(args.corpus) * max(1, args.repeat)
+    jobs = []
+    for item in corpus:
+        ids = users.get(item.get('role', 'anonymous'))
+        user_id = ids[int(item.get('user', 0)) % len(ids)] if ids else None
+        jobs.append((item, user_id))
+
+    run = make_runner(app, args.mode, counter)
+    stub.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        results = list(pool.map(lambda job: run(*job), jobs))
+    wall = time.perf_counter() - started
+
+    config = {
+        'mode': args.mode,
+        'concurrency': args.concurrency,
+        'providers': ','.join(providers),
+        'profiles': {name: stub.profiles[name].as_dict() for name in providers},
+        'students': args.students,
+        'opportunities': args.opportunities,
+        'corpus': os.path.basename(args.corpus),
+        'repeat': args.repeat,
+    }
+    summary = summarize(results, wall, stub.counts(), config)
+    print_report(summary)
+    stub.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(summary, fh, indent=2)
+        print("\nSummary written to {}".format(args.output))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare_with_baseline(summary, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions found:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Local stand-in for the chatbot's LLM providers.
+
+Speaks enough of each wire format for ChatbotEngine and the health prober:
+    Gemini   POST /v1beta/models/<model>:generateContent
+             POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+             GET  /v1beta/models/<model>
+    Mistral  POST /v1/chat/completions (stream true or false)
+             GET  /v1/models
+    Ollama   POST /api/generate and /api/chat (stream true or false)
+             GET  /api/tags
+
+Every provider has a profile: lognormal latency around a median, an error
+rate (answered with an HTTP error status) and a timeout rate (the request
+hangs until the client gives up). Latency is the time to the first byte;
+streamed answers then arrive in chunks.
+
+When a Gemini or Mistral request declares tools and the conversation has no
+tool result yet (and tool calling was not switched off), the stub first asks
+for the first declared tool that needs no arguments, like a model that wants
+data before answering.
+
+Standalone use:
+    python -m benchmarks.stub_providers --port 8089 --profile gemini:median_ms=900,error_rate=0.05
+
+then point the app at it:
+    GEMINI_API_BASE=http://127.0.0.1:8089/v1beta
+    MISTRAL_API_BASE=http://127.0.0.1:8089/v1
+    OLLAMA_BASE_URL=http://127.0.0.1:8089
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+PROVIDERS = ('gemini', 'mistral', 'ollama')
+
+ANSWER = (
+    "Here is what I found in the portal. There are several open opportunities that match "
+    "your profile; check the deadlines and apply early. Let me know if you need details."
+)
+
+
+class ProviderProfile:
+    """Latency distribution and failure injection for one provider."""
+
+    FIELDS = {
+        'median_ms': float, 'sigma': float, 'error_rate': float, 'error_status': int,
+        'timeout_rate': float, 'hang_seconds': float, 'chunks': int, 'chunk_gap_ms': float,
+    }
+
+    def __init__(self, median_ms=800.0, sigma=0.35, error_rate=0.0, error_status=503,
+                 timeout_rate=0.0, hang_seconds=60.0, chunks=6, chunk_gap_ms=25.0):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.chunks = chunks
+        self.chunk_gap_ms = chunk_gap_ms
+
+    def update(self, spec):
+        """Apply "key=value,key=value" overrides."""
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            key, _, value = item.partition('=')
+            if key not in self.FIELDS:
+                raise ValueError("Unknown profile field {!r} (expected one of {})".format(
+                    key, ", ".join(sorted(self.FIELDS))))
+            setattr(self, key, self.FIELDS[key](value))
+        return self
+
+    def latency(self, rng):
+        if self.sigma <= 0:
+            return self.median_ms / 1000.0
+        return rng.lognormvariate(0.0, self.sigma) * self.median_ms / 1000.0
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+
+def _tool_request(provider, body):
+    """Name of the tool to call for this request, or None to answer in text."""
+    if provider == 'gemini':
+        declarations = [d for tool in body.get('tools') or () for d in tool.get('functionDeclarations') or ()]
+        mode = ((body.get('toolConfig') or {}).get('functionCallingConfig') or {}).get('mode')
+        answered = any(
+            'functionResponse' in part
+            for turn in body.get('contents') or () for part in turn.get('parts') or ()
+        )
+    else:
+        declarations = [tool.get('function') or {} for tool in body.get('tools') or ()]
+        mode = str(body.get('tool_choice') or '').upper()
+        answered = any(message.get('role') == 'tool' for message in body.get('messages') or ())
+    if answered or mode == 'NONE':
+        return None
+    for declaration in declarations:
+        if not (declaration.get('parameters') or {}).get('required'):
+            return declaration.get('name')
+    return None
+
+
+def parse_profiles(specs, base=None):
+    """
+    Build provider profiles from "provider:key=value,..." strings; a spec
+    without a provider prefix applies to all providers.
+    """
+    profiles = {name: ProviderProfile().update(base or '') for name in PROVIDERS}
+    for spec in specs or ():
+        name, sep, rest = spec.partition(':')
+        if sep and name in PROVIDERS:
+            profiles[name].update(rest)
+        else:
+            for profile in profiles.values():
+                profile.update(spec)
+    return profiles
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith('/v1beta/models') or path == '/v1/models' or path == '/api/tags':
+            self._send_json(200, {'models': []})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        path = urlparse(self.path).path
+
+        if path.startswith('/v1beta/models/'):
+            provider, stream = 'gemini', path.endswith(':streamGenerateContent')
+        elif path == '/v1/chat/completions':
+            provider, stream = 'mistral', bool(body.get('stream'))
+        elif path in ('/api/generate', '/api/chat'):
+            provider, stream = 'ollama', body.get('stream', True) is not False
+        else:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        server = self.server
+        outcome, delay = server.stub.plan_call(provider)
+        if outcome == 'timeout':
+            # Hold the connection open without answering
+            time.sleep(server.stub.profiles[provider].hang_seconds)
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        if outcome == 'error':
+            status = server.stub.profiles[provider].error_status
+            self._send_json(status, {'error': {'code': status, 'message': 'stub injected error'}})
+            return
+
+        profile = server.stub.profiles[provider]
+        words = ANSWER.split(' ')
+        size = max(1, len(words) // max(profile.chunks, 1))
+        pieces = [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+        prompt_tokens = len(json.dumps(body)) // 4
+        completion_tokens = len(ANSWER) // 4
+
+        tool = _tool_request(provider, body) if provider != 'ollama' else None
+        if tool:
+            server.stub.count_tool_call(provider)
+            self._tool_call(provider, stream, tool, prompt_tokens)
+        elif provider == 'gemini':
+            self._gemini(stream, pieces, prompt_tokens, completion_tokens, profile)
+        elif provider == 'mistral':
+            self._mistral(stream, pieces, prompt_tokens, completion_tokens, profile)
+        else:
+            self._ollama(path, stream, pieces, prompt_tokens, completion_tokens, profile)
+
+    def _tool_call(self, provider, stream, tool, prompt_tokens):
+        if provider == 'gemini':
+            payload = {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'functionCall': {'name': tool, 'args': {}}}]}}],
+                'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': 5},
+            }
+        else:
+            call = {'id': 'call_stub', 'type': 'function', 'function': {'name': tool, 'arguments': '{}'}}
+            payload = {
+                'choices': [{'message': {'role': 'assistant', 'content': '', 'tool_calls': [call]}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 5},
+            }
+        if not stream:
+            self._send_json(200, payload)
+            return
+        if provider == 'mistral':
+            message = payload['choices'][0].pop('message')
+            payload['choices'][0]['delta'] = {'tool_calls': [dict(message['tool_calls'][0], index=0)]}
+        self._start_stream('text/event-stream')
+        self.wfile.write('data: {}\n\n'.format(json.dumps(payload)).encode('utf-8'))
+        if provider == 'mistral':
+            self.wfile.write(b'data: [DONE]\n\n')
+
+    def _pause(self, profile):
+        time.sleep(profile.chunk_gap_ms / 1000.0)
+
+    def _gemini(self, stream, pieces, prompt_tokens, completion_tokens, profile):
+        usage = {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': completion_tokens}
+        if not stream:
+            self._send_json(200, {
+                'candidates': [{'content': {'parts': [{'text': ''.join(pieces).strip()}]}}],
+                'usageMetadata': usage,
+            })
+            return
+        self._start_stream('text/event-stream')
+        for i, piece in enumerate(pieces):
+            event = {'candidates': [{'content': {'parts': [{'text': piece}]}}]}
+            if i == len(pieces) - 1:
+                event['usageMetadata'] = usage
+            self.wfile.write('data: {}\r\n\r\n'.format(json.dumps(event)).encode('utf-8'))
+            self.wfile.flush()
+            self._pause(profile)
+
+    def _mistral(self, stream, pieces, prompt_tokens, completion_tokens, profile):
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+        if not stream:
+            self._send_json(200, {
+                'choices': [{'message': {'role': 'assistant', 'content': ''.join(pieces).strip()}}],
+                'usage': usage,
+            })
+            return
+        self._start_stream('text/event-stream')
+        for piece in pieces:
+            event = {'choices': [{'delta': {'content': piece}}]}
+            self.wfile.write('data: {}\n\n'.format(json.dumps(event)).encode('utf-8'))
+            self.wfile.flush()
+            self._pause(profile)
+        self.wfile.write('data: {}\n\n'.format(json.dumps({'choices': [], 'usage': usage})).encode('utf-8'))
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def _ollama(self, path, stream, pieces, prompt_tokens, completion_tokens, profile):
+        usage = {'prompt_eval_count': prompt_tokens, 'eval_count': completion_tokens}
+
+        def message(text, done):
+            if path == '/api/chat':
+                payload = {'message': {'role': 'assistant', 'content': text}, 'done': done}
+            else:
+                payload = {'response': text, 'done': done}
+            if done:
+                payload.update(usage)
+            return payload
+
+        if not stream:
+            self._send_json(200, message(''.join(pieces).strip(), True))
+            return
+        self._start_stream('application/x-ndjson')
+        for piece in pieces:
+            self.wfile.write((json.dumps(message(piece, False)) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            self._pause(profile)
+        self.wfile.write((json.dumps(message('', True)) + '\n').encode('utf-8'))
+
+
+class StubProviderServer:
+    """Threaded HTTP server with per-provider call counters."""
+
+    def __init__(self, profiles=None, host='127.0.0.1', port=0, seed=None):
+        self.profiles = profiles or parse_profiles(())
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def env(self):
+        """Environment variables that point the app at this server."""
+        return {
+            'GEMINI_API_BASE': self.url + '/v1beta',
+            'MISTRAL_API_BASE': self.url + '/v1',
+            'OLLAMA_BASE_URL': self.url,
+        }
+
+    def plan_call(self, provider):
+        """Decide the outcome ('ok', 'error', 'timeout') and latency of one call."""
+        profile = self.profiles[provider]
+        with self._lock:
+            roll = self._rng.random()
+            delay = profile.latency(self._rng)
+            if roll < profile.timeout_rate:
+                outcome = 'timeout'
+            elif roll < profile.timeout_rate + profile.error_rate:
+                outcome = 'error'
+            else:
+                outcome = 'ok'
+            counts = self._counts.setdefault(
+                provider, {'calls': 0, 'ok': 0, 'error': 0, 'timeout': 0, 'tool_calls': 0})
+            counts['calls'] += 1
+            counts[outcome] += 1
+        return outcome, delay
+
+    def count_tool_call(self, provider):
+        with self._lock:
+            self._counts[provider]['tool_calls'] += 1
+
+    def counts(self):
+        with self._lock:
+            return {name: dict(c) for name, c in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-providers', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini/Mistral/Ollama stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--profile', action='append', default=[],
+                        help='"[provider:]key=value,..." e.g. gemini:median_ms=900,error_rate=0.05')
+    args = parser.parse_args(argv)
+
+    server = StubProviderServer(parse_profiles(args.profile), args.host, args.port, args.seed).start()
+    print("Stub providers listening on {}".format(server.url))
+    for key, value in server.env().items():
+        print("  {}={}".format(key, value))
+    for name, profile in server.profiles.items():
+        print("  {}: {}".format(name, profile.as_dict()))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Calls: {}".format(server.counts()))
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Check the CTC / stipend parser against the ways admins write packages.
+
+Usage:
+    python evaluate_ctc_parser.py
+
+Each case is free text as typed into a CTC field and the package it should
+store: (min_lpa, max_lpa, stipend_unit), with stipends annualised. Exits
+non-zero when any case is parsed differently.
+"""
+
+import sys
+
+from app.ctc import package_label, parse_ctc
+
+CASES = [
+    # Annual CTC
+    ("12 LPA", (12.0, 12.0, None)),
+    ("12LPA", (12.0, 12.0, None)),
+    ("12 L.P.A.", (12.0, 12.0, None)),
+    ("12", (12.0, 12.0, None)),
+    ("6 lakhs per annum", (6.0, 6.0, None)),
+    ("Rs. 12,00,000 per annum", (12.0, 12.0, None)),
+    ("INR 6,00,000 p.a.", (6.0, 6.0, None)),
+    ("1.2 cr", (120.0, 120.0, None)),
+    # Ranges, with the unit on one or both bounds
+    ("8-10 LPA", (8.0, 10.0, None)),
+    ("8 - 10", (8.0, 10.0, None)),
+    ("4 LPA - 6 LPA", (4.0, 6.0, None)),
+    ("8 lakh - 10 lakh", (8.0, 10.0, None)),
+    ("8-10 lakh", (8.0, 10.0, None)),
+    # Other numbers in the text: the one marked as money counts
+    ("2024 batch: 8 LPA", (8.0, 8.0, None)),
+    ("2023-24 batch: 8 LPA", (8.0, 8.0, None)),
+    ("10 LPA (Rs 2L joining bonus)", (10.0, 10.0, None)),
+    # Stipends
+    ("20k/month", (2.4, 2.4, 'month')),
+    ("Stipend 25000 pm", (3.0, 3.0, 'month')),
+    ("15k to 20k monthly", (1.8, 2.4, 'month')),
+    ("20k/month - 25k/month", (2.4, 3.0, 'month')),
+    ("₹15,000 - ₹20,000 per month", (1.8, 2.4, 'month')),
+    ("Rs. 500/day", (1.825, 1.825, 'day')),
+    # No package
+    ("Not disclosed", (None, None, None)),
+    ("Competitive", (None, None, None)),
+    ("$100k", (None, None, None)),
+    ("", (None, None, None)),
+]
+
+print("=" * 70)
+print("CTC PARSER EVALUATION")
+print("=" * 70)
+
+failures = 0
+for text, expected in CASES:
+    package = parse_ctc(text)
+    ok = tuple(package) == expected
+    failures += not ok
+    label = package_label(*package) or '-'
+    print(f"{'ok ' if ok else 'BAD'} {text!r:<34} -> {label:<18}"
+          + ("" if ok else f" got {tuple(package)}, want {expected}"))
+
+print(f"\n{len(CASES) - failures}/{len(CASES)} cases parsed as expected")
+print("\n" + "=" * 70)
+print("EVALUATION COMPLETE")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,108 @@
+"""
+Accuracy and latency report for the local chatbot intent classifier.
+
+Usage:
+    python evaluate_intent_classifier.py [examples.jsonl]
+
+Accuracy and calibration are measured with k-fold cross-validation on the
+labelled examples (each example is scored by a model that never saw it).
+Parameter extraction (company, branch, CGPA threshold, package range and
+ordering) is checked against the parameters annotated on the examples. Latency is measured on the fully
+trained model with its prediction cache cleared before every call.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from app.chatbot_classifier import IntentClassifier, CV_FOLDS, DEFAULT_EXAMPLES, extract_params
+from app.chatbot_security import ALLOWED_INTENTS
+
+path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_EXAMPLES
+classifier = IntentClassifier(path)
+examples = classifier.load_examples(path)
+
+print("=" * 70)
+print("INTENT CLASSIFIER EVALUATION")
+print("=" * 70)
+print(f"Examples: {len(examples)} from {path}")
+
+started = time.perf_counter()
+classifier.fit(examples)
+print(f"Training + calibration: {(time.perf_counter() - started) * 1000:.1f} ms "
+      f"(temperature {classifier.temperature:.3f})")
+
+# ---------------- Accuracy ----------------
+labels, scores, targets = classifier.cross_validate(examples)
+probs = classifier._softmax(scores, classifier.temperature)
+predicted = probs.argmax(axis=1)
+confidence = probs.max(axis=1)
+correct = predicted == targets
+
+print(f"\n{CV_FOLDS}-fold accuracy: {correct.mean() * 100:.1f}%")
+print(f"\n{'intent':<22}{'n':>4}{'precision':>11}{'recall':>9}")
+for k, label in enumerate(labels):
+    n = int((targets == k).sum())
+    tp = int(((predicted == k) & (targets == k)).sum())
+    precision = tp / max(int((predicted == k).sum()), 1)
+    recall = tp / max(n, 1)
+    marker = "*" if label in ALLOWED_INTENTS else " "
+    print(f"{marker}{label:<21}{n:>4}{precision:>11.2f}{recall:>9.2f}")
+print("(* = structured intent answered by SecureIntentRouter)")
+
+mistakes = [i for i in range(len(examples)) if not correct[i]]
+if mistakes:
+    print("\nMisclassified:")
+    for i in sorted(mistakes, key=lambda i: -confidence[i]):
+        text, label, _ = examples[i]
+        print(f"  {confidence[i]:.2f} {labels[predicted[i]]:<20} (want {label}): {text}")
+
+# ---------------- Calibration ----------------
+print(f"\n{'confidence':<14}{'n':>5}{'accuracy':>10}")
+edges = [0.0, 0.5, 0.7, 0.8, 0.9, 1.01]
+for lo, hi in zip(edges, edges[1:]):
+    mask = (confidence >= lo) & (confidence < hi)
+    if mask.any():
+        print(f"{lo:.1f} - {min(hi, 1.0):.1f}{'':<5}{int(mask.sum()):>5}{correct[mask].mean() * 100:>9.1f}%")
+
+# Fast-path style decision: answer structured intents at or above a threshold
+structured = np.array([labels[k] in ALLOWED_INTENTS for k in predicted])
+print(f"\n{'threshold':<11}{'answered':>9}{'precision':>11}")
+for threshold in (0.5, 0.6, 0.7, 0.8, 0.9):
+    taken = structured & (confidence >= threshold)
+    precision = correct[taken].mean() * 100 if taken.any() else 0.0
+    print(f"{threshold:<11}{int(taken.sum()):>9}{precision:>10.1f}%")
+
+# ---------------- Parameters ----------------
+# Company names the portal knows about, as the snapshot would list them
+known = {params['company'].lower() for _, _, params in examples if 'company' in params}
+print(f"\n{'parameter':<11}{'annotated':>10}{'found':>7}{'correct':>9}")
+for name in ('company', 'branch', 'cgpa', 'cgpa_op', 'min_lpa', 'max_lpa', 'sort'):
+    annotated = found = right = 0
+    for text, _, params in examples:
+        got = extract_params(text, known).get(name)
+        want = params.get(name)
+        if isinstance(got, str) and isinstance(want, str):
+            got, want = got.lower(), want.lower()
+        annotated += want is not None
+        found += got is not None
+        right += got is not None and got == want
+    print(f"{name:<11}{annotated:>10}{found:>7}{right:>9}")
+
+# ---------------- Latency ----------------
+texts = [text for text, _, _ in examples]
+timings = []
+for _ in range(5):
+    for text in texts:
+        classifier._probabilities.cache_clear()
+        t0 = time.perf_counter()
+        classifier.predict(text)
+        timings.append((time.perf_counter() - t0) * 1e6)
+timings = np.array(timings)
+print(f"\nLatency over {len(timings)} uncached predictions: "
+      f"p50 {np.percentile(timings, 50):.0f} us, p99 {np.percentile(timings, 99):.0f} us, "
+      f"max {timings.max():.0f} us")
+
+print("\n" + "=" * 70)
+print("EVALUATION COMPLETE")
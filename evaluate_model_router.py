@@ -0,0 +1,76 @@
+"""
+Routing accuracy of the complexity-based model router per threshold.
+
+Usage:
+    python evaluate_model_router.py
+
+Each question below is labelled "light" (a lookup or short factual question
+a lightweight model answers as well as the full one) or "full" (needs
+comparison, planning or multi-turn reasoning). Plans are built the way the
+engine builds them, without database context blocks; follow-ups carry one
+earlier exchange as history. Hard questions sent to the light tier are the
+costly mistake, so the table shows them separately.
+"""
+
+from app.chatbot_prompt import PromptAssembler
+from app.chatbot_router import complexity
+
+HISTORY = [
+    {'role': 'user', 'content': 'Which companies are hiring CSE students?'},
+    {'role': 'assistant', 'content': 'Google and Microsoft have open SDE roles for CSE.'},
+]
+
+QUESTIONS = [
+    # Lookups
+    ("When is the Google deadline?", None, 'light'),
+    ("What is the CTC for the Microsoft SDE role?", None, 'light'),
+    ("Show me internships", None, 'light'),
+    ("Any openings at Amazon?", None, 'light'),
+    ("What is my application status?", None, 'light'),
+    ("Am I eligible for the Infosys drive?", None, 'light'),
+    ("Which drives close this week?", None, 'light'),
+    ("What is the minimum CGPA for Adobe?", None, 'light'),
+    ("How many students are placed?", None, 'light'),
+    ("Where is the placement cell office?", None, 'light'),
+    ("What documents do I need for the drive?", None, 'light'),
+    ("Is there a dress code for interviews?", None, 'light'),
+    # Reasoning, planning and multi-turn follow-ups
+    ("Compare the Google and Microsoft offers and tell me which is better for a backend career", None, 'full'),
+    ("Why was my application rejected and how do I improve my chances next time?", None, 'full'),
+    ("Give me a step by step roadmap to prepare for product company interviews in 3 months", None, 'full'),
+    ("Should I accept the internship offer or wait for a full-time role? Explain the trade-offs", None, 'full'),
+    ("Explain the difference between the SDE and data engineer roles and which suits my skills", None, 'full'),
+    ("I have a CGPA of 7.2 and two projects in ML; what strategy should I follow to get shortlisted "
+     "by top companies this season?", None, 'full'),
+    ("and what about their CTC?", HISTORY, 'full'),
+    ("Which of them should I apply to first and why?", HISTORY, 'full'),
+    ("How should I prepare for their interviews?", HISTORY, 'full'),
+    ("Analyze my profile and recommend which opportunities to focus on", None, 'full'),
+]
+
+assembler = PromptAssembler()
+
+print("=" * 70)
+print("MODEL ROUTER EVALUATION")
+print("=" * 70)
+
+rows = []
+for question, history, label in QUESTIONS:
+    plan = assembler.build(question, [], history)
+    score, reasons = complexity(plan)
+    rows.append((question, label, score, reasons))
+
+print(f"\n{'score':>5} {'want':<6} question  [reasons]")
+for question, label, score, reasons in rows:
+    print(f"{score:>5} {label:<6} {question[:70]!r}  [{','.join(reasons) or '-'}]")
+
+light = sum(1 for row in rows if row[1] == 'light')
+full = len(rows) - light
+print(f"\n{'threshold':<11}{'light routed light':>20}{'hard routed light':>19}")
+for threshold in range(1, 6):
+    easy_ok = sum(1 for _, label, score, _ in rows if label == 'light' and score < threshold)
+    hard_missed = sum(1 for _, label, score, _ in rows if label == 'full' and score < threshold)
+    print(f"{threshold:<11}{easy_ok:>13}/{light:<6}{hard_missed:>12}/{full}")
+
+print("\n" + "=" * 70)
+print("EVALUATION COMPLETE")
@@ -0,0 +1,101 @@
+"""
+Hit rate and false-hit rate of the semantic answer cache per threshold.
+
+Usage:
+    python evaluate_semantic_cache.py
+
+Each pair below is (cached question, new question, same answer?). A pair
+is a hit when the semantic cache would serve the cached answer for the new
+question: the intent and parameters match and the similarity reaches the
+threshold. Role and database context are held equal, as they are for two
+students asking within the same TTL. Paraphrases should hit; near misses
+(same topic, different question) must not.
+"""
+
+import time
+
+import numpy as np
+
+from app.chatbot_semantic_cache import SemanticCache
+
+PAIRS = [
+    # Paraphrases of FAQ-style questions that reach the LLM
+    ("How should I prepare for interviews?", "tips to prepare for interviews", True),
+    ("How should I prepare for interviews?", "how do I prepare for an interview", True),
+    ("how to prepare for technical interviews", "technical interview preparation tips", True),
+    ("How do I improve my resume?", "how can I improve my resume", True),
+    ("How do I improve my resume?", "ways to improve resume", True),
+    ("what should I write in my resume", "what should my resume contain", True),
+    ("How to crack Google interview", "how do I crack the interview at Google", True),
+    ("tips for group discussion rounds", "give me tips for group discussion", True),
+    ("what are the most asked HR interview questions", "most asked HR interview questions", True),
+    ("how to negotiate salary", "how should I negotiate my salary", True),
+    ("which skills are in demand for placements", "what skills are in demand for placement", True),
+    ("how to prepare for aptitude tests", "how can I prepare for aptitude test", True),
+    ("what is a good project for my resume", "good projects for resume", True),
+    ("how do I prepare for coding rounds", "prepare for coding round", True),
+    ("should I do an internship or a job", "internship or job which should I choose", True),
+    ("how to write a cover letter", "how do I write a cover letter", True),
+    ("show upcoming drives", "which drives are coming up soon", True),
+    ("what is the placement rate", "tell me the placement rate", True),
+    # Near misses: related questions with different answers
+    ("How should I prepare for interviews?", "How should I prepare my resume?", False),
+    ("How to crack Google interview", "How to crack Amazon interview", False),
+    ("how to prepare for aptitude tests", "how to prepare for coding rounds", False),
+    ("how to negotiate salary", "what is the average salary", False),
+    ("tips for group discussion rounds", "tips for HR interview", False),
+    ("what are the most asked HR interview questions", "what are the most asked technical interview questions", False),
+    ("students with CGPA above 8", "students with CGPA above 7", False),
+    ("list CSE students", "list ECE students", False),
+    ("what is the placement rate", "what is the placement rate for CSE", False),
+    ("how do I write a cover letter", "how do I write a resume", False),
+    ("am I eligible for Google", "am I eligible for Microsoft", False),
+    ("how to prepare for interviews in product companies", "how to prepare for interviews in service companies", False),
+    ("show upcoming drives", "which drives are closing soon", False),
+    ("show upcoming drives", "show upcoming hackathons", False),
+    ("technical interview preparation tips", "HR interview preparation tips", False),
+]
+
+KEY = ("", "student", "context")
+cache = SemanticCache(max_entries=64, ttl_seconds=300, threshold=0.0)
+
+print("=" * 70)
+print("SEMANTIC CACHE EVALUATION")
+print("=" * 70)
+
+rows = []
+for cached, asked, same in PAIRS:
+    v1, intent1, params1 = cache.describe(cached)
+    v2, intent2, params2 = cache.describe(asked)
+    guarded = intent1 == intent2 and params1 == params2
+    similarity = float(v1 @ v2) if v1 is not None and v2 is not None else 0.0
+    rows.append((cached, asked, same, guarded, similarity))
+
+print(f"\n{'sim':>5} {'guard':<6} {'want':<5} pair")
+for cached, asked, same, guarded, similarity in rows:
+    print(f"{similarity:>5.2f} {'ok' if guarded else 'block':<6} {'hit' if same else 'miss':<5} "
+          f"{cached!r} -> {asked!r}")
+
+positives = sum(1 for row in rows if row[2])
+negatives = len(rows) - positives
+print(f"\n{'threshold':<11}{'paraphrase hits':>17}{'false hits':>12}")
+for threshold in (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9):
+    hits = sum(1 for _, _, same, guarded, sim in rows if same and guarded and sim >= threshold)
+    false_hits = sum(1 for _, _, same, guarded, sim in rows if not same and guarded and sim >= threshold)
+    print(f"{threshold:<11}{hits:>10}/{positives:<6}{false_hits:>7}/{negatives}")
+
+# ---------------- Latency ----------------
+full = SemanticCache(max_entries=512, ttl_seconds=300)
+for i in range(full.max_entries):
+    full.set((f"question {i}", "student", "context"), f"how do I prepare for round {i} of the interview", {"answer": "x"})
+timings = []
+for cached, asked, _ in PAIRS * 5:
+    t0 = time.perf_counter()
+    full.get(KEY, asked + " now")
+    timings.append((time.perf_counter() - t0) * 1e6)
+timings = np.array(timings)
+print(f"\nLookup latency with {full.max_entries} entries: p50 {np.percentile(timings, 50):.0f} us, "
+      f"p99 {np.percentile(timings, 99):.0f} us")
+
+print("\n" + "=" * 70)
+print("EVALUATION COMPLETE")
@@ -0,0 +1,48 @@
+"""Add indexes for the hot query paths
+
+Revision ID: 6f1c2d8e4b7a
+Revises: 2a2390615e09
+Create Date: 2026-10-18 05:02:41.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c2d8e4b7a'
+down_revision = '2a2390615e09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.create_index('ix_applications_student_applied', ['student_id', 'applied_at'], unique=False)
+        batch_op.create_index('ix_applications_opportunity_status', ['opportunity_id', 'status'], unique=False)
+        batch_op.create_index('ix_applications_job_status', ['job_id', 'status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_applications_applied_at'), ['applied_at'], unique=False)
+
+    with op.batch_alter_table('opportunities', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_opportunities_deadline'), ['deadline'], unique=False)
+        batch_op.create_index('ix_opportunities_type_deadline', ['type', 'deadline'], unique=False)
+        batch_op.create_index(batch_op.f('ix_opportunities_created_at'), ['created_at'], unique=False)
+
+    with op.batch_alter_table('student_profiles', schema=None) as batch_op:
+        batch_op.create_index('ix_student_profiles_branch_cgpa', ['branch', 'cgpa'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('student_profiles', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_profiles_branch_cgpa')
+
+    with op.batch_alter_table('opportunities', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_opportunities_created_at'))
+        batch_op.drop_index('ix_opportunities_type_deadline')
+        batch_op.drop_index(batch_op.f('ix_opportunities_deadline'))
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_applications_applied_at'))
+        batch_op.drop_index('ix_applications_job_status')
+        batch_op.drop_index('ix_applications_opportunity_status')
+        batch_op.drop_index('ix_applications_student_applied')
@@ -0,0 +1,76 @@
+"""Add opportunity_branches table backfilled from allowed_branches
+
+Revision ID: 9b3e5a1c7d24
+Revises: 6f1c2d8e4b7a
+Create Date: 2026-10-18 06:14:09.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5a1c7d24'
+down_revision = '6f1c2d8e4b7a'
+branch_labels = None
+depends_on = None
+
+
+def _parse_branches(text):
+    # Same rules as app.models.parse_branches, frozen for this revision
+    branches = []
+    for part in (text or '').split(','):
+        branch = part.strip().upper()
+        if branch and branch not in branches:
+            branches.append(branch)
+    return branches
+
+
+def upgrade():
+    bind = op.get_bind()
+    # An app started on this database before the upgrade has already had
+    # db.create_all() make the (empty) table and its indexes
+    if not sa.inspect(bind).has_table('opportunity_branches'):
+        op.create_table('opportunity_branches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('opportunity_id', sa.Integer(), nullable=True),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('branch', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+        sa.ForeignKeyConstraint(['opportunity_id'], ['opportunities.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job_id', 'branch', name='unique_job_branch'),
+        sa.UniqueConstraint('opportunity_id', 'branch', name='unique_opportunity_branch')
+        )
+        with op.batch_alter_table('opportunity_branches', schema=None) as batch_op:
+            batch_op.create_index('ix_opportunity_branches_branch_opportunity', ['branch', 'opportunity_id'], unique=False)
+            batch_op.create_index('ix_opportunity_branches_branch_job', ['branch', 'job_id'], unique=False)
+    elif bind.execute(sa.text('SELECT 1 FROM opportunity_branches LIMIT 1')).first() is not None:
+        return
+
+    # Backfill one row per listed branch; empty/NULL allowed_branches stays
+    # without rows, which means open to all branches
+    opportunity_branches = sa.table('opportunity_branches',
+        sa.column('opportunity_id', sa.Integer()),
+        sa.column('job_id', sa.Integer()),
+        sa.column('branch', sa.String()),
+    )
+    rows = []
+    for table, key in (('opportunities', 'opportunity_id'), ('jobs', 'job_id')):
+        result = bind.execute(sa.text(
+            'SELECT id, allowed_branches FROM {} WHERE allowed_branches IS NOT NULL'.format(table)
+        ))
+        for owner_id, text in result:
+            owner = {'opportunity_id': None, 'job_id': None, key: owner_id}
+            rows.extend(dict(owner, branch=branch) for branch in _parse_branches(text))
+    if rows:
+        op.bulk_insert(opportunity_branches, rows)
+
+
+def downgrade():
+    # allowed_branches still holds the text, so nothing is lost
+    with op.batch_alter_table('opportunity_branches', schema=None) as batch_op:
+        batch_op.drop_index('ix_opportunity_branches_branch_job')
+        batch_op.drop_index('ix_opportunity_branches_branch_opportunity')
+
+    op.drop_table('opportunity_branches')
@@ -0,0 +1,125 @@
+"""Add numeric ctc_min_lpa/ctc_max_lpa/stipend_unit backfilled from ctc
+
+Revision ID: c7e2f4a9b813
+Revises: 9b3e5a1c7d24
+Create Date: 2026-10-18 07:02:55.117640
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2f4a9b813'
+down_revision = '9b3e5a1c7d24'
+branch_labels = None
+depends_on = None
+
+TABLES = ('jobs', 'opportunities')
+
+# Same rules as app.ctc.parse_ctc, frozen for this revision
+_PERIODS = {'month': 12, 'week': 52, 'day': 365}
+_PERIOD_PATTERNS = (
+    ('month', re.compile(r"/\s*(?:month|mon|mo|m)\b|per\s+month|\bp\.?\s?m\b\.?|\bmonthly\b|\ba\s+month\b")),
+    ('week', re.compile(r"/\s*(?:week|wk|w)\b|per\s+week|\bweekly\b|\ba\s+week\b")),
+    ('day', re.compile(r"/\s*(?:day|d)\b|per\s+day|\bdaily\b|\ba\s+day\b")),
+)
+_FOREIGN = re.compile(r"\$|\busd\b|\beur\b|€|£")
+_LPA = re.compile(r"(?<![a-z])lpa\b|\bl\.p\.a\b|\blakhs?\s+per\s+annum\b")
+_AMOUNT = r"(\d+(?:\.\d+)?)\s*(?:(k|thousand|lakhs?|lacs?|l|crores?|cr)(?![a-z]))?"
+_UNIT = (r"(lpa\b|l\.p\.a\b\.?|per\s+annum\b|p\.?\s?a\b\.?|per\s+(?:month|week|day)\b|p\.?\s?m\b\.?"
+         r"|/\s*(?:month|mon|mo|m|week|wk|w|day|d)\b|monthly\b|weekly\b|daily\b)")
+_BOUND = r"(₹\s*)?" + _AMOUNT + r"(?:\s*" + _UNIT + r")?"
+_RANGE = re.compile(_BOUND + r"\s*(?:-|–|to)\s*" + _BOUND)
+_SINGLE = re.compile(_BOUND)
+_SCALE = {'k': 1e3, 'thousand': 1e3, 'l': 1e5, 'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5,
+          'cr': 1e7, 'crore': 1e7, 'crores': 1e7}
+
+
+def _amounts(text):
+    anchored = lambda groups: bool(groups[0] or groups[2] or groups[3])
+    ranges = list(_RANGE.finditer(text))
+    singles = list(_SINGLE.finditer(text))
+    for match in ranges:
+        groups = match.groups()
+        if anchored(groups[:4]) or anchored(groups[4:]):
+            return [groups[1:3], groups[5:7]]
+    for match in singles:
+        if anchored(match.groups()):
+            return [match.groups()[1:3]]
+    if ranges:
+        groups = ranges[0].groups()
+        return [groups[1:3], groups[5:7]]
+    if singles:
+        return [singles[0].groups()[1:3]]
+    return []
+
+
+def _rupees(number, suffix, lpa, period):
+    value = float(number)
+    if suffix:
+        return value * _SCALE[suffix]
+    if lpa or (period is None and value < 1000):
+        return value * 1e5
+    return value
+
+
+def _parse_ctc(text):
+    """(min_lpa, max_lpa, stipend_unit), or None when there is no package."""
+    if not text:
+        return None
+    lowered = text.lower()
+    if _FOREIGN.search(lowered):
+        return None
+    cleaned = re.sub(r"(?<=\d),(?=\d)", "", lowered)
+    cleaned = re.sub(r"\binr\b|\brs\b\.?", "₹", cleaned)
+    period = next((name for name, pattern in _PERIOD_PATTERNS if pattern.search(cleaned)), None)
+    lpa = bool(_LPA.search(cleaned))
+    bounds = _amounts(cleaned)
+    if not bounds:
+        return None
+    if len(bounds) == 2:
+        (low_number, low_suffix), (high_number, high_suffix) = bounds
+        bounds = [(low_number, low_suffix or high_suffix), (high_number, high_suffix)]
+    per_year = _PERIODS.get(period, 1)
+    lakhs = sorted(round(_rupees(number, suffix, lpa, period) * per_year / 1e5, 4) for number, suffix in bounds)
+    if lakhs[-1] <= 0:
+        return None
+    return lakhs[0], lakhs[-1], period
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('ctc_min_lpa', sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column('ctc_max_lpa', sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column('stipend_unit', sa.String(length=10), nullable=True))
+            batch_op.create_index(batch_op.f('ix_{}_ctc_min_lpa'.format(table)), ['ctc_min_lpa'], unique=False)
+            batch_op.create_index(batch_op.f('ix_{}_ctc_max_lpa'.format(table)), ['ctc_max_lpa'], unique=False)
+
+    bind = op.get_bind()
+    for table in TABLES:
+        rows = bind.execute(sa.text('SELECT id, ctc FROM {} WHERE ctc IS NOT NULL'.format(table))).all()
+        updates = []
+        for row_id, ctc in rows:
+            package = _parse_ctc(ctc)
+            if package is not None:
+                min_lpa, max_lpa, unit = package
+                updates.append({'id': row_id, 'min_lpa': min_lpa, 'max_lpa': max_lpa, 'unit': unit})
+        if updates:
+            bind.execute(sa.text(
+                'UPDATE {} SET ctc_min_lpa = :min_lpa, ctc_max_lpa = :max_lpa, stipend_unit = :unit '
+                'WHERE id = :id'.format(table)
+            ), updates)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f('ix_{}_ctc_max_lpa'.format(table)))
+            batch_op.drop_index(batch_op.f('ix_{}_ctc_min_lpa'.format(table)))
+            batch_op.drop_column('stipend_unit')
+            batch_op.drop_column('ctc_max_lpa')
+            batch_op.drop_column('ctc_min_lpa')
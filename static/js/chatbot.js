@@ -14,6 +14,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let isWaitingForResponse = false;
 
+    // Prepare the user's context server-side before the first question
+    prefetchContext();
+
     // Initialize AI provider badge
     initializeAIProviderBadge();
 
@@ -76,6 +79,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Scroll to bottom
         scrollToBottom();
+        return messageBubble;
     }
 
     /**
@@ -132,10 +136,230 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
+    const JOB_POLL_INTERVAL_MS = 700;
+    const JOB_POLL_MAX_INTERVAL_MS = 2000;
+    let activeJobUrl = null;
+
+    // Let the server stop work nobody will read
+    window.addEventListener('pagehide', function() {
+        if (activeJobUrl) {
+            fetch(activeJobUrl, { method: 'DELETE', keepalive: true }).catch(() => {});
+        }
+    });
+
     /**
-     * Send message to chatbot API
+     * Send message as a background chat job and poll for the answer,
+     * rendering partial text as it arrives. Falls back to streaming when the
+     * job endpoint is unavailable.
      */
     function sendMessage(message) {
+        console.log('[AskAssistant] Queuing message:', message);
+        let bubble = null;
+        let answerText = '';
+
+        function finish() {
+            activeJobUrl = null;
+            removeTypingIndicator();
+            setWaitingState(false);
+        }
+
+        function poll(url, delay) {
+            setTimeout(() => {
+                fetch(`${url}?since=${answerText.length}`, {
+                    headers: { 'Accept': 'application/json' }
+                })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(job => {
+                    if (job.text) {
+                        if (!bubble) {
+                            removeTypingIndicator();
+                            bubble = addMessage('', 'bot');
+                        }
+                        answerText += job.text;
+                        bubble.innerHTML = formatMessage(answerText);
+                        scrollToBottom();
+                    }
+
+                    if (!job.done) {
+                        // Back off gently while the provider is still thinking
+                        const next = job.text ? JOB_POLL_INTERVAL_MS : Math.min(delay * 1.5, JOB_POLL_MAX_INTERVAL_MS);
+                        poll(url, next);
+                        return;
+                    }
+
+                    const data = job.response || {};
+                    console.log('[AskAssistant] Job complete:', job.status, data);
+                    finish();
+                    if (!bubble) {
+                        addMessage(data.answer || 'Sorry, I couldn\'t process your request. Please try again.', 'bot');
+                    }
+                    updateAIProviderBadge(job.status === 'done' ? data.extraction_method : 'error',
+                                          data.confidence, data.intent);
+                    if (!data.success && data.context === 'ai_unavailable') {
+                        console.error('[AskAssistant] AI provider failure details:', data.ai_error || 'No error details returned');
+                    }
+                })
+                .catch(error => {
+                    console.error('[AskAssistant] Polling failed:', error);
+                    finish();
+                    if (!bubble) {
+                        addMessage('Sorry, there was an error communicating with the chatbot. Please try again.', 'bot');
+                    }
+                    updateAIProviderBadge('error', 'low');
+                });
+            }, delay);
+        }
+
+        fetch('/chatbot/api/chat/jobs', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message })
+        })
+        .then(response => {
+            if (response.status === 429 || response.status === 400) {
+                return response.json().then(data => {
+                    finish();
+                    addMessage(data.answer, 'bot');
+                    updateAIProviderBadge('error', 'low');
+                });
+            }
+            if (response.status !== 202) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json().then(job => {
+                activeJobUrl = job.poll_url;
+                poll(job.poll_url, JOB_POLL_INTERVAL_MS);
+            });
+        })
+        .catch(error => {
+            console.warn('[AskAssistant] Job queue unavailable, streaming instead:', error);
+            sendMessageStream(message);
+        });
+    }
+
+    /**
+     * Send message to chatbot API, rendering the answer as it streams in.
+     * Falls back to the JSON endpoint when streaming is unavailable.
+     */
+    function sendMessageStream(message) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            sendMessageJson(message);
+            return;
+        }
+
+        console.log('[AskAssistant] Streaming message:', message);
+        let bubble = null;
+        let answerText = '';
+        let finished = false;
+
+        fetch('/chatbot/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message })
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            function handleEvent(rawEvent) {
+                let eventName = 'message';
+                const dataLines = [];
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trimStart());
+                    }
+                });
+                if (!dataLines.length) return;
+                const data = JSON.parse(dataLines.join('\n'));
+
+                if (eventName === 'delta') {
+                    if (!bubble) {
+                        removeTypingIndicator();
+                        bubble = addMessage('', 'bot');
+                    }
+                    answerText += data.text || '';
+                    bubble.innerHTML = formatMessage(answerText);
+                    scrollToBottom();
+                } else if (eventName === 'done') {
+                    finished = true;
+                    console.log('[AskAssistant] Stream complete:', data);
+                    if (!bubble) {
+                        removeTypingIndicator();
+                        addMessage(data.answer || 'Sorry, I couldn\'t process your request. Please try again.', 'bot');
+                    }
+                    updateAIProviderBadge(data.extraction_method, data.confidence, data.intent);
+                    if (!data.success && data.context === 'ai_unavailable') {
+                        console.error('[AskAssistant] AI provider failure details:', data.ai_error || 'No error details returned');
+                    }
+                } else if (eventName === 'error') {
+                    finished = true;
+                    console.error('[AskAssistant] Stream error:', data);
+                    removeTypingIndicator();
+                    if (!bubble) {
+                        addMessage(data.answer, 'bot');
+                    }
+                    updateAIProviderBadge('error', 'low');
+                }
+            }
+
+            function pump() {
+                return reader.read().then(({ done, value }) => {
+                    if (value) {
+                        buffer += decoder.decode(value, { stream: true });
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                            handleEvent(buffer.slice(0, boundary));
+                            buffer = buffer.slice(boundary + 2);
+                        }
+                    }
+                    if (done) {
+                        if (buffer.trim()) handleEvent(buffer);
+                        return;
+                    }
+                    return pump();
+                });
+            }
+
+            return pump();
+        })
+        .then(() => {
+            if (!finished && !bubble) {
+                throw new Error('Stream ended without an answer');
+            }
+            removeTypingIndicator();
+            setWaitingState(false);
+        })
+        .catch(error => {
+            console.warn('[AskAssistant] Streaming failed:', error);
+            if (bubble) {
+                // Part of the answer was already shown; keep it rather than asking again.
+                removeTypingIndicator();
+                setWaitingState(false);
+                return;
+            }
+            sendMessageJson(message);
+        });
+    }
+
+    /**
+     * Send message to chatbot API (single JSON response)
+     */
+    function sendMessageJson(message) {
         console.log('[AskAssistant] Sending message:', message);
         fetch('/chatbot/api/chat', {
             method: 'POST',
@@ -209,6 +433,9 @@ document.addEventListener('DOMContentLoaded', function() {
         } else if (method === 'mistral') {
             badgeText += 'Mistral AI';
             badgeColor = '#0d47a1';
+        } else if (method === 'fast_path') {
+            badgeText += '⚡ Instant';
+            badgeColor = '#28a745';
         } else if (method === 'keyword_fallback') {
             badgeText += '📚 Pattern Match';
             badgeColor = '#ff9800';
@@ -263,6 +490,18 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    /**
+     * Ask the server to prefetch this user's chat context (fire and forget)
+     */
+    function prefetchContext() {
+        fetch('/chatbot/api/prefetch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            }
+        }).catch(() => {});
+    }
+
     /**
      * Load suggestions from API
      */